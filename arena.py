@@ -0,0 +1,469 @@
+# Multiplayer arena: an asyncio server hosting many rooms, each a shared board where
+# several snakes chase the same question. Rooms reuse SnakeEngine's question, apple and
+# pickup code; only the per-snake part of step() is repeated for several bodies.
+# Every tick the server sends each room one small binary delta (new head, tail cells
+# dropped, score and flags per snake) instead of whole bodies, and all frames for a
+# connection are joined into one write per tick.
+# Run with: python arena.py serve [--port 8765]
+#           python arena.py bots --rooms 50 --players 4     (localhost load test)
+#           python arena.py bench --rooms 1000 --players 4  (room ticks per second)
+import argparse, asyncio, json, random, struct, time
+
+from engine import SnakeEngine, DIRECTIONS, DIFFICULTIES, OPPOSITES, START_LENGTH, GAME_OVER_SCORE, POINTS_PER_LEVEL
+from game_log import get_logger, setup_logging
+from pickups import ANSWER
+from question_bank import get_question_bank
+from snake_body import SnakeBody
+from utils import ARENA_HOST, ARENA_PORT, ARENA_TICK_RATE
+
+MAX_PLAYERS = 8
+MAX_PENDING_BYTES = 256 * 1024  # Unsent bytes after which a slow client is dropped
+MAX_CATCH_UP_TICKS = 5
+
+log = get_logger('arena')
+
+# Frame types. Client to server:
+JOIN = 1        # JSON {"room", "name", "category"}
+INPUT = 2       # one direction byte
+LEAVE = 3
+# Server to client:
+WELCOME = 10    # JSON {"player", "room", "cols", "rows", "apple_span", "label_rows", "tick_rate"}
+SNAPSHOT = 11   # JSON, full room state; sent on join and whenever the roster changes
+QUESTION = 12   # JSON {"question", "options", "apples", "difficulty"}
+TICK = 13       # TICK_HEADER followed by one PLAYER_DELTA per snake that moved or died
+PICKUPS = 14    # JSON list of distractor anchors
+CLOSED = 99     # Client side only: the connection ended
+
+FRAME = struct.Struct('<BI')
+TICK_HEADER = struct.Struct('<IH')
+PLAYER_DELTA = struct.Struct('<HIBhB')
+ALIVE = 1
+MOVED = 2
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+def encode_frame(kind, payload=b''):
+    return FRAME.pack(kind, len(payload)) + payload
+
+def encode_json(kind, data):
+    return encode_frame(kind, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+async def read_frame(reader):
+    kind, size = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return kind, await reader.readexactly(size) if size else b''
+
+def decode_deltas(payload):
+    tick, count = TICK_HEADER.unpack_from(payload)
+    return tick, [PLAYER_DELTA.unpack_from(payload, TICK_HEADER.size + i * PLAYER_DELTA.size) for i in range(count)]
+
+class ArenaPlayer(object):
+    def __init__(self, player_id, name):
+        self.id = player_id
+        self.name = name
+        self.body = SnakeBody()
+        self.direction = 'RIGHT'
+        self.change_to = 'RIGHT'
+        self.score = 0
+        self.alive = False
+        self.grow = False
+        self.death_cause = None
+        self.moved = False
+        self.died = False
+        self.pops = 0
+
+# One shared board. The room is a SnakeEngine without a body of its own: the engine's
+# question, apple and distractor code runs unchanged, and the free-cell index counts
+# the cells of every snake attached to it.
+class ArenaRoom(SnakeEngine):
+    def __init__(self, name, cols, rows, questions, category=None, seed=None, num_apples=None, apple_span=1, label_rows=0,
+                 distractors=0, max_players=MAX_PLAYERS):
+        super(ArenaRoom, self).__init__(cols, rows, questions=questions, seed=seed, num_apples=num_apples, apple_span=apple_span,
+                                        label_rows=label_rows, distractors=distractors)
+        self.name = name
+        self.body = None
+        self.free_cells.reset()
+        self.max_players = max_players
+        self.players = {}
+        self.next_id = 1
+        self.rounds = 0
+        self.roster_changed = False
+        self.sent_apples_version = None
+        self.sent_distractors_version = None
+        categories = questions.categories()
+        self.category = category if category in categories else (self.rng.choice(categories) if categories else None)
+
+    @property
+    def full(self):
+        return len(self.players) >= self.max_players
+
+    def add_player(self, name):
+        player = ArenaPlayer(self.next_id, name)
+        self.next_id += 1
+        self.players[player.id] = player
+        if self.question is None or not any(other.alive for other in self.players.values()):
+            self.new_round()
+        else:
+            self.spawn(player)
+        self.roster_changed = True
+        return player
+
+    def remove_player(self, player_id):
+        player = self.players.pop(player_id, None)
+        if player is not None:
+            self.kill(player, None)
+            self.roster_changed = True
+
+    def new_round(self):
+        self.rounds += 1
+        self.difficulty = DIFFICULTIES[0]
+        for player in self.players.values():
+            if player.alive:
+                self.kill(player, None)
+            player.score = 0
+        self.clear_pickups()
+        self.get_random_question()
+        for player in self.players.values():
+            self.spawn(player)
+        self.place_apples()
+        self.place_distractors()
+        self.roster_changed = True
+
+    def occupied(self, cell):
+        return any(cell in player.body for player in self.players.values() if player.alive)
+
+    def spawn(self, player):
+        rows = list(range(self.rows))
+        self.rng.shuffle(rows)
+        head_x = self.cols // 2
+        for y in rows:
+            cells = [self.cell((head_x - i) % self.cols, y) for i in range(START_LENGTH)]
+            if any(self.occupied(cell) or self.pickups.at_cell(cell) is not None for cell in cells):
+                continue
+            player.body = SnakeBody(cells)
+            self.free_cells.attach(player.body)
+            player.direction = player.change_to = 'RIGHT'
+            player.alive = True
+            player.grow = False
+            player.death_cause = None
+            return True
+        return False
+
+    def kill(self, player, cause):
+        if player.alive:
+            player.alive = False
+            player.died = True
+            player.death_cause = cause
+            self.free_cells.detach(player.body)
+            player.body = SnakeBody()
+
+    def step(self, action=None):
+        # Same order as SnakeEngine.step for every snake in join order: turn, move the
+        # head, eat, drop the tail. Collisions are checked once everybody has moved.
+        if not self.players:
+            return
+        self.ticks += 1
+        players = list(self.players.values())
+        for player in players:
+            player.moved = player.died = False
+            player.pops = 0
+        for player in players:
+            if not player.alive:
+                continue
+            if player.change_to != player.direction and player.change_to != OPPOSITES[player.direction]:
+                player.direction = player.change_to
+            body = player.body
+            head = self.neighbors[player.direction][body.cells[0]]
+            body.push_head(head)
+            player.moved = True
+            pickup = self.pickups.at_cell(head)
+            if pickup is not None:
+                if pickup.kind == ANSWER:
+                    self.eat_answer(player, pickup.index)
+                    if not player.alive:
+                        continue
+                else:
+                    self.hit_distractor_for(player, pickup)
+            if player.grow:
+                player.grow = False
+            else:
+                body.pop_tail()
+                player.pops += 1
+        alive = [player for player in players if player.alive]
+        crashed = []
+        for player in alive:
+            head = player.body.cells[0]
+            if player.body.head_collides() or any(head in other.body for other in alive if other is not player):
+                crashed.append(player)
+        for player in crashed:
+            self.kill(player, 'collision')
+        if not any(player.alive for player in players):
+            self.new_round()
+
+    def eat_answer(self, player, index):
+        correct = self.options[index] == self.correct_answer
+        if correct:
+            player.score += 1
+            player.grow = True
+        else:
+            player.score -= 1
+            player.grow = False
+            if len(player.body) > 2:
+                player.body.pop_tail()
+                player.pops += 1
+        self.scheduler.record(*self.question_key, correct=correct, question=self.question)
+        self.get_random_question()
+        self.place_apples()
+        if player.score > 0 and player.score % POINTS_PER_LEVEL == 0:
+            level = DIFFICULTIES.index(self.difficulty)
+            if level + 1 < len(DIFFICULTIES):
+                self.difficulty = DIFFICULTIES[level + 1]
+        if player.score <= GAME_OVER_SCORE:
+            self.kill(player, 'score')
+
+    def hit_distractor_for(self, player, pickup):
+        if len(player.body) > 2:
+            player.body.pop_tail()
+            player.pops += 1
+        self.respawn_distractor(pickup)
+
+    def snapshot(self):
+        return {
+            'tick': self.ticks, 'round': self.rounds, 'category': self.category, 'difficulty': self.difficulty,
+            'question': self.question['question'] if self.question else '', 'options': self.options, 'apples': self.apples,
+            'distractors': [pickup.anchor for pickup in self.distractors],
+            'players': [{'id': player.id, 'name': player.name, 'cells': list(player.body.cells), 'direction': player.direction,
+                         'score': player.score, 'alive': player.alive} for player in self.players.values()],
+        }
+
+    def welcome(self, player, tick_rate):
+        return encode_json(WELCOME, {'player': player.id, 'room': self.name, 'cols': self.cols, 'rows': self.rows,
+                                     'apple_span': self.apple_span, 'label_rows': self.label_rows, 'tick_rate': tick_rate})
+
+    def encode_updates(self):
+        # Everything the room's clients need after a tick, encoded once for all of them.
+        frames = []
+        deltas = [PLAYER_DELTA.pack(player.id, player.body.cells[0] if player.alive else 0, player.pops, player.score,
+                                    (ALIVE if player.alive else 0) | (MOVED if player.moved else 0) | DIRECTION_CODES[player.direction] << 2)
+                  for player in self.players.values() if player.moved or player.died]
+        frames.append(encode_frame(TICK, TICK_HEADER.pack(self.ticks, len(deltas)) + b''.join(deltas)))
+        if self.roster_changed:
+            self.roster_changed = False
+            self.sent_apples_version = self.apples_version
+            self.sent_distractors_version = self.distractors_version
+            frames.append(encode_json(SNAPSHOT, self.snapshot()))
+        else:
+            if self.apples_version != self.sent_apples_version:
+                self.sent_apples_version = self.apples_version
+                frames.append(encode_json(QUESTION, {'question': self.question['question'], 'options': self.options,
+                                                     'apples': self.apples, 'difficulty': self.difficulty}))
+            if self.distractors_version != self.sent_distractors_version:
+                self.sent_distractors_version = self.distractors_version
+                frames.append(encode_json(PICKUPS, [pickup.anchor for pickup in self.distractors]))
+        return b''.join(frames)
+
+class Connection(object):
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = []
+        self.room = None
+        self.player = None
+
+class ArenaServer(object):
+    def __init__(self, questions=None, cols=30, rows=50, tick_rate=ARENA_TICK_RATE, apple_span=1, label_rows=3, distractors=0):
+        self.questions = questions if questions is not None else get_question_bank()
+        self.cols = cols
+        self.rows = rows
+        self.tick_rate = tick_rate
+        self.apple_span = apple_span
+        self.label_rows = label_rows
+        self.distractors = distractors
+        self.rooms = {}
+        self.connections = {}
+        self.ticks = 0
+        self.step_time = 0.0
+        self.bytes_sent = 0
+
+    def room_for(self, name, category=None):
+        room = self.rooms.get(name)
+        if room is None:
+            room = ArenaRoom(name, self.cols, self.rows, self.questions, category=category, apple_span=self.apple_span,
+                             label_rows=self.label_rows, distractors=self.distractors)
+            self.rooms[name] = room
+            self.connections[name] = []
+        return room
+
+    def join(self, connection, name, player_name, category=None):
+        room = self.room_for(name, category)
+        if room.full:
+            return False
+        connection.room = room
+        connection.player = room.add_player(player_name)
+        connection.pending.append(room.welcome(connection.player, self.tick_rate))
+        self.connections[name].append(connection)
+        return True
+
+    def leave(self, connection):
+        room = connection.room
+        if room is None:
+            return
+        room.remove_player(connection.player.id)
+        self.connections[room.name].remove(connection)
+        if not room.players:
+            del self.rooms[room.name]
+            del self.connections[room.name]
+        connection.room = connection.player = None
+
+    def step_all(self):
+        start = time.perf_counter()
+        for name, room in self.rooms.items():
+            room.step()
+            update = room.encode_updates()
+            for connection in self.connections[name]:
+                connection.pending.append(update)
+        self.ticks += 1
+        self.step_time += time.perf_counter() - start
+
+    def flush(self):
+        for connections in list(self.connections.values()):
+            for connection in list(connections):
+                if not connection.pending:
+                    continue
+                data = b''.join(connection.pending)
+                connection.pending.clear()
+                transport = connection.writer.transport
+                if transport.is_closing():
+                    continue
+                if transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                    log.warning("Dropping slow client in room %s", connection.room.name)
+                    self.leave(connection)
+                    transport.close()
+                    continue
+                connection.writer.write(data)
+                self.bytes_sent += len(data)
+
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == JOIN and connection.room is None:
+                    request = json.loads(payload.decode('utf-8'))
+                    if not self.join(connection, str(request.get('room', 'lobby')), str(request.get('name', 'player')), request.get('category')):
+                        break
+                elif kind == INPUT and connection.player is not None and payload:
+                    connection.player.change_to = DIRECTIONS[payload[0] % len(DIRECTIONS)]
+                elif kind == LEAVE:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.leave(connection)
+            writer.close()
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        while True:
+            ticks = 0
+            while loop.time() >= next_tick and ticks < MAX_CATCH_UP_TICKS:
+                self.step_all()
+                next_tick += interval
+                ticks += 1
+            if ticks == MAX_CATCH_UP_TICKS:
+                next_tick = loop.time() + interval
+            self.flush()
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            players = sum(len(room.players) for room in self.rooms.values())
+            step_ms = 1000.0 * self.step_time / self.ticks if self.ticks else 0.0
+            log.info("%d rooms, %d players, %.2f ms per server tick, %.1f KiB/s sent", len(self.rooms), players, step_ms, self.bytes_sent / interval / 1024)
+            self.ticks = 0
+            self.step_time = 0.0
+            self.bytes_sent = 0
+
+    async def serve(self, host=ARENA_HOST, port=ARENA_PORT, report_interval=10.0):
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info("Arena listening on %s:%s at %d ticks/s", host, port, self.tick_rate)
+        async with server:
+            tasks = [asyncio.ensure_future(self.run_ticks())]
+            if report_interval:
+                tasks.append(asyncio.ensure_future(self.report(report_interval)))
+            try:
+                await server.serve_forever()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+async def run_bot(host, port, room, name, seconds, totals):
+    rng = random.Random(name)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode_json(JOIN, {'room': room, 'name': name}))
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            kind, payload = await asyncio.wait_for(read_frame(reader), timeout=5)
+            totals['frames'] += 1
+            totals['bytes'] += FRAME.size + len(payload)
+            if kind == TICK:
+                totals['ticks'] += 1
+                if rng.random() < 0.2:
+                    writer.write(encode_frame(INPUT, bytes([rng.randrange(len(DIRECTIONS))])))
+    finally:
+        writer.write(encode_frame(LEAVE))
+        writer.close()
+
+async def run_bots(host, port, rooms, players, seconds):
+    totals = {'frames': 0, 'bytes': 0, 'ticks': 0}
+    await asyncio.gather(*(run_bot(host, port, f"room{room}", f"bot{room}-{player}", seconds, totals)
+                           for room in range(rooms) for player in range(players)))
+    clients = rooms * players
+    print(f"{clients} clients received {totals['frames']} frames, {totals['bytes'] / 1024:.1f} KiB, "
+          f"{totals['bytes'] / max(1, totals['ticks']):.1f} bytes per client tick")
+
+def bench(rooms, players, ticks, seed=0):
+    rng = random.Random(seed)
+    questions = get_question_bank()
+    arena = [ArenaRoom(f"room{i}", 30, 50, questions, seed=seed + i, label_rows=3) for i in range(rooms)]
+    for room in arena:
+        for i in range(players):
+            room.add_player(f"bot{i}")
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for room in arena:
+            for player in room.players.values():
+                if rng.random() < 0.2:
+                    player.change_to = rng.choice(DIRECTIONS)
+            room.step()
+            room.encode_updates()
+    elapsed = time.perf_counter() - start
+    print(f"{rooms * ticks / elapsed:.0f} room ticks/s ({rooms} rooms x {players} players, {ticks} ticks in {elapsed:.2f} s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trivia Snake multiplayer arena.")
+    parser.add_argument('command', choices=['serve', 'bots', 'bench'])
+    parser.add_argument('--host', default=ARENA_HOST)
+    parser.add_argument('--port', type=int, default=ARENA_PORT)
+    parser.add_argument('--tick-rate', type=int, default=ARENA_TICK_RATE)
+    parser.add_argument('--distractors', type=int, default=0)
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args(argv)
+    setup_logging(analytics_file=None)
+    if args.command == 'serve':
+        server = ArenaServer(tick_rate=args.tick_rate, distractors=args.distractors)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'bots':
+        asyncio.run(run_bots(args.host, args.port, args.rooms, args.players, args.seconds))
+    else:
+        bench(args.rooms, args.players, args.ticks)
+
+if __name__ == '__main__':
+    main()
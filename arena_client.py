@@ -0,0 +1,199 @@
+import asyncio, json, queue, threading
+
+from arena import (JOIN, INPUT, LEAVE, WELCOME, SNAPSHOT, QUESTION, TICK, PICKUPS, CLOSED, ALIVE, MOVED,
+                   encode_frame, encode_json, read_frame, decode_deltas)
+from engine import DIRECTIONS, GAME_OVER_SCORE
+from game_log import get_logger
+from pickups import DISTRACTOR, Pickup
+from snake_body import SnakeBody
+from utils import ARENA_TICK_RATE, ARENA_CLOSE_TIMEOUT
+
+log = get_logger('arena_client')
+
+# Connection to an arena server for GameWidget's client mode. The socket lives on an
+# asyncio loop in a daemon thread; received frames wait in a queue until the game
+# thread polls them, and inputs are handed to the loop without blocking a frame.
+class ArenaClient(object):
+    def __init__(self, host, port, room, name, category=None):
+        self.host = host
+        self.port = port
+        self.join_request = {'room': room, 'name': name, 'category': category}
+        self.inbox = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.writer = None
+        self.task = None
+        self.thread = threading.Thread(target=self.run, name='ArenaClient', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self.receive())
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    async def receive(self):
+        try:
+            reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.writer.write(encode_json(JOIN, self.join_request))
+            while True:
+                self.inbox.put(await read_frame(reader))
+        except (OSError, asyncio.IncompleteReadError) as e:
+            log.info("Arena connection closed: %s", e)
+        finally:
+            self.inbox.put((CLOSED, b''))
+            if self.writer is not None:
+                self.writer.close()
+
+    def send(self, frame):
+        if self.writer is not None:
+            self.call_soon(self.writer.write, frame)
+
+    def call_soon(self, callback, *args):
+        # The loop closes itself when the connection ends, possibly while this is called.
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+            return True
+        except RuntimeError:
+            return False
+
+    def send_input(self, direction):
+        self.send(encode_frame(INPUT, bytes([DIRECTIONS.index(direction)])))
+
+    def poll(self):
+        frames = []
+        while True:
+            try:
+                frames.append(self.inbox.get_nowait())
+            except queue.Empty:
+                return frames
+
+    def close(self, timeout=ARENA_CLOSE_TIMEOUT):
+        if self.call_soon(self.leave):
+            self.thread.join(timeout)
+
+    def leave(self):
+        # Runs on the loop. Closing the writer sends LEAVE first and then ends receive()
+        # at end of stream; a connection that is still being opened is cancelled.
+        if self.writer is not None:
+            self.writer.write(encode_frame(LEAVE))
+            self.writer.close()
+        elif self.task is not None:
+            self.task.cancel()
+
+# Client-side copy of a room, shaped like the SnakeEngine attributes GameWidget and the
+# renderer read. The local snake is `body`; everybody else's snake is in `rivals`.
+class ArenaView(object):
+    def __init__(self):
+        self.player_id = None
+        self.room = None
+        self.cols = self.rows = 1
+        self.apple_span = 1
+        self.label_rows = 0
+        self.tick_rate = ARENA_TICK_RATE
+        self.body = SnakeBody()
+        self.direction = 'RIGHT'
+        self.score = 0
+        self.fps = ARENA_TICK_RATE
+        self.ticks = 0
+        self.difficulty = None
+        self.question = {"question": "Waiting for the arena...", "options": [], "correct": None}
+        self.correct_answer = None
+        self.options = []
+        self.apples = []
+        self.apples_version = 0
+        self.distractors = []
+        self.distractors_version = 0
+        self.rivals = {}
+        self.rivals_version = 0
+        self.alive = False
+        self.game_over = False
+        self.death_cause = None
+
+    def xy(self, cell):
+        return cell % self.cols, cell // self.cols
+
+    def apply(self, kind, payload):
+        # Returns True when the question on screen changed.
+        if kind == TICK:
+            self.apply_tick(payload)
+        elif kind == WELCOME:
+            welcome = json.loads(payload.decode('utf-8'))
+            self.player_id = welcome['player']
+            self.room = welcome['room']
+            self.cols, self.rows = welcome['cols'], welcome['rows']
+            self.apple_span = welcome['apple_span']
+            self.label_rows = welcome['label_rows']
+            self.tick_rate = self.fps = welcome['tick_rate']
+        elif kind == SNAPSHOT:
+            self.apply_snapshot(json.loads(payload.decode('utf-8')))
+            return True
+        elif kind == QUESTION:
+            self.apply_question(json.loads(payload.decode('utf-8')))
+            return True
+        elif kind == PICKUPS:
+            self.apply_pickups(json.loads(payload.decode('utf-8')))
+        elif kind == CLOSED:
+            self.end('disconnected')
+        return False
+
+    def apply_tick(self, payload):
+        self.ticks, deltas = decode_deltas(payload)
+        rivals_moved = False
+        for player_id, head, pops, score, flags in deltas:
+            if player_id == self.player_id:
+                body = self.body
+                self.score = score
+                self.direction = DIRECTIONS[flags >> 2]
+            else:
+                body = self.rivals.get(player_id)
+                if body is None:
+                    continue
+                rivals_moved = True
+            if not flags & ALIVE:
+                body.clear()
+                if player_id == self.player_id:
+                    self.end('score' if score <= GAME_OVER_SCORE else 'collision')
+                continue
+            if flags & MOVED:
+                body.push_head(head)
+                for _ in range(pops):
+                    body.pop_tail()
+        if rivals_moved:
+            self.rivals_version += 1
+
+    def apply_snapshot(self, snapshot):
+        self.ticks = snapshot['tick']
+        self.rivals = {}
+        for player in snapshot['players']:
+            body = SnakeBody(player['cells'])
+            if player['id'] == self.player_id:
+                self.body = body
+                self.direction = player['direction']
+                self.score = player['score']
+                self.alive = player['alive']
+            elif player['alive']:
+                self.rivals[player['id']] = body
+        self.rivals_version += 1
+        self.apply_question(snapshot)
+        self.apply_pickups(snapshot['distractors'])
+
+    def apply_question(self, data):
+        self.question = {"question": data['question'], "options": data['options'], "correct": None}
+        self.options = data['options']
+        self.apples = data['apples']
+        self.difficulty = data['difficulty']
+        self.apples_version += 1
+
+    def apply_pickups(self, anchors):
+        self.distractors = [Pickup(DISTRACTOR, index, anchor, None) for index, anchor in enumerate(anchors)]
+        self.distractors_version += 1
+
+    def end(self, cause):
+        if not self.game_over:
+            self.alive = False
+            self.game_over = True
+            self.death_cause = cause
@@ -0,0 +1,147 @@
+import os, threading
+from kivy.clock import Clock
+from kivy.graphics.texture import Texture
+
+from atlas import ShelfAtlas
+from game_log import get_logger
+from utils import ASSETS_DIR, SPRITE_ATLAS_SIZE, SPRITE_MAX_SIZE
+
+# Sprites decoded in the background once the menu has been drawn.
+MENU_SPRITES = ('speed_up.png', 'slow_down.png')
+GAME_SPRITES = ('snake_head.png', 'snake_body.png', 'apple.png', 'checkmark.png', 'wrong.png')
+
+log = get_logger('assets')
+
+def rotate_tex_coords(tex_coords, angle):
+    # tex_coords lists the bottom-left, bottom-right, top-right and top-left corners;
+    # turning the image by a quarter counterclockwise shifts every corner one place.
+    turns = (angle // 90) % 4
+    corners = [tex_coords[i:i + 2] for i in range(0, 8, 2)]
+    return tuple(value for i in range(4) for value in corners[(i - turns) % 4])
+
+class Sprite(object):
+    __slots__ = ('texture', 'tex_coords', 'size')
+
+    def __init__(self, texture, tex_coords, size):
+        self.texture = texture
+        self.tex_coords = tex_coords
+        self.size = size
+
+# Decodes every image file once, uploads it once and hands out Sprites keyed by
+# (name, rotation, scale). Sprites share one atlas texture where they fit, and rotations
+# are texture coordinate permutations of the same atlas region rather than new bitmaps.
+# Decoding can happen on a background thread; uploads always happen on the main thread.
+class AssetManager(object):
+    def __init__(self, assets_dir=ASSETS_DIR, atlas_size=SPRITE_ATLAS_SIZE, max_size=SPRITE_MAX_SIZE):
+        self.assets_dir = assets_dir
+        self.atlas_size = atlas_size
+        self.max_size = max_size
+        self.atlas = None
+        self.lock = threading.Lock()
+        self.decoded = {}
+        self.regions = {}
+        self.sprites = {}
+        self.textures = {}
+        self.texture_bytes = 0
+        self.preload_thread = None
+
+    def decode(self, name, scale=1.0):
+        key = (name, scale)
+        with self.lock:
+            if key in self.decoded or key in self.regions:
+                return
+            fullname = os.path.join(self.assets_dir, name)
+            if not os.path.exists(fullname):
+                log.warning("Cannot load image: %s", fullname)
+                self.decoded[key] = None
+                return
+            from PIL import Image as PILImage
+            pil_image = PILImage.open(fullname).convert('RGBA')
+            width, height = pil_image.size
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+            if self.max_size and max(width, height) > self.max_size:
+                ratio = self.max_size / max(width, height)
+                width, height = max(1, int(width * ratio)), max(1, int(height * ratio))
+            if (width, height) != pil_image.size:
+                pil_image = pil_image.resize((width, height), PILImage.LANCZOS)
+            pil_image = pil_image.transpose(PILImage.FLIP_TOP_BOTTOM)
+            self.decoded[key] = (pil_image.size, pil_image.tobytes())
+
+    def upload(self, name, scale=1.0):
+        key = (name, scale)
+        region = self.regions.get(key)
+        if region is not None:
+            return region
+        self.decode(name, scale)
+        with self.lock:
+            decoded = self.decoded.pop(key, None)
+        if decoded is None:
+            region = Texture.create(size=(1, 1), colorfmt='rgba')
+            region.blit_buffer(bytes(4), colorfmt='rgba', bufferfmt='ubyte')
+        else:
+            (width, height), pixels = decoded
+            region = None
+            if self.atlas_size:
+                if self.atlas is None:
+                    self.atlas = ShelfAtlas(self.atlas_size)
+                    self.texture_bytes += self.atlas.nbytes
+                region = self.atlas.add_pixels(pixels, width, height)
+            if region is None:
+                region = Texture.create(size=(width, height), colorfmt='rgba')
+                region.blit_buffer(pixels, colorfmt='rgba', bufferfmt='ubyte')
+                self.texture_bytes += width * height * 4
+        self.regions[key] = region
+        return region
+
+    def sprite(self, name, rotation=0, scale=1.0):
+        key = (name, rotation % 360, scale)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            region = self.upload(name, scale)
+            sprite = Sprite(region, rotate_tex_coords(region.tex_coords, rotation), region.size)
+            self.sprites[key] = sprite
+        return sprite
+
+    def texture(self, name, wrap=None):
+        # Standalone texture for images that cannot live in the atlas, like a repeated background.
+        key = (name, wrap)
+        texture = self.textures.get(key)
+        if texture is None:
+            fullname = os.path.join(self.assets_dir, name)
+            if not os.path.exists(fullname):
+                log.warning("Background image not found: %s", fullname)
+                return None
+            from kivy.core.image import Image as CoreImage
+            texture = CoreImage(fullname).texture
+            if wrap:
+                texture.wrap = wrap
+            self.textures[key] = texture
+            self.texture_bytes += texture.width * texture.height * 4
+        return texture
+
+    def preload(self, names, scale=1.0, callback=None):
+        def run():
+            for name in names:
+                self.decode(name, scale)
+            Clock.schedule_once(lambda dt: self.upload_all(names, scale, callback))
+        self.preload_thread = threading.Thread(target=run, name='AssetPreload', daemon=True)
+        self.preload_thread.start()
+
+    def upload_all(self, names, scale=1.0, callback=None):
+        for name in names:
+            self.upload(name, scale)
+        if callback is not None:
+            callback()
+
+    def memory_report(self):
+        with self.lock:
+            decoded_bytes = sum(len(item[1]) for item in self.decoded.values() if item is not None)
+        return {
+            'decoded_bytes': decoded_bytes,
+            'texture_bytes': self.texture_bytes,
+            'atlas_bytes': self.atlas.nbytes if self.atlas is not None else 0,
+            'sprites': len(self.sprites),
+            'images': len(self.regions) + len(self.textures),
+        }
+
+assets = AssetManager()
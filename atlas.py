@@ -0,0 +1,48 @@
+from kivy.graphics.texture import Texture
+
+# Shelf packer over one shared texture. Space is never reclaimed; once the atlas is full
+# add_pixels() returns None and callers fall back to standalone textures until clear().
+# Pixel data is expected bottom row first, the way Kivy textures store it.
+class ShelfAtlas(object):
+    def __init__(self, size, padding=1):
+        self.size = size
+        self.padding = padding
+        self.texture = Texture.create(size=(size, size), colorfmt='rgba')
+        self.texture.blit_buffer(bytes(size * size * 4), colorfmt='rgba', bufferfmt='ubyte')
+        self.clear()
+
+    @property
+    def nbytes(self):
+        return self.size * self.size * 4
+
+    def clear(self):
+        self.shelf_x = 0
+        self.shelf_y = 0
+        self.shelf_height = 0
+
+    def allocate(self, width, height):
+        width += self.padding
+        height += self.padding
+        if width > self.size:
+            return None
+        if self.shelf_x + width > self.size:
+            self.shelf_y += self.shelf_height
+            self.shelf_x = 0
+            self.shelf_height = 0
+        if self.shelf_y + height > self.size:
+            return None
+        x, y = self.shelf_x, self.shelf_y
+        self.shelf_x += width
+        self.shelf_height = max(self.shelf_height, height)
+        return x, y
+
+    def add_pixels(self, pixels, width, height):
+        slot = self.allocate(width, height)
+        if slot is None:
+            return None
+        x, y = slot
+        self.texture.blit_buffer(pixels, pos=(x, y), size=(width, height), colorfmt='rgba', bufferfmt='ubyte')
+        return self.texture.get_region(x, y, width, height)
+
+    def add_texture(self, texture):
+        return self.add_pixels(texture.pixels, texture.width, texture.height)
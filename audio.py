@@ -0,0 +1,197 @@
+import argparse, os, queue, time
+from collections import deque
+from kivy.clock import Clock
+
+from game_log import events, get_logger, setup_logging
+from profiler import percentile
+from utils import SOUNDS_DIR, AUDIO_VOICES, AUDIO_MAX_DELAY, AUDIO_LATENCY_SAMPLES
+
+log = get_logger('audio')
+
+# Effect name -> file in SOUNDS_DIR. Effects without a file are skipped, so a sound is
+# added by dropping its file in; the game code triggers every effect either way.
+EFFECTS = {
+    'correct': 'correct.wav',
+    'wrong': 'wrong.wav',
+    'speed_up': 'speed_up.wav',
+    'level_up': 'level_up.wav',
+    'game_over': 'game_over.wav',
+}
+
+# Copies of one effect, each decoded into memory when it is loaded. A trigger takes an
+# idle voice so overlapping effects mix; when all of them are busy the voice after the
+# last one started (the oldest) is restarted.
+class VoicePool(object):
+    def __init__(self, voices):
+        self.voices = voices
+        self.next = 0
+
+    def play(self):
+        voices = self.voices
+        count = len(voices)
+        for offset in range(count):
+            index = (self.next + offset) % count
+            if voices[index].state == 'stop':
+                break
+        else:
+            index = self.next
+        self.next = (index + 1) % count
+        voices[index].play()
+
+# Sound effects for the game. Kivy sounds belong to the main thread, so play() only
+# queues the effect name with its trigger time and fires a Clock trigger; the queue is
+# drained once the current tick has returned, before the frame is drawn, so the tick
+# never waits on the audio provider. Voices are loaded one effect per frame, and effects
+# that waited longer than max_delay are dropped. Latency is measured from the trigger
+# until the provider has started the voice (the device's own output buffer comes on top).
+class AudioEngine(object):
+    def __init__(self, sounds_dir=SOUNDS_DIR, voices=AUDIO_VOICES, max_delay=AUDIO_MAX_DELAY):
+        self.sounds_dir = sounds_dir
+        self.voice_count = voices
+        self.max_delay = max_delay
+        self.pools = {}
+        self.requests = queue.SimpleQueue()
+        self.latencies = deque(maxlen=AUDIO_LATENCY_SAMPLES)
+        self.dropped = 0
+        self.pending = list(EFFECTS.items())
+        self.load_ms = 0.0
+        self.loaded = False
+        self.closed = False
+        self.trigger = Clock.create_trigger(self.drain, -1)
+        Clock.schedule_once(self.load_next)
+
+    def play(self, name):
+        self.requests.put((name, time.perf_counter()))
+        self.trigger()
+
+    def drain(self, dt=None):
+        # Requests made before the voices are loaded wait here until load_next is done.
+        if not self.loaded:
+            return
+        clock = time.perf_counter
+        while True:
+            try:
+                name, triggered = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            pool = self.pools.get(name)
+            if pool is None:
+                continue
+            if clock() - triggered > self.max_delay:
+                self.dropped += 1
+                continue
+            pool.play()
+            self.latencies.append(clock() - triggered)
+
+    def load_next(self, dt=None):
+        if self.closed:
+            return
+        if self.pending:
+            name, filename = self.pending.pop(0)
+            start = time.perf_counter()
+            self.load_effect(name, os.path.join(self.sounds_dir, filename))
+            self.load_ms += 1000.0 * (time.perf_counter() - start)
+            Clock.schedule_once(self.load_next)
+            return
+        self.loaded = True
+        log.info("Loaded %d sound effects with %d voices each in %.0f ms", len(self.pools), self.voice_count, self.load_ms)
+        self.trigger()
+
+    def load_effect(self, name, path):
+        from kivy.core.audio import SoundLoader
+        if not os.path.exists(path):
+            log.debug("No sound for %s (%s)", name, path)
+            return
+        voices = [SoundLoader.load(path) for _ in range(self.voice_count)]
+        voices = [voice for voice in voices if voice is not None]
+        if voices:
+            self.pools[name] = VoicePool(voices)
+        else:
+            log.warning("Could not load sound %s", path)
+
+    def bind_events(self, bus=events):
+        bus.subscribe('fps_change', self.on_fps_change)
+        bus.subscribe('difficulty_change', self.on_difficulty_change)
+        bus.subscribe('death', self.on_death)
+
+    def unbind_events(self, bus=events):
+        bus.unsubscribe('fps_change', self.on_fps_change)
+        bus.unsubscribe('difficulty_change', self.on_difficulty_change)
+        bus.unsubscribe('death', self.on_death)
+
+    def on_fps_change(self, event):
+        if event['new'] > event['old']:
+            self.play('speed_up')
+
+    def on_difficulty_change(self, event):
+        self.play('level_up')
+
+    def on_death(self, event):
+        self.play('game_over')
+        report = self.latency_report()
+        if report['count']:
+            log.info("Sound latency: p50 %.1f ms, p95 %.1f ms, max %.1f ms over %d effects, %d dropped",
+                     report['p50_ms'], report['p95_ms'], report['max_ms'], report['count'], report['dropped'])
+
+    def latency_report(self):
+        latencies = list(self.latencies)
+        return {
+            'count': len(latencies),
+            'p50_ms': 1000.0 * percentile(latencies, 0.5),
+            'p95_ms': 1000.0 * percentile(latencies, 0.95),
+            'max_ms': 1000.0 * max(latencies) if latencies else 0.0,
+            'dropped': self.dropped,
+            'effects': sorted(self.pools),
+        }
+
+    def close(self):
+        self.unbind_events()
+        self.closed = True
+        self.loaded = False
+        self.trigger.cancel()
+
+_audio_engine = None
+
+def get_audio_engine():
+    global _audio_engine
+    if _audio_engine is None:
+        _audio_engine = AudioEngine()
+        _audio_engine.bind_events()
+    return _audio_engine
+
+def close_audio_engine():
+    if _audio_engine is not None:
+        _audio_engine.close()
+
+def run_clock(seconds):
+    # The CLI has no window, so it runs the Clock itself.
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        Clock.tick()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trigger sound effects in bursts and print the trigger-to-playback latency.")
+    parser.add_argument('effects', nargs='*', default=['correct', 'wrong'])
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.02)
+    parser.add_argument('--sounds-dir', default=SOUNDS_DIR)
+    parser.add_argument('--voices', type=int, default=AUDIO_VOICES)
+    args = parser.parse_args(argv)
+    setup_logging(analytics_file=None)
+    engine = AudioEngine(args.sounds_dir, args.voices)
+    while not engine.loaded:
+        Clock.tick()
+    missing = [name for name in args.effects if name not in engine.pools]
+    if missing:
+        parser.error(f"no sound loaded for {', '.join(missing)} in {args.sounds_dir}")
+    for i in range(args.count):
+        engine.play(args.effects[i % len(args.effects)])
+        run_clock(args.interval)
+    run_clock(engine.max_delay)
+    report = engine.latency_report()
+    engine.close()
+    print(f"{report['count']} effects: p50 {report['p50_ms']:.2f} ms, p95 {report['p95_ms']:.2f} ms, "
+          f"max {report['max_ms']:.2f} ms, {report['dropped']} dropped")
+
+if __name__ == '__main__':
+    main()
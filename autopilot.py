@@ -0,0 +1,138 @@
+import heapq
+
+from engine import DIRECTIONS, OPPOSITES
+from pickups import ANSWER
+
+MAX_EXPANSIONS = 8000       # Cells a single search may expand before it gives up for this tick
+
+# Steers a SnakeEngine toward an apple, by default the correct answer. Paths are found
+# with A* over the engine's neighbor tables, which already wrap round the board, using
+# the toroidal Manhattan distance to the apple as heuristic. A body segment only blocks
+# a cell until the tail has moved off it, and every other pickup blocks its cells.
+# A plan stays valid while the snake follows it and no pickup moves, so it is reused
+# tick after tick and the search only runs again when an apple is eaten or respawns.
+class Autopilot(object):
+    def __init__(self, engine, max_expansions=MAX_EXPANSIONS):
+        self.engine = engine
+        self.max_expansions = max_expansions
+        self.moves = [(direction, engine.neighbors[direction]) for direction in DIRECTIONS]
+        self.path = []
+        self.plan_key = None
+        self.searches = 0
+        self.expansions = 0
+
+    def correct_index(self):
+        engine = self.engine
+        for index, option in enumerate(engine.options):
+            if option == engine.correct_answer:
+                return index
+        return None
+
+    def act(self, target=None):
+        engine = self.engine
+        if target is None:
+            target = self.correct_index()
+        if target is None or target >= len(engine.apples):
+            self.path = []
+            return self.safe_move()
+        head = engine.body[0]
+        key = (engine.apples_version, engine.distractors_version, target)
+        path = self.path
+        if key != self.plan_key or not path or engine.neighbors[path[-1][0]][head] != path[-1][1]:
+            self.plan_key = None
+            path = self.path = self.plan(target)
+            if not path:
+                return self.safe_move()
+            self.plan_key = key
+        return path.pop()[0]
+
+    def release_times(self):
+        # Ticks until the tail has moved off each body cell. step() pushes the head before
+        # it drops the tail, so a cell freed after t ticks can be entered on move t.
+        body = self.engine.body
+        delay = len(body) + (1 if self.engine.grow_snake else 0)
+        free_at = {}
+        for i, cell in enumerate(body):
+            if cell not in free_at:
+                free_at[cell] = delay - i
+        return free_at
+
+    def plan(self, target):
+        # Returns the moves as (direction, cell) pairs, last move first, or [] when the
+        # apple cannot be reached within the expansion budget.
+        engine = self.engine
+        cols, rows = engine.cols, engine.rows
+        x0, y0, x1, y1 = engine.apple_rects[target]
+        pickups = engine.pickups
+        free_at = self.release_times()
+        start = engine.body[0]
+        opposite = OPPOSITES[engine.direction]
+
+        def distance(cell):
+            x, y = cell % cols, cell // cols
+            dx = 0 if x0 <= x < x1 else min((x0 - x) % cols, (x - x1 + 1) % cols)
+            dy = 0 if y0 <= y < y1 else min((y0 - y) % rows, (y - y1 + 1) % rows)
+            return dx + dy
+
+        self.searches += 1
+        best = {start: 0}
+        came_from = {}
+        heap = [(distance(start), 0, start)]
+        expansions = 0
+        while heap and expansions < self.max_expansions:
+            _, steps, cell = heapq.heappop(heap)
+            steps = -steps
+            if steps > best[cell]:
+                continue
+            if cell != start and not distance(cell):
+                self.expansions += expansions
+                path = []
+                while cell != start:
+                    previous, direction = came_from[cell]
+                    path.append((direction, cell))
+                    cell = previous
+                return path
+            expansions += 1
+            steps += 1
+            for direction, table in self.moves:
+                if cell == start and direction == opposite:
+                    continue
+                following = table[cell]
+                if free_at.get(following, 0) > steps or best.get(following, steps + 1) <= steps:
+                    continue
+                pickup = pickups.at_cell(following)
+                if pickup is not None and (pickup.kind != ANSWER or pickup.index != target):
+                    continue
+                best[following] = steps
+                came_from[following] = (cell, direction)
+                # Ties go to the deeper node, so an open board costs about one expansion per step.
+                heapq.heappush(heap, (steps + distance(following), -steps, following))
+        self.expansions += expansions
+        return []
+
+    def safe_move(self, limit=None):
+        # No route to the apple: take the move that keeps the most room to manoeuvre,
+        # counting cells reachable in time before the body catches up (at most `limit`).
+        engine = self.engine
+        free_at = self.release_times()
+        limit = limit or len(engine.body) + 1
+        best_direction, best_room = engine.direction, -1
+        for direction, table in self.moves:
+            if direction == OPPOSITES[engine.direction]:
+                continue
+            first = table[engine.body[0]]
+            if free_at.get(first, 0) > 1 or engine.pickups.at_cell(first) is not None:
+                continue
+            seen = {first: 1}
+            frontier = [first]
+            while frontier and len(seen) < limit:
+                cell = frontier.pop()
+                steps = seen[cell] + 1
+                for _, neighbors in self.moves:
+                    following = neighbors[cell]
+                    if following not in seen and free_at.get(following, 0) <= steps:
+                        seen[following] = steps
+                        frontier.append(following)
+            if len(seen) > best_room:
+                best_direction, best_room = direction, len(seen)
+        return best_direction
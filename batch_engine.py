@@ -0,0 +1,234 @@
+import numpy as np
+
+from engine import DIRECTIONS, DIFFICULTIES, NUM_APPLES, GAME_OVER_SCORE, POINTS_PER_LEVEL, START_LENGTH
+from utils import INITIAL_FPS, MAX_FPS
+
+# The same rules as engine.SnakeEngine, but for N independent games held in NumPy arrays
+# and advanced together. Directions are coded by their index in DIRECTIONS and an action
+# of -1 keeps the current direction. Questions are reduced to (category, difficulty,
+# index) plus the slot of the correct apple, which is all the rules need. Each game deals
+# its questions from a shuffled deck per difficulty like the scheduler does, so nothing
+# repeats before its bucket runs out; the scheduler's reviews of missed questions and
+# skips of mastered ones are not simulated.
+KEEP = -1
+OPPOSITE_CODES = np.array([1, 0, 3, 2], dtype=np.int8)
+DEATH_NONE, DEATH_COLLISION, DEATH_SCORE = 0, 1, 2
+DEATH_CAUSES = ('none', 'collision', 'score')
+PLACEMENT_TRIES = 64
+
+def question_counts(bank, categories):
+    counts = np.zeros((len(categories), len(DIFFICULTIES)), dtype=np.int64)
+    for c, category in enumerate(categories):
+        for d, difficulty in enumerate(DIFFICULTIES):
+            counts[c, d] = bank.count(category, difficulty)
+    return counts
+
+def build_neighbor_array(cols, rows):
+    cells = np.arange(cols * rows)
+    x, y = cells % cols, cells // cols
+    return np.stack([
+        ((y + 1) % rows) * cols + x,
+        ((y - 1) % rows) * cols + x,
+        y * cols + (x - 1) % cols,
+        y * cols + (x + 1) % cols,
+    ]).astype(np.int32)
+
+class BatchSnakeEnv(object):
+    def __init__(self, num_games, cols, rows, counts, seed=None, num_apples=NUM_APPLES, label_rows=0):
+        self.n = num_games
+        self.cols = cols
+        self.rows = rows
+        self.cells = cols * rows
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.num_apples = num_apples
+        self.label_rows = label_rows
+        self.rng = np.random.default_rng(seed)
+        self.neighbors = build_neighbor_array(cols, rows)
+        # The head is pushed before the tail is popped, so the ring needs one spare slot.
+        self.capacity = self.cells + 2
+        n = num_games
+        self.ring = np.zeros((n, self.capacity), dtype=np.int32)
+        self.head_ptr = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.occupancy = np.zeros((n, self.cells), dtype=np.uint16)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.apples = np.full((n, num_apples), -1, dtype=np.int32)
+        self.correct_slot = np.zeros(n, dtype=np.int64)
+        self.target_slot = np.zeros(n, dtype=np.int64)
+        self.category = np.zeros(n, dtype=np.int64)
+        self.difficulty = np.zeros(n, dtype=np.int64)
+        self.question = np.zeros(n, dtype=np.int64)
+        # deck[g, d] is a permutation of the bucket; the first deck_position[g, d] entries
+        # have been dealt this round.
+        self.deck_size = max(1, int(self.counts.max(initial=0)))
+        self.deck = np.zeros((n, len(DIFFICULTIES), self.deck_size), dtype=np.int32)
+        self.deck_position = np.zeros((n, len(DIFFICULTIES)), dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.fps = np.full(n, INITIAL_FPS, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.answers = np.zeros(n, dtype=np.int64)
+        self.done = np.ones(n, dtype=bool)
+        self.death_cause = np.zeros(n, dtype=np.int8)
+        self.exposure = np.zeros((self.counts.shape[0], len(DIFFICULTIES), self.deck_size), dtype=np.int64)
+        self.accuracy = np.ones(n)
+
+    def reset(self, games=None, category=None, fps=INITIAL_FPS, accuracy=None):
+        if games is None:
+            games = np.arange(self.n)
+        games = np.asarray(games, dtype=np.int64)
+        if len(games) == 0:
+            return
+        if category is None:
+            category = self.rng.integers(0, self.counts.shape[0], len(games))
+        self.category[games] = category
+        if accuracy is not None:
+            self.accuracy[games] = accuracy
+        self.occupancy[games] = 0
+        self.head_ptr[games] = 0
+        self.length[games] = START_LENGTH
+        head_x, head_y = self.cols // 2, self.rows // 2
+        for i in range(START_LENGTH):
+            cell = head_y * self.cols + (head_x - i) % self.cols
+            self.ring[games, i] = cell
+            self.occupancy[games, cell] += 1
+        self.direction[games] = DIRECTIONS.index('RIGHT')
+        self.score[games] = 0
+        self.fps[games] = fps
+        self.difficulty[games] = 0
+        self.ticks[games] = 0
+        self.answers[games] = 0
+        self.done[games] = False
+        self.death_cause[games] = DEATH_NONE
+        self.deck[games] = np.arange(self.deck_size, dtype=np.int32)
+        self.deck_position[games] = 0
+        self.new_question(games)
+        self.place_apples(games)
+
+    def deal(self, games):
+        # A partial Fisher-Yates shuffle per game, as in scheduler.Deck. A finished round
+        # starts over with its last question moved to the front and counted as dealt, so
+        # it cannot come up twice in a row.
+        difficulty = self.difficulty[games]
+        counts = self.counts[self.category[games], difficulty]
+        position = self.deck_position[games, difficulty]
+        decks = self.deck[games, difficulty]
+        rows = np.arange(len(games))
+        over = position >= counts
+        if over.any():
+            last = np.maximum(counts[over] - 1, 0)
+            first = decks[over, 0].copy()
+            decks[over, 0] = decks[over, last]
+            decks[over, last] = first
+            position[over] = np.where(counts[over] > 1, 1, 0)
+        pick = position + np.floor(self.rng.random(len(games)) * (counts - position)).astype(np.int64)
+        pick = np.minimum(pick, self.deck_size - 1)
+        question = decks[rows, pick].astype(np.int64)
+        decks[rows, pick] = decks[rows, position]
+        decks[rows, position] = question
+        self.deck[games, difficulty] = decks
+        self.deck_position[games, difficulty] = position + 1
+        question[counts == 0] = -1
+        return question
+
+    def new_question(self, games):
+        question = self.deal(games)
+        self.question[games] = question
+        asked = question >= 0
+        np.add.at(self.exposure, (self.category[games][asked], self.difficulty[games][asked], question[asked]), 1)
+        self.correct_slot[games] = self.rng.integers(0, self.num_apples, len(games))
+        wrong = self.rng.integers(1, self.num_apples, len(games)) if self.num_apples > 1 else np.zeros(len(games), dtype=np.int64)
+        honest = self.rng.random(len(games)) < self.accuracy[games]
+        self.target_slot[games] = np.where(honest, self.correct_slot[games], (self.correct_slot[games] + wrong) % self.num_apples)
+
+    def place_apples(self, games):
+        self.apples[games] = -1
+        y_min = self.label_rows
+        y_max = self.rows - self.label_rows - 1
+        if y_max < y_min:
+            return
+        for slot in range(self.num_apples):
+            pending = games
+            for _ in range(PLACEMENT_TRIES):
+                if len(pending) == 0:
+                    break
+                x = self.rng.integers(0, self.cols, len(pending))
+                y = self.rng.integers(y_min, y_max + 1, len(pending))
+                cell = (y * self.cols + x).astype(np.int32)
+                ok = self.occupancy[pending, cell] == 0
+                if slot:
+                    ok &= ~(self.apples[pending, :slot] == cell[:, None]).any(axis=1)
+                self.apples[pending[ok], slot] = cell[ok]
+                pending = pending[~ok]
+
+    def heads(self, games=None):
+        if games is None:
+            return self.ring[np.arange(self.n), self.head_ptr]
+        return self.ring[games, self.head_ptr[games]]
+
+    def pop_tail(self, games):
+        tail = (self.head_ptr[games] + self.length[games] - 1) % self.capacity
+        cell = self.ring[games, tail]
+        self.occupancy[games, cell] -= 1
+        self.length[games] -= 1
+
+    def step(self, actions=None):
+        games = np.nonzero(~self.done)[0]
+        if len(games) == 0:
+            return games, np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+        if actions is not None:
+            actions = np.asarray(actions)[games]
+            turn = (actions >= 0) & (actions != OPPOSITE_CODES[self.direction[games]])
+            self.direction[games[turn]] = actions[turn]
+        self.ticks[games] += 1
+        head = self.neighbors[self.direction[games], self.heads(games)]
+        self.head_ptr[games] = (self.head_ptr[games] - 1) % self.capacity
+        self.ring[games, self.head_ptr[games]] = head
+        self.length[games] += 1
+        self.occupancy[games, head] += 1
+
+        hits = self.apples[games] == head[:, None]
+        ate = hits.any(axis=1)
+        slot = hits.argmax(axis=1)
+        correct = ate & ((slot == self.correct_slot[games]) | (self.question[games] < 0))
+        wrong = ate & ~correct
+        self.score[games[correct]] += 1
+        self.score[games[wrong]] -= 1
+        self.answers[games[ate]] += 1
+        shrink = games[wrong & (self.length[games] > 2)]
+        self.pop_tail(shrink)
+        eaten = games[ate]
+        if len(eaten):
+            self.new_question(eaten)
+            self.place_apples(eaten)
+            level_up = eaten[(self.score[eaten] > 0) & (self.score[eaten] % POINTS_PER_LEVEL == 0)]
+            self.difficulty[level_up] = np.minimum(self.difficulty[level_up] + 1, len(DIFFICULTIES) - 1)
+            self.fps[level_up] = np.minimum(self.fps[level_up] + 1, MAX_FPS)
+        lost = ate & (self.score[games] <= GAME_OVER_SCORE)
+        self.done[games[lost]] = True
+        self.death_cause[games[lost]] = DEATH_SCORE
+
+        alive = ~lost
+        self.pop_tail(games[alive & ~correct])
+        alive_games = games[alive]
+        crashed = alive_games[self.occupancy[alive_games, head[alive]] > 1]
+        self.done[crashed] = True
+        self.death_cause[crashed] = DEATH_COLLISION
+        return games, ate, correct
+
+    def greedy_actions(self):
+        # Steer every game toward its target apple along the shorter way around the torus.
+        heads = self.heads()
+        target = self.apples[np.arange(self.n), self.target_slot]
+        target = np.where(target < 0, heads, target)
+        dx = (target % self.cols - heads % self.cols) % self.cols
+        dy = (target // self.cols - heads // self.cols) % self.rows
+        dx = np.where(dx > self.cols // 2, dx - self.cols, dx)
+        dy = np.where(dy > self.rows // 2, dy - self.rows, dy)
+        horizontal = np.where(dx > 0, 3, 2)
+        vertical = np.where(dy > 0, 0, 1)
+        actions = np.where(dx != 0, horizontal, np.where(dy != 0, vertical, KEEP)).astype(np.int8)
+        # A reversal is ignored by the rules, so take the other axis (or a side step) instead.
+        reverse = actions == OPPOSITE_CODES[self.direction]
+        side = np.where(self.direction < 2, 3, 0)
+        fallback = np.where(dx != 0, np.where(dy != 0, vertical, side), side)
+        return np.where(reverse, fallback, actions).astype(np.int8)
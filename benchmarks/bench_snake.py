@@ -0,0 +1,47 @@
+# Ticks per second of the snake body update as the snake grows, comparing the old
+# list-of-lists storage against snake_body.SnakeBody. Run with: python benchmarks/bench_snake.py
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_body import SnakeBody
+
+LENGTHS = [10, 100, 1000, 5000, 20000]
+WIDTH = 1 << 20
+
+def make_cells(length):
+    return [(WIDTH - i, 0) for i in range(length)]
+
+def tick_list(body, x):
+    body.insert(0, [x, 0])
+    body.pop()
+    return body[0] in body[1:]
+
+def tick_snake_body(body, x):
+    body.push_head((x, 0))
+    body.pop_tail()
+    return body.head_collides()
+
+def measure(tick, body, duration=0.2):
+    ticks = 0
+    x = WIDTH
+    start = time.perf_counter()
+    while True:
+        for _ in range(100):
+            x += 1
+            tick(body, x)
+        ticks += 100
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            return ticks / elapsed
+
+def main():
+    print(f"{'length':>8} {'list ticks/s':>14} {'SnakeBody ticks/s':>18}")
+    for length in LENGTHS:
+        cells = make_cells(length)
+        list_rate = measure(tick_list, [list(cell) for cell in cells])
+        deque_rate = measure(tick_snake_body, SnakeBody(cells))
+        print(f"{length:>8} {list_rate:>14.0f} {deque_rate:>18.0f}")
+
+if __name__ == '__main__':
+    main()
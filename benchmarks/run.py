@@ -0,0 +1,297 @@
+# Repeatable benchmark suite. Run with: python benchmarks/run.py [--output results.json]
+# [--baseline baseline.json]. Engine, apple placement, question selection and startup
+# import benchmarks are plain Python; the GameWidget update/draw benchmark needs a GL
+# window and runs in a child process, so a headless machine without GL just skips it.
+import argparse, json, os, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+from arena import ArenaRoom
+from autopilot import Autopilot
+from engine import SnakeEngine, DIFFICULTIES
+from question_bank import QuestionBank, build_question_bank, get_question_bank
+from snake_body import SnakeBody
+
+SNAKE_LENGTHS = [10, 100, 1000, 5000]
+FILL_FRACTIONS = [0.0, 0.5, 0.9, 0.98, 1.0]
+BANK_SIZES = [100, 10000, 1000000]
+QUICK_BANK_SIZES = [100, 10000]
+LABEL_COUNTS = [3, 6, 12]
+STORM_PICKUPS = [0, 100, 500]
+AUTOPILOT_BOARDS = [30, 120, 300]
+ARENA_ROOMS = 100
+ARENA_PLAYERS = 4
+STARTUP_RUNS = 5
+DEFAULT_TOLERANCE = 0.2
+
+def rate(function, duration):
+    # Calls per second, measured in batches so the clock is read rarely.
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(50):
+            function()
+        calls += 50
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            return calls / elapsed
+
+def latency(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return 1000.0 * samples[len(samples) // 2], 1000.0 * samples[min(len(samples) - 1, int(0.99 * len(samples)))]
+
+def straight_snake(engine, length, category='bench'):
+    # A snake lying along the bottom row, heading right into the empty part of it.
+    engine.reset(category)
+    engine.clear_pickups()
+    engine.body = SnakeBody(engine.cell(length - 1 - i, 0) for i in range(length))
+    engine.free_cells.reset(engine.body)
+    engine.direction = engine.change_to = 'RIGHT'
+
+def bench_engine(duration):
+    results = {}
+    for length in SNAKE_LENGTHS:
+        engine = SnakeEngine(length * 2 + 10, 8, seed=1, num_apples=0)
+        straight_snake(engine, length)
+        results[f"engine_ticks_per_s.len_{length}"] = {'value': rate(engine.step, duration), 'unit': 'ticks/s', 'higher_is_better': True}
+    return results
+
+def bench_storm(duration):
+    # Ticks through a board full of distractor pickups; the pickup lookup per tick should
+    # not depend on how many there are.
+    results = {}
+    for pickups in STORM_PICKUPS:
+        engine = SnakeEngine(60, 60, seed=1, num_apples=3, distractors=pickups)
+        engine.reset('bench')
+        turns = ['RIGHT'] * 7 + ['UP'] * 5
+
+        def tick(state=[0]):
+            state[0] += 1
+            engine.step(turns[state[0] % len(turns)])
+            if engine.game_over:
+                engine.reset('bench')
+        results[f"storm_ticks_per_s.pickups_{pickups}"] = {'value': rate(tick, duration), 'unit': 'ticks/s', 'higher_is_better': True}
+    return results
+
+def bench_autopilot(repeats):
+    # A full path search from scratch, as on the tick after an apple is eaten.
+    results = {}
+    for size in AUTOPILOT_BOARDS:
+        engine = SnakeEngine(size, size, seed=1, distractors=size // 3)
+        engine.reset('bench')
+        autopilot = Autopilot(engine)
+        p50, p99 = latency(lambda: autopilot.plan(autopilot.correct_index() or 0), repeats)
+        name = f"autopilot_plan_ms.board_{size}"
+        results[name + '.p50'] = {'value': p50, 'unit': 'ms', 'higher_is_better': False}
+        results[name + '.p99'] = {'value': p99, 'unit': 'ms', 'higher_is_better': False}
+    return results
+
+def bench_arena(duration):
+    # Server-side cost of one tick in every room, including the delta frames sent to clients.
+    questions = get_question_bank()
+    rooms = [ArenaRoom(f"room{i}", 30, 50, questions, seed=i, label_rows=3) for i in range(ARENA_ROOMS)]
+    for room in rooms:
+        for i in range(ARENA_PLAYERS):
+            room.add_player(f"bot{i}")
+    turns = ['RIGHT'] * 7 + ['UP'] * 5
+
+    def tick(state=[0]):
+        state[0] += 1
+        for room in rooms:
+            for player in room.players.values():
+                player.change_to = turns[(state[0] + player.id) % len(turns)]
+            room.step()
+            room.encode_updates()
+    return {'arena_room_ticks_per_s': {'value': ARENA_ROOMS * rate(tick, duration), 'unit': 'ticks/s', 'higher_is_better': True}}
+
+def bench_place_apples(repeats):
+    results = {}
+    cols = rows = 40
+    for fraction in FILL_FRACTIONS:
+        engine = SnakeEngine(cols, rows, seed=1)
+        engine.reset('bench')
+        length = int(cols * rows * fraction)
+        if length > 1:
+            engine.body = SnakeBody(range(length))
+        p50, p99 = latency(engine.place_apples, repeats)
+        name = f"place_apples_ms.fill_{int(fraction * 100)}"
+        results[name + '.p50'] = {'value': p50, 'unit': 'ms', 'higher_is_better': False}
+        results[name + '.p99'] = {'value': p99, 'unit': 'ms', 'higher_is_better': False}
+    return results
+
+class SyntheticBucket(object):
+    # Questions generated on the fly so a million-row bank never sits in memory.
+    def __init__(self, size, difficulty):
+        self.size = size
+        self.difficulty = difficulty
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield {"question": f"{self.difficulty} question {i}?", "options": [f"A{i}", f"B{i}", f"C{i}"], "correct": f"A{i}"}
+
+def bench_questions(sizes, duration, workdir):
+    results = {}
+    for size in sizes:
+        db_path = os.path.join(workdir, f"bank_{size}.db")
+        per_bucket = max(1, size // len(DIFFICULTIES))
+        build_question_bank({'bench': {difficulty: SyntheticBucket(per_bucket, difficulty) for difficulty in DIFFICULTIES}}, db_path)
+        engine = SnakeEngine(20, 20, questions=QuestionBank(db_path), seed=1)
+        engine.reset('bench')
+        results[f"questions_per_s.bank_{size}"] = {'value': rate(engine.get_random_question, duration), 'unit': 'questions/s', 'higher_is_better': True}
+    return results
+
+def bench_startup(runs):
+    # Cold import of the app modules in a fresh interpreter; no window is opened.
+    code = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, env=os.environ.copy())
+        if output.returncode != 0:
+            print(f"Startup benchmark failed: {output.stderr.strip().splitlines()[-1:]}")
+            return {}
+        samples.append(float(output.stdout.strip().splitlines()[-1]))
+    samples.sort()
+    return {'startup_import_ms': {'value': 1000.0 * samples[len(samples) // 2], 'unit': 'ms', 'higher_is_better': False}}
+
+def bench_render(duration):
+    # Runs this script again as a child that opens a window and measures GameWidget.
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--render-child', '--duration', str(duration)],
+                            cwd=ROOT, capture_output=True, text=True, env=os.environ.copy())
+    lines = output.stdout.strip().splitlines()
+    if output.returncode != 0 or not lines:
+        print(f"Skipping render benchmarks: no usable GL window (exit code {output.returncode})")
+        return {}
+    return json.loads(lines[-1])
+
+def render_child(duration):
+    from kivy.app import App
+    from kivy.clock import Clock
+    from game_log import setup_logging
+    from game_widget import GameWidget
+    from storage import GameStore
+    from utils import BASE_SNAKE_SIZE, BASE_APPLE_SIZE, BASE_ICON_SIZE
+
+    # stdout carries the results, and benchmark games stay out of analytics.jsonl.
+    setup_logging(stream=sys.stderr, analytics_file=None)
+
+    class RenderBenchApp(App):
+        def build(self):
+            self.snake_size = BASE_SNAKE_SIZE
+            self.apple_size = BASE_APPLE_SIZE
+            self.icon_size = BASE_ICON_SIZE
+            self.results = {}
+            self.widget = GameWidget(lambda text: None)
+            # Finished benchmark games must not land in the player's high scores or replays.
+            self.workdir = tempfile.mkdtemp()
+            self.widget.store = GameStore(os.path.join(self.workdir, 'high_score.json'))
+            self.widget.replay_dir = os.path.join(self.workdir, 'replays')
+            Clock.schedule_once(self.run_benchmarks, 0)
+            return self.widget
+
+        def run_benchmarks(self, dt):
+            widget = self.widget
+            category = widget.engine.questions.categories()[0]
+            widget.start_game(category)
+            widget.loop.stop()
+            for length in SNAKE_LENGTHS:
+                # Off-screen cells cost the same to draw, so long snakes get a wide board.
+                engine = SnakeEngine(length * 2 + 10, 8, questions=widget.engine.questions, seed=1, num_apples=0)
+                straight_snake(engine, length, category)
+                widget.engine = engine
+                for mode, retained in (('retained', True), ('immediate', False)):
+                    widget.retained_rendering = retained
+                    widget.renderer.detach()
+                    self.results[f"tick_draw_ms.{mode}.len_{length}"] = {'value': 1000.0 / rate(lambda: (engine.step(), widget.draw_elements(1.0)), duration), 'unit': 'ms', 'higher_is_better': False}
+                widget.retained_rendering = True
+                self.results[f"frame_draw_ms.len_{length}"] = {'value': 1000.0 / rate(lambda: widget.draw_elements(0.5), duration), 'unit': 'ms', 'higher_is_better': False}
+            for labels in LABEL_COUNTS:
+                widget.start_game(category)
+                widget.loop.stop()
+                widget.engine.num_apples = labels
+                widget.engine.place_apples()
+
+                def redraw_labels():
+                    widget.renderer.apples_key = None
+                    widget.renderer.synced_ticks = None
+                    widget.draw_elements(1.0)
+                self.results[f"label_draw_ms.labels_{labels}"] = {'value': 1000.0 / rate(redraw_labels, duration), 'unit': 'ms', 'higher_is_better': False}
+            widget.start_game(category)
+            widget.loop.stop()
+            self.results['update_ticks_per_s'] = {'value': rate(lambda: widget.update() if not widget.engine.game_over else widget.start_game(category), duration), 'unit': 'ticks/s', 'higher_is_better': True}
+            widget.loop.stop()
+            print(json.dumps(self.results))
+            self.stop()
+
+    RenderBenchApp().run()
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'benchmark':<40} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or not previous['value']:
+            print(f"{name:<40} {'-':>14} {current['value']:>14.3f} {'new':>8}")
+            continue
+        change = current['value'] / previous['value'] - 1.0
+        worse = -change if current['higher_is_better'] else change
+        flag = ' REGRESSION' if worse > tolerance else ''
+        print(f"{name:<40} {previous['value']:>14.3f} {current['value']:>14.3f} {100 * change:>+7.1f}%{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Trivia Snake benchmark suite.")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved with --output")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown before a regression is reported")
+    parser.add_argument('--duration', type=float, default=0.3, help="seconds spent on each throughput measurement")
+    parser.add_argument('--quick', action='store_true', help="skip the million-question bank")
+    parser.add_argument('--skip-render', action='store_true')
+    parser.add_argument('--render-child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.render_child:
+        render_child(args.duration)
+        return 0
+
+    results = {}
+    results.update(bench_engine(args.duration))
+    results.update(bench_storm(args.duration))
+    results.update(bench_arena(args.duration))
+    results.update(bench_autopilot(200))
+    results.update(bench_place_apples(200))
+    with tempfile.TemporaryDirectory() as workdir:
+        results.update(bench_questions(QUICK_BANK_SIZES if args.quick else BANK_SIZES, args.duration, workdir))
+    results.update(bench_startup(STARTUP_RUNS))
+    if not args.skip_render:
+        results.update(bench_render(args.duration))
+
+    document = {'python': sys.version.split()[0], 'platform': sys.platform, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {100 * args.tolerance:.0f}%")
+            return 1
+    elif not args.output:
+        print(json.dumps(document, indent=2, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
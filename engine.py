@@ -0,0 +1,337 @@
+import random
+
+from free_cells import FreeCellIndex
+from pickups import ANSWER, DISTRACTOR, Pickup, SpatialHash
+from question_bank import JsonQuestionBank
+from scheduler import QuestionScheduler
+from snake_body import SnakeBody
+from utils import INITIAL_FPS, MAX_FPS
+
+# Pure-Python game rules, independent of Kivy. The board is a toroidal grid of
+# cols x rows cells and every cell is stored as a single int, y * cols + x.
+DIRECTIONS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+OPPOSITES = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+NUM_APPLES = 3              # Apples shown for a question without options
+MAX_OPTIONS = 8             # Most answer apples a question can put on the board
+GAME_OVER_SCORE = -3
+POINTS_PER_LEVEL = 5
+START_LENGTH = 3
+
+def build_neighbors(cols, rows):
+    neighbors = {direction: [0] * (cols * rows) for direction in DIRECTIONS}
+    for y in range(rows):
+        for x in range(cols):
+            cell = y * cols + x
+            neighbors['UP'][cell] = ((y + 1) % rows) * cols + x
+            neighbors['DOWN'][cell] = ((y - 1) % rows) * cols + x
+            neighbors['LEFT'][cell] = y * cols + (x - 1) % cols
+            neighbors['RIGHT'][cell] = y * cols + (x + 1) % cols
+    return neighbors
+
+class StepResult(object):
+    __slots__ = ('apple', 'apple_cell', 'correct', 'distractor', 'difficulty_changed', 'fps_changed', 'game_over', 'death_cause')
+
+    def __init__(self, apple=None, apple_cell=None, correct=False, distractor=False):
+        self.apple = apple
+        self.apple_cell = apple_cell
+        self.correct = correct
+        self.distractor = distractor
+        self.difficulty_changed = False
+        self.fps_changed = False
+        self.game_over = False
+        self.death_cause = None
+
+# Shared result for ticks where nothing happened; callers must not modify it.
+QUIET = StepResult()
+
+class SnakeEngine(object):
+    # num_apples=None shows every option of the question (up to MAX_OPTIONS); a number
+    # pads or cuts the options to exactly that many apples. distractors is the number of
+    # answerless pickups kept on the board for the apple storm mode.
+    def __init__(self, cols, rows, questions=None, seed=None, num_apples=None, apple_span=1, label_rows=0, scheduler=None, distractors=0):
+        self.cols = cols
+        self.rows = rows
+        self.questions = questions if questions is not None else JsonQuestionBank({})
+        self.rng = random.Random(seed)
+        self.scheduler = scheduler if scheduler is not None else QuestionScheduler(self.questions, self.rng)
+        self.num_apples = num_apples
+        self.apple_span = apple_span
+        self.label_rows = label_rows
+        self.num_distractors = distractors
+        self.neighbors = build_neighbors(cols, rows)
+        self.free_cells = FreeCellIndex(cols, rows, apple_span, label_rows)
+        self.body = SnakeBody()
+        self.category = None
+        self.direction = 'RIGHT'
+        self.change_to = self.direction
+        self.score = 0
+        self.fps = INITIAL_FPS
+        self.difficulty = DIFFICULTIES[0]
+        self.grow_snake = False
+        self.question = None
+        self.question_key = None
+        self.correct_answer = None
+        self.next_question = None
+        self.next_question_key = None
+        self.next_anchors = None
+        self.options = []
+        self.apples = []
+        self.apple_rects = []
+        self.pickups = SpatialHash(cols, rows, apple_span)
+        self.apple_pickups = []
+        self.distractors = []
+        self.apples_version = 0
+        self.distractors_version = 0
+        self.ticks = 0
+        self.game_over = False
+        self.death_cause = None
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+
+    def cell(self, x, y):
+        return y * self.cols + x
+
+    def xy(self, cell):
+        return cell % self.cols, cell // self.cols
+
+    def reset(self, category, fps=None):
+        self.category = category
+        self.direction = 'RIGHT'
+        self.change_to = self.direction
+        self.score = 0
+        if fps is not None:
+            self.fps = fps
+        self.difficulty = DIFFICULTIES[0]
+        self.grow_snake = False
+        self.ticks = 0
+        self.game_over = False
+        self.death_cause = None
+        head_x, head_y = self.cols // 2, self.rows // 2
+        self.body = SnakeBody(self.cell((head_x - i) % self.cols, head_y) for i in range(START_LENGTH))
+        self.free_cells.reset(self.body)
+        self.clear_pickups()
+        self.next_question = self.next_question_key = self.next_anchors = None
+        self.get_random_question()
+        self.place_apples()
+        self.place_distractors()
+
+    def draw_question(self):
+        # One snapshot per draw: the pack download thread may swap in new questions
+        # between the scheduler's count() and the get() below.
+        bank = self.questions.snapshot()
+        index = self.scheduler.next_index(self.category, self.difficulty, bank)
+        if index is None:
+            question = {"question": "No questions available.", "options": ["N/A"] * (self.num_apples or NUM_APPLES), "correct": "N/A"}
+        else:
+            question = bank.get(self.category, self.difficulty, index)
+        return (self.category, self.difficulty, index), question
+
+    def get_random_question(self):
+        # Takes the question prepare_next_round() drew if it is still for this bucket;
+        # after a difficulty step it goes back to the scheduler unseen.
+        if self.next_question is not None and self.next_question_key[:2] == (self.category, self.difficulty):
+            self.question_key, self.question = self.next_question_key, self.next_question
+        else:
+            if self.next_question is not None:
+                self.scheduler.give_back(*self.next_question_key)
+            self.question_key, self.question = self.draw_question()
+            self.next_anchors = None
+        self.next_question = self.next_question_key = None
+        self.correct_answer = self.question["correct"]
+
+    def prepare_next_round(self):
+        # Runs on the first quiet tick after apples are placed: draws the next question
+        # and samples anchors for its apples, so the pickup tick only checks and swaps
+        # them in. It is part of the rules, so seeded games still replay exactly.
+        self.next_question_key, self.next_question = self.draw_question()
+        self.next_anchors = self.sample_anchors(self.option_count(self.next_question), self.apple_fits)
+
+    def option_count(self, question=None):
+        if self.num_apples is not None:
+            return self.num_apples
+        return min(len((question or self.question)["options"]), MAX_OPTIONS)
+
+    def clear_pickups(self):
+        self.pickups.clear()
+        self.apples = []
+        self.apple_rects = []
+        self.apple_pickups = []
+        self.distractors = []
+        self.apples_version += 1
+        self.distractors_version += 1
+
+    def sample_anchors(self, count, chosen_fits, taken=None):
+        # taken lists anchors already chosen outside this sample that must not overlap.
+        if self.free_cells.body is not self.body:
+            self.free_cells.reset(self.body)
+        if taken:
+            return self.free_cells.sample(count, self.rng, lambda anchor, chosen: chosen_fits(anchor, taken + chosen))
+        accept = chosen_fits if self.apple_span > 1 or len(self.pickups) else None
+        return self.free_cells.sample(count, self.rng, accept)
+
+    def anchor_rect(self, anchor):
+        x, y = self.xy(anchor)
+        return (x, y, x + self.apple_span, y + self.apple_span)
+
+    def place_apples(self):
+        count = self.option_count()
+        options = list(self.question["options"][:count])
+        while len(options) < count:
+            options.append("N/A")
+        self.rng.shuffle(options)
+        for pickup in self.apple_pickups:
+            self.pickups.remove(pickup)
+        anchors = self.take_next_anchors(len(options))
+        if len(anchors) < len(options):
+            anchors += self.sample_anchors(len(options) - len(anchors), self.apple_fits, anchors)
+        if len(anchors) < len(options):
+            # Crowded board: keep the correct answer among the apples that still fit.
+            if anchors and self.correct_answer in options and options.index(self.correct_answer) >= len(anchors):
+                swap = self.rng.randrange(len(anchors))
+                correct = options.index(self.correct_answer)
+                options[swap], options[correct] = options[correct], options[swap]
+            del options[len(anchors):]
+        self.options = options
+        self.apples = anchors
+        self.apple_rects = [self.anchor_rect(anchor) for anchor in anchors]
+        self.apple_pickups = [Pickup(ANSWER, index, anchor, rect) for index, (anchor, rect) in enumerate(zip(anchors, self.apple_rects))]
+        for pickup in self.apple_pickups:
+            self.pickups.insert(pickup)
+        self.apples_version += 1
+
+    def take_next_anchors(self, count):
+        # Prepared anchors that are still free of the snake and of the other pickups.
+        candidates = self.next_anchors
+        self.next_anchors = None
+        anchors = []
+        if candidates:
+            if self.free_cells.body is not self.body:
+                self.free_cells.reset(self.body)
+            for anchor in candidates:
+                if len(anchors) == count:
+                    break
+                if anchor in self.free_cells and self.apple_fits(anchor, anchors):
+                    anchors.append(anchor)
+        return anchors
+
+    def place_distractors(self):
+        for pickup in self.distractors:
+            self.pickups.remove(pickup)
+        self.distractors = []
+        for anchor in self.sample_anchors(self.num_distractors, self.apple_fits):
+            self.add_distractor(anchor)
+        self.distractors_version += 1
+
+    def add_distractor(self, anchor):
+        pickup = Pickup(DISTRACTOR, len(self.distractors), anchor, self.anchor_rect(anchor))
+        self.distractors.append(pickup)
+        self.pickups.insert(pickup)
+
+    def apple_fits(self, anchor, chosen):
+        # The free-cell index already keeps anchors off the snake; this keeps the new
+        # pickup off the ones on the board and the ones already chosen in this batch.
+        span = self.apple_span
+        rect = self.anchor_rect(anchor)
+        if self.pickups.overlaps(rect):
+            return False
+        x, y = rect[0], rect[1]
+        for other in chosen:
+            ox, oy = self.xy(other)
+            if x < ox + span and x + span > ox and y < oy + span and y + span > oy:
+                return False
+        return True
+
+    def apple_at(self, cell):
+        pickup = self.pickups.at_cell(cell)
+        if pickup is not None and pickup.kind == ANSWER:
+            return pickup.index
+        return None
+
+    def step(self, action=None):
+        if self.game_over:
+            return QUIET
+        if action is not None:
+            self.change_to = action
+        if self.change_to != self.direction and self.change_to != OPPOSITES[self.direction]:
+            self.direction = self.change_to
+        self.ticks += 1
+        body = self.body
+        head = self.neighbors[self.direction][body.cells[0]]
+        body.push_head(head)
+        result = QUIET
+        pickup = self.pickups.at_cell(head)
+        if pickup is not None:
+            if pickup.kind == ANSWER:
+                result = self.eat(pickup.index)
+                if result.game_over:
+                    return result
+            else:
+                result = self.hit_distractor(pickup)
+        if not self.grow_snake:
+            body.pop_tail()
+        else:
+            self.grow_snake = False
+        if body.head_collides():
+            if result is QUIET:
+                result = StepResult()
+            self.end(result, 'collision')
+        elif result is QUIET and self.next_question is None:
+            self.prepare_next_round()
+        return result
+
+    def eat(self, index):
+        result = StepResult(index, self.apples[index], self.options[index] == self.correct_answer)
+        if result.correct:
+            self.score += 1
+            self.grow_snake = True
+        else:
+            self.score -= 1
+            self.grow_snake = False
+            if len(self.body) > 2:
+                self.body.pop_tail()
+        self.scheduler.record(*self.question_key, correct=result.correct, question=self.question)
+        self.get_random_question()
+        self.place_apples()
+        self.adjust_difficulty(result)
+        if self.score <= GAME_OVER_SCORE:
+            self.end(result, 'score')
+        return result
+
+    def hit_distractor(self, pickup):
+        # A distractor costs a segment but no points, and moves somewhere else.
+        result = StepResult(apple_cell=pickup.anchor, distractor=True)
+        # Like a wrong answer: the new head is already pushed and step() still drops
+        # the tail, so this leaves the snake at least one segment long.
+        if len(self.body) > 2:
+            self.body.pop_tail()
+        self.respawn_distractor(pickup)
+        return result
+
+    def respawn_distractor(self, pickup):
+        self.pickups.remove(pickup)
+        last = self.distractors.pop()
+        if last is not pickup:
+            last.index = pickup.index
+            self.distractors[pickup.index] = last
+        anchors = self.sample_anchors(1, self.apple_fits)
+        if anchors:
+            self.add_distractor(anchors[0])
+        self.distractors_version += 1
+
+    def adjust_difficulty(self, result):
+        if self.score > 0 and self.score % POINTS_PER_LEVEL == 0:
+            level = DIFFICULTIES.index(self.difficulty)
+            if level + 1 < len(DIFFICULTIES):
+                self.difficulty = DIFFICULTIES[level + 1]
+                result.difficulty_changed = True
+            if self.fps < MAX_FPS:
+                self.fps += 1
+                result.fps_changed = True
+
+    def end(self, result, cause):
+        self.game_over = True
+        self.death_cause = cause
+        result.game_over = True
+        result.death_cause = cause
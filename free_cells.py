@@ -0,0 +1,113 @@
+# Index of the cells where an apple can currently be anchored. An anchor is the
+# bottom-left cell of a span x span apple; it is valid when the apple fits on the board
+# outside the label margins, and free while no snake segment covers its footprint.
+# Free anchors live in a swap-remove array with a position table, so adding, removing
+# and sampling k distinct anchors are all O(1) per anchor. The snake body reports cells
+# it starts or stops covering, which keeps the blocked counts up to date incrementally.
+class FreeCellIndex(object):
+    def __init__(self, cols, rows, span=1, label_rows=0):
+        self.cols = cols
+        self.rows = rows
+        self.span = span
+        self.label_rows = label_rows
+        size = cols * rows
+        self.blocked = [0] * size
+        self.position = [-1] * size
+        self.free = []
+        self.valid = []
+        self.covers = [()] * size
+        x_max = cols - span
+        y_min = label_rows
+        y_max = rows - label_rows - span
+        for y in range(y_min, y_max + 1):
+            for x in range(0, x_max + 1):
+                self.valid.append(y * cols + x)
+        # covers[cell] lists every valid anchor whose footprint includes cell.
+        for y in range(rows):
+            for x in range(cols):
+                anchors = []
+                for ay in range(max(y_min, y - span + 1), min(y_max, y) + 1):
+                    for ax in range(max(0, x - span + 1), min(x_max, x) + 1):
+                        anchors.append(ay * cols + ax)
+                self.covers[y * cols + x] = tuple(anchors)
+        self.body = None
+
+    def __len__(self):
+        return len(self.free)
+
+    def __contains__(self, anchor):
+        return self.position[anchor] >= 0
+
+    def reset(self, body=None):
+        if self.body is not None and self.body is not body and self.body.listener is self:
+            self.body.listener = None
+        self.body = body
+        self.blocked = [0] * (self.cols * self.rows)
+        self.position = [-1] * (self.cols * self.rows)
+        self.free = []
+        for anchor in self.valid:
+            self.add(anchor)
+        if body is not None:
+            self.attach(body)
+
+    # Several bodies can report to one index (the arena's shared board); the blocked
+    # counts then add up across all of them.
+    def attach(self, body):
+        body.listener = self
+        for cell in body.counts:
+            self.occupy(cell)
+
+    def detach(self, body):
+        if body.listener is self:
+            body.listener = None
+        for cell in body.counts:
+            self.vacate(cell)
+
+    def add(self, anchor):
+        self.position[anchor] = len(self.free)
+        self.free.append(anchor)
+
+    def remove(self, anchor):
+        free = self.free
+        index = self.position[anchor]
+        last = free.pop()
+        if last != anchor:
+            free[index] = last
+            self.position[last] = index
+        self.position[anchor] = -1
+
+    def occupy(self, cell):
+        blocked = self.blocked
+        for anchor in self.covers[cell]:
+            count = blocked[anchor]
+            blocked[anchor] = count + 1
+            if not count:
+                self.remove(anchor)
+
+    def vacate(self, cell):
+        blocked = self.blocked
+        for anchor in self.covers[cell]:
+            count = blocked[anchor] - 1
+            blocked[anchor] = count
+            if not count:
+                self.add(anchor)
+
+    def sample(self, k, rng, accept=None):
+        # Partial Fisher-Yates over the free array: every pick is a distinct anchor and
+        # the loop ends after at most len(free) picks, even when fewer than k fit.
+        free = self.free
+        position = self.position
+        chosen = []
+        end = len(free)
+        while len(chosen) < k and end > 0:
+            i = rng.randrange(end)
+            end -= 1
+            anchor = free[i]
+            if i != end:
+                other = free[end]
+                free[i], free[end] = other, anchor
+                position[other] = i
+                position[anchor] = end
+            if accept is None or accept(anchor, chosen):
+                chosen.append(anchor)
+        return chosen
@@ -0,0 +1,179 @@
+# Logging for the game. Every module logs through get_logger(); records go onto a queue
+# and a listener thread formats and writes them, so a log call on the Kivy main thread
+# costs one level check and a queue put. Messages use %-style arguments, which are only
+# formatted on the listener thread and only if the level is enabled.
+#
+# Gameplay events (question_shown, answer, death, fps_change, difficulty_change) go
+# through `events`: subscribers are called right away on the emitting thread, and the
+# events are also logged to the analytics sinks in batches from the listener thread.
+import atexit, json, logging, os, queue, sys, time
+from logging.handlers import QueueHandler, QueueListener
+
+from utils import LOG_LEVEL, ANALYTICS_FILE, ANALYTICS_MAX_BYTES, ANALYTICS_BATCH_SIZE, ANALYTICS_FLUSH_INTERVAL
+
+LOGGER_NAME = 'trivia_snake'
+LOG_FORMAT = '%(levelname)-7s [%(name)s] %(message)s'
+LISTENER_POLL_INTERVAL = 1.0  # Seconds the listener waits for a record before it checks for an overdue batch
+
+def get_logger(name):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+event_logger = get_logger('events')
+
+# QueueHandler formats the message before queueing it; this one queues the record
+# untouched so the formatting happens on the listener thread. Callers must not mutate
+# the arguments they log.
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+# Listener side of the event log: collects event records and hands them to every sink
+# as one list once ANALYTICS_BATCH_SIZE are waiting or the oldest one is older than
+# ANALYTICS_FLUSH_INTERVAL, and on shutdown. The listener calls flush_due() between
+# records, so the last batch of a session does not wait for another event.
+class AnalyticsHandler(logging.Handler):
+    def __init__(self, batch_size=ANALYTICS_BATCH_SIZE, flush_interval=ANALYTICS_FLUSH_INTERVAL):
+        super(AnalyticsHandler, self).__init__()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sinks = []
+        self.batch = []
+        self.batch_started = None
+
+    def filter(self, record):
+        return hasattr(record, 'event')
+
+    def emit(self, record):
+        if not self.batch:
+            self.batch_started = time.monotonic()
+        self.batch.append(record.event)
+        if len(self.batch) >= self.batch_size or time.monotonic() - self.batch_started >= self.flush_interval:
+            self.flush()
+
+    def flush_due(self):
+        if self.batch and time.monotonic() - self.batch_started >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        for sink in list(self.sinks):
+            try:
+                sink(batch)
+            except Exception as e:
+                sys.stderr.write(f"Analytics sink failed: {e}\n")
+
+# QueueListener that stops waiting for records every poll_interval to flush an overdue
+# analytics batch. Both run on the listener thread, so the batch needs no lock.
+class GameLogListener(QueueListener):
+    def __init__(self, log_queue, analytics, *handlers, poll_interval=LISTENER_POLL_INTERVAL, **kwargs):
+        super(GameLogListener, self).__init__(log_queue, analytics, *handlers, **kwargs)
+        self.analytics = analytics
+        self.poll_interval = poll_interval
+
+    def dequeue(self, block):
+        while True:
+            self.analytics.flush_due()
+            try:
+                return self.queue.get(block, self.poll_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+
+# Appends event batches to a JSON Lines file, keeping one previous file once it grows
+# past max_bytes.
+class JsonLinesSink(object):
+    def __init__(self, path=ANALYTICS_FILE, max_bytes=ANALYTICS_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def __call__(self, batch):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, self.path + '.1')
+        with open(self.path, 'a') as file:
+            file.write(''.join(json.dumps(event) + '\n' for event in batch))
+
+# Gameplay event bus. emit() only builds the event dict when someone is subscribed to
+# the event or the event log is enabled.
+class GameEvents(object):
+    def __init__(self):
+        self.subscribers = {}
+
+    def subscribe(self, name, callback):
+        self.subscribers.setdefault(name, []).append(callback)
+
+    def unsubscribe(self, name, callback):
+        callbacks = self.subscribers.get(name)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+
+    def emit(self, name, **fields):
+        callbacks = self.subscribers.get(name)
+        logged = event_logger.isEnabledFor(logging.INFO)
+        if not callbacks and not logged:
+            return
+        event = dict(fields, event=name, time=time.time())
+        if callbacks:
+            for callback in callbacks:
+                callback(event)
+        if logged:
+            event_logger.info('%s %s', name, fields, extra={'event': event})
+
+events = GameEvents()
+
+# Owns the queue, the listener thread and the analytics handler. setup() is safe to
+# call more than once; the CLIs and the app each call it at startup.
+class GameLog(object):
+    def __init__(self):
+        self.listener = None
+        self.analytics = AnalyticsHandler()
+
+    def setup(self, level=None, stream=None, analytics_file=ANALYTICS_FILE):
+        if self.listener is not None:
+            return
+        level = level or os.environ.get('TRIVIA_SNAKE_LOG_LEVEL', LOG_LEVEL)
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger(LOGGER_NAME)
+        console = logging.StreamHandler(stream or sys.stdout)
+        console.setFormatter(logging.Formatter(LOG_FORMAT))
+        # Events are logged at INFO for the analytics handler; the console only shows
+        # them at DEBUG.
+        console.addFilter(lambda record: not hasattr(record, 'event') or root.isEnabledFor(logging.DEBUG))
+        if analytics_file:
+            self.analytics.sinks.append(JsonLinesSink(analytics_file))
+        root.setLevel(level)
+        root.propagate = False
+        root.addHandler(DeferredQueueHandler(log_queue))
+        # Without a sink, events are only built when the console would show them.
+        event_logger.setLevel(logging.INFO if self.analytics.sinks or root.isEnabledFor(logging.DEBUG) else logging.WARNING)
+        self.listener = GameLogListener(log_queue, self.analytics, console, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.shutdown)
+
+    def add_sink(self, sink):
+        # sink is called on the listener thread with a list of event dicts.
+        self.analytics.sinks.append(sink)
+        event_logger.setLevel(logging.INFO)
+
+    def flush(self):
+        # Writes out everything logged so far. The app calls this from on_stop, because
+        # atexit handlers are not guaranteed to run on Android.
+        if self.listener is not None:
+            self.listener.stop()
+            self.analytics.flush()
+            self.listener.start()
+
+    def shutdown(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.analytics.flush()
+
+game_log = GameLog()
+
+def setup_logging(level=None, stream=None, analytics_file=ANALYTICS_FILE):
+    game_log.setup(level, stream, analytics_file)
+
+def flush_logging():
+    game_log.flush()
@@ -0,0 +1,101 @@
+import time
+from collections import deque
+from kivy.clock import Clock
+
+from profiler import profiler
+
+MAX_TICKS_PER_FRAME = 5     # Ticks run in one frame before the backlog is dropped
+MAX_FRAME_DT = 0.25         # Longest frame gap fed into the accumulator (e.g. after a pause)
+STATS_WINDOW = 240          # Samples kept for the frame and tick time statistics
+
+# Renders on every display frame and runs game ticks from a fixed-timestep accumulator.
+# The tick rate can be changed at any time without touching the Clock schedule, and
+# render() gets the fraction of the next tick that has elapsed for interpolation.
+class FixedStepLoop(object):
+    def __init__(self, tick, render, tick_rate):
+        self.tick = tick
+        self.render = render
+        self.tick_rate = tick_rate
+        self.accumulator = 0.0
+        self.event = None
+        self.frame_intervals = deque(maxlen=STATS_WINDOW)
+        self.frame_times = deque(maxlen=STATS_WINDOW)
+        self.tick_times = deque(maxlen=STATS_WINDOW)
+        self.dropped_ticks = 0
+        self.frame_listener = None  # Called with (frame interval, render time) after each frame
+
+    @property
+    def running(self):
+        return self.event is not None
+
+    def set_tick_rate(self, tick_rate):
+        self.tick_rate = tick_rate
+
+    def start(self):
+        self.stop()
+        self.accumulator = 0.0
+        self.frame_intervals.clear()
+        self.frame_times.clear()
+        self.tick_times.clear()
+        self.dropped_ticks = 0
+        self.event = Clock.schedule_interval(self.frame, 0)
+
+    def stop(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+    def frame(self, dt):
+        frame_start = time.perf_counter()
+        profiling = profiler.enabled
+        if profiling:
+            profiler.begin_frame()
+        self.frame_intervals.append(dt)
+        self.accumulator += min(dt, MAX_FRAME_DT)
+        step = 1.0 / self.tick_rate
+        ticks = 0
+        while self.accumulator >= step:
+            if ticks == MAX_TICKS_PER_FRAME:
+                self.dropped_ticks += int(self.accumulator / step)
+                self.accumulator %= step
+                break
+            tick_start = time.perf_counter()
+            self.tick()
+            tick_end = time.perf_counter()
+            self.tick_times.append(tick_end - tick_start)
+            if profiling:
+                profiler.record('tick', tick_start, tick_end)
+            if self.event is None:
+                return
+            self.accumulator -= step
+            ticks += 1
+            step = 1.0 / self.tick_rate
+        render_start = time.perf_counter()
+        self.render(min(1.0, self.accumulator / step))
+        frame_end = time.perf_counter()
+        self.frame_times.append(frame_end - frame_start)
+        if self.frame_listener is not None:
+            self.frame_listener(dt, frame_end - render_start)
+        if profiling:
+            profiler.record('draw', render_start, frame_end)
+            profiler.end_frame(frame_start, frame_end)
+
+    def stats(self):
+        def summary(samples):
+            if not samples:
+                return 0.0, 0.0
+            return 1000.0 * sum(samples) / len(samples), 1000.0 * max(samples)
+        interval_avg, interval_max = summary(self.frame_intervals)
+        frame_avg, frame_max = summary(self.frame_times)
+        tick_avg, tick_max = summary(self.tick_times)
+        return {
+            'tick_rate': self.tick_rate,
+            'frames_per_second': 1000.0 / interval_avg if interval_avg else 0.0,
+            'frame_interval_ms_avg': interval_avg,
+            'frame_interval_ms_max': interval_max,
+            'frame_ms_avg': frame_avg,
+            'frame_ms_max': frame_max,
+            'tick_ms_avg': tick_avg,
+            'tick_ms_max': tick_max,
+            'dropped_ticks': self.dropped_ticks,
+        }
@@ -1,191 +1,285 @@
-import json, os, random
+import math, os, random, time
+from collections import deque
+from itertools import islice
 from kivy.app import App
 from kivy.core.window import Window
-from kivy.graphics import Rectangle
+from kivy.graphics import Color, Rectangle
 from kivy.uix.widget import Widget
 from kivy.clock import Clock
-from kivy.metrics import dp
 from kivy.core.text import Label as CoreLabel
-from kivy.core.image import Image as CoreImage
-from kivy.core.audio import SoundLoader
-from PIL import Image as PILImage
-from kivy.graphics.texture import Texture
 
-from utils import YELLOW, WHITE, MIN_FPS, MAX_FPS, INITIAL_FPS, ASSETS_DIR, SOUNDS_DIR, trivia_questions
+from renderer import SnakeRenderer, ProfilerOverlay, DISTRACTOR_TINT
+from assets import assets
+from audio import get_audio_engine
+from autopilot import Autopilot
+from engine import SnakeEngine
+from profiler import profiler
+from game_log import events, get_logger
+from game_loop import FixedStepLoop
+from grid import GridTransform
+from quality import QualityGovernor
+from question_packs import get_pack_bank
+from replay import ReplayHeader, ReplayWriter, new_replay_path
+from scheduler import QuestionScheduler
+from snake_body import SnakeBody
+from storage import get_game_store
+from text_cache import TextTextureCache, text_cache
+from utils import YELLOW, WHITE, MIN_FPS, MAX_FPS, INITIAL_FPS, REPLAY_DIR, RETAINED_RENDERING, PROFILING, DEBUG_CONTROLS, PROFILE_TRACE_FILE, AUTOPILOT, ADAPTIVE_QUALITY, QUALITY_TARGET_FPS, LABEL_PREFETCH_BUDGET
+
+log = get_logger('game')
 
 class GameWidget(Widget):
     def __init__(self, question_callback, **kwargs):
         super(GameWidget, self).__init__(**kwargs)
         self.app = App.get_running_app()
         self.question_callback = question_callback
+        self.next_question_callback = None  # Gets the upcoming question text to lay out ahead of time
+        self.prefetched_question = None
+        self.label_prefetch = deque()
         self.WIDTH, self.HEIGHT = Window.size
         Window.bind(size=self.update_size)
-        self.snake_direction = 'RIGHT'
-        self.change_to = self.snake_direction
-        self.snake_pos = [self.WIDTH // 2, self.HEIGHT // 2]
-        self.snake_body = []
-        self.score = 0
-        self.high_score = 0
+        self.store = get_game_store()
+        self.high_score = self.store.high_score
         self.fps = INITIAL_FPS
-        self.grow_snake = False
         self.swipe_start = None
-        self.question_data = None
-        self.correct_answer = None
-        self.apple_positions = []
-        self.options = []
+        # Debug gestures stay off in release builds, where a stray triple tap would
+        # otherwise start the profiler.
+        self.debug_controls = DEBUG_CONTROLS or os.environ.get('TRIVIA_SNAKE_DEBUG') == '1'
         self.category = None
-        self.current_difficulty = 'Easy'
+        self.replay = None
+        self.replay_dir = REPLAY_DIR
+        self.arena = None
+        self.sent_direction = None
+        self.autopilot_enabled = AUTOPILOT
+        self.autopilot = None
+        self.scheduler = self.load_question_state()
+        self.grid = GridTransform()
+        self.engine = self.create_engine()
+        self.refresh_grid()
+        self.change_to = self.engine.direction
         self.load_assets()
-        self.load_background()
-        self.checkmark_texture = self.load_icon('checkmark.png')
-        self.wrong_texture = self.load_icon('wrong.png')
         self.active_feedback = []
-        self.correct_sound = SoundLoader.load(os.path.join(SOUNDS_DIR, 'correct.wav'))
-        self.wrong_sound = SoundLoader.load(os.path.join(SOUNDS_DIR, 'wrong.wav'))
-        self.high_score_file = os.path.join(os.path.dirname(__file__), 'high_score.json')
-        self.load_high_score()
-
-    def load_icon(self, name):
-        fullname = os.path.join(ASSETS_DIR, name)
-        if not os.path.exists(fullname):
-            print(f"Cannot load icon image: {fullname}")
-            App.get_running_app().stop()
-        pil_image = PILImage.open(fullname).convert('RGBA')
-        data = pil_image.tobytes()
-        texture = Texture.create(size=pil_image.size)
-        texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
-        texture.flip_vertical()
-        return texture
+        self.audio = get_audio_engine()
+        self.retained_rendering = RETAINED_RENDERING
+        self.renderer = SnakeRenderer(self)
+        self.loop = FixedStepLoop(self.update, self.draw_elements, self.fps)
+        # The governor only changes how frames are drawn; the tick rate stays self.fps.
+        self.quality_governor = None
+        if ADAPTIVE_QUALITY:
+            self.quality_governor = QualityGovernor(QUALITY_TARGET_FPS, self.renderer.set_quality)
+            self.loop.frame_listener = self.quality_governor.record
+        self.immediate_ticks = None
+        self.profiler_overlay = ProfilerOverlay(self)
+        self.setup_profiler()
+        Window.bind(on_key_down=self.on_key_down)
 
     def update_size(self, instance, size):
         self.WIDTH, self.HEIGHT = size
+        self.refresh_grid()
+
+    def refresh_grid(self):
+        # Only recomputes after a resize, a settings change or a new board, so calling it
+        # once per tick and frame replaces all the per-element dp() calls.
+        engine = self.engine
+        self.grid.update(self.WIDTH, self.HEIGHT, self.app.snake_size, self.app.apple_size, self.app.icon_size,
+                         engine.cols, engine.rows, engine.apple_span if self.arena is not None else None)
 
     def load_assets(self):
-        self.snake_head_textures = {
-            'RIGHT': self.load_image('snake_head.png', 0),
-            'UP': self.load_image('snake_head.png', 90),
-            'LEFT': self.load_image('snake_head.png', 180),
-            'DOWN': self.load_image('snake_head.png', -90)
+        self.snake_head_sprites = {
+            'RIGHT': assets.sprite('snake_head.png', 0),
+            'UP': assets.sprite('snake_head.png', 90),
+            'LEFT': assets.sprite('snake_head.png', 180),
+            'DOWN': assets.sprite('snake_head.png', -90)
         }
-        self.snake_body_texture = self.load_image('snake_body.png')
-        self.apple_texture = self.load_image('apple.png')
-
-    def load_image(self, name, angle=0):
-        fullname = os.path.join(ASSETS_DIR, name)
-        if not os.path.exists(fullname):
-            print(f"Cannot load image: {fullname}")
-            App.get_running_app().stop()
-        pil_image = PILImage.open(fullname).convert('RGBA')
-        if angle != 0:
-            pil_image = pil_image.rotate(angle, expand=True)
-        data = pil_image.tobytes()
-        texture = Texture.create(size=pil_image.size)
-        texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
-        texture.flip_vertical()
-        return texture
-
-    def load_background(self):
-        background_path = os.path.join(ASSETS_DIR, 'background.jpg')
-        if os.path.exists(background_path):
-            self.background_texture = CoreImage(background_path).texture
-            self.background_texture.wrap = 'repeat'
-        else:
-            print(f"Background image not found: {background_path}")
-            self.background_texture = None
+        self.snake_body_sprite = assets.sprite('snake_body.png')
+        self.apple_sprite = assets.sprite('apple.png')
+        self.checkmark_sprite = assets.sprite('checkmark.png')
+        self.wrong_sprite = assets.sprite('wrong.png')
+        self.background_texture = assets.texture('background.jpg', wrap='repeat')
 
-    def load_high_score(self):
-        if os.path.exists(self.high_score_file):
-            try:
-                with open(self.high_score_file, 'r') as file:
-                    data = json.load(file)
-                    self.high_score = data.get('high_score', 0)
-                    print(f"Loaded high score: {self.high_score}")
-            except Exception as e:
-                print(f"Error loading high score: {e}")
-                self.high_score = 0
+    def setup_profiler(self):
+        profiler.add_hook(self, 'detect_swipe', 'input')
+        profiler.add_hook(SnakeBody, 'push_head', 'movement')
+        profiler.add_hook(SnakeBody, 'pop_tail', 'movement')
+        profiler.add_hook(SnakeBody, 'head_collides', 'collision')
+        profiler.add_hook(SnakeEngine, 'get_random_question', 'question_fetch')
+        profiler.add_hook(SnakeEngine, 'place_apples', 'apple_placement')
+        profiler.add_hook(SnakeEngine, 'prepare_next_round', 'prefetch')
+        profiler.add_hook(TextTextureCache, 'render', 'labels')
+        if PROFILING:
+            self.toggle_profiler()
+
+    def toggle_profiler(self):
+        if profiler.toggle():
+            profiler.clear()
+            self.profiler_overlay.show()
+            log.info("Profiler enabled")
         else:
-            self.high_score = 0
+            self.profiler_overlay.hide()
+            self.save_profiler_trace()
 
-    def save_high_score(self):
-        data = {'high_score': self.high_score}
+    def save_profiler_trace(self):
+        # App.user_data_dir creates the directory, so it can fail like the write itself.
+        app = App.get_running_app()
         try:
-            with open(self.high_score_file, 'w') as file:
-                json.dump(data, file)
-                print(f"Saved high score: {self.high_score}")
-        except Exception as e:
-            print(f"Error saving high score: {e}")
+            directory = app.user_data_dir if app is not None else os.getcwd()
+            profiler.export_chrome_trace(os.path.join(directory, PROFILE_TRACE_FILE))
+        except OSError as e:
+            log.error("Error writing profiler trace: %s", e)
+
+    def toggle_autopilot(self):
+        self.autopilot_enabled = not self.autopilot_enabled
+        self.autopilot = Autopilot(self.engine) if self.autopilot_enabled and self.arena is None else None
+        log.info("Autopilot %s", 'enabled' if self.autopilot_enabled else 'disabled')
+
+    def on_key_down(self, window, key, scancode, codepoint, modifiers):
+        if key == 283:  # F2
+            self.toggle_autopilot()
+            return True
+        if key == 284:  # F3
+            self.toggle_profiler()
+            return True
+        return False
+
+    def load_question_state(self):
+        state = self.store.question_state
+        if state:
+            try:
+                return QuestionScheduler.from_dict(state, get_pack_bank())
+            except Exception as e:
+                log.warning("Error loading question state: %s", e)
+        return QuestionScheduler(get_pack_bank())
 
     def start_game(self, category):
-        print(f"Starting game with category: {category}")
+        log.info("Starting game with category: %s", category)
+        self.leave_arena()
         self.category = category
-        self.current_difficulty = 'Easy'
-        self.snake_direction = 'RIGHT'
-        self.change_to = self.snake_direction
         self.WIDTH, self.HEIGHT = Window.size
-        self.snake_pos = [self.WIDTH // 2, self.HEIGHT // 2]
-        self.snake_body = [
-            [self.snake_pos[0], self.snake_pos[1]],
-            [self.snake_pos[0] - self.get_snake_size(), self.snake_pos[1]],
-            [self.snake_pos[0] - (2 * self.get_snake_size()), self.snake_pos[1]]
-        ]
-        self.score = 0
-        self.grow_snake = False
+        # Every game gets its own seed and the scheduler draws from the engine's random
+        # generator, so the replay header plus the inputs reproduce the whole game.
+        seed = random.getrandbits(63)
+        self.engine = self.create_engine(seed)
+        self.refresh_grid()
+        self.scheduler.rng = self.engine.rng
+        header = ReplayHeader.for_engine(self.engine, seed, category, self.fps, self.scheduler.to_dict())
+        self.engine.reset(category, fps=self.fps)
+        self.autopilot = Autopilot(self.engine) if self.autopilot_enabled else None
+        self.close_replay()
+        self.replay = ReplayWriter(new_replay_path(self.replay_dir), header)
+        self.change_to = self.engine.direction
+        self.swipe_start = None
+        self.active_feedback = []
+        self.prefetched_question = None
+        self.label_prefetch.clear()
+        self.question_callback(self.engine.question["question"])
+        self.emit_question_shown()
+        self.update_score_labels()
+        self.renderer.detach()
+        self.immediate_ticks = None
+        self.canvas.clear()
+        if self.quality_governor is not None:
+            self.quality_governor.reset()
+        self.loop.set_tick_rate(self.fps)
+        self.loop.start()
+
+    def join_arena(self, host, port, room, name='player'):
+        # Client mode: the arena server runs the rules and this widget mirrors the room,
+        # sending a direction only when it changes.
+        from arena_client import ArenaClient, ArenaView
+        log.info("Joining arena room %s on %s:%s", room, host, port)
+        self.loop.stop()
+        self.close_replay()
+        self.leave_arena()
+        self.category = None
+        self.WIDTH, self.HEIGHT = Window.size
+        self.engine = ArenaView()
+        self.autopilot = None
+        self.arena = ArenaClient(host, port, room, name)
+        self.change_to = self.sent_direction = self.engine.direction
         self.swipe_start = None
-        self.apple_positions = []
-        self.options = []
-        self.get_random_question()
-        self.place_apples()
+        self.active_feedback = []
+        self.question_callback(self.engine.question["question"])
         self.update_score_labels()
+        self.renderer.detach()
+        self.immediate_ticks = None
         self.canvas.clear()
-        Clock.unschedule(self.game_event) if hasattr(self, 'game_event') else None
-        self.game_event = Clock.schedule_interval(self.update, 1 / self.fps)
+        self.fps = self.engine.tick_rate
+        self.loop.set_tick_rate(self.fps)
+        self.loop.start()
+
+    def leave_arena(self):
+        if self.arena is not None:
+            self.arena.close()
+            self.arena = None
+
+    def close_replay(self, wait=False):
+        # wait is for shutdown, where the daemon writer thread would die with the app.
+        if self.replay is not None:
+            self.replay.close(wait)
+            self.replay = None
+
+    def create_engine(self, seed=None):
+        # An empty board only derives the pixel sizes the new board is measured with.
+        grid = self.grid
+        grid.update(self.WIDTH, self.HEIGHT, self.app.snake_size, self.app.apple_size, self.app.icon_size, 0, 0)
+        cols, rows = grid.board_size(self.WIDTH, self.HEIGHT)
+        apple_span = max(1, int(math.ceil(grid.apple_size / grid.cell_size)))
+        vertical_margin = grid.apple_size + grid.margin + grid.label_gap
+        label_rows = int(math.ceil(vertical_margin / grid.cell_size))
+        return SnakeEngine(cols, rows, questions=get_pack_bank(), seed=seed, apple_span=apple_span, label_rows=label_rows, scheduler=self.scheduler,
+                           distractors=getattr(self.app, 'storm_pickups', 0))
+
+    def cell_pos(self, cell):
+        return self.grid.cell_pos(cell)
+
+    @property
+    def snake_body(self):
+        return self.engine.body
+
+    @property
+    def snake_direction(self):
+        return self.engine.direction
+
+    @property
+    def score(self):
+        return self.engine.score
+
+    @property
+    def options(self):
+        return self.engine.options
+
+    @property
+    def apple_positions(self):
+        return [self.cell_pos(cell) for cell in self.engine.apples]
+
+    @property
+    def distractor_positions(self):
+        return [self.cell_pos(pickup.anchor) for pickup in self.engine.distractors]
+
+    @property
+    def question_data(self):
+        return self.engine.question
+
+    @property
+    def correct_answer(self):
+        return self.engine.correct_answer
+
+    @property
+    def current_difficulty(self):
+        return self.engine.difficulty
 
     def get_snake_size(self):
-        return dp(self.app.snake_size)
+        return self.grid.cell_size
 
     def get_apple_size(self):
-        return dp(self.app.apple_size)
+        return self.grid.apple_size
 
     def get_icon_size(self):
-        return dp(self.app.icon_size)
-
-    def place_apples(self):
-        num_apples = 3
-        self.apple_positions = []
-        if self.question_data and "options" in self.question_data:
-            options = self.question_data["options"][:3]
-            random.shuffle(options)
-            self.options = options
-        else:
-            self.options = ["Option 1", "Option 2", "Option 3"]
-        estimated_text_height = dp(30)
-        vertical_margin = self.get_apple_size() + dp(10) + estimated_text_height
-        while len(self.apple_positions) < num_apples:
-            x_max = int((self.WIDTH - self.get_apple_size()) // self.get_apple_size())
-            y_max = int((self.HEIGHT - 2 * vertical_margin - self.get_apple_size()) // self.get_apple_size())
-            if x_max <= 0 or y_max <= 0:
-                print("Screen too small for apples.")
-                break
-            x = random.randint(0, x_max) * self.get_apple_size()
-            y = random.randint(0, y_max) * self.get_apple_size() + vertical_margin
-            if [x, y] not in self.snake_body and [x, y] not in self.apple_positions:
-                self.apple_positions.append([x, y])
-
-    def get_random_question(self):
-        available_questions = trivia_questions.get(self.category, {}).get(self.current_difficulty, [])
-        if not available_questions:
-            print(f"No {self.current_difficulty} questions available for category '{self.category}'.")
-            self.question_data = {"question": "No questions available.", "options": ["N/A", "N/A", "N/A"], "correct": "N/A"}
-        else:
-            self.question_data = random.choice(available_questions)
-            print(f"Selected question data: {self.question_data}")
-            self.question_data["options"] = self.question_data["options"][:3]
-            while len(self.question_data["options"]) < 3:
-                self.question_data["options"].append("N/A")
-        self.correct_answer = self.question_data["correct"]
-        self.question_callback(self.question_data["question"])
+        return self.grid.icon_size
 
     def on_touch_down(self, touch):
+        if touch.is_triple_tap and self.debug_controls:
+            self.toggle_profiler()
         self.swipe_start = touch.pos
 
     def on_touch_up(self, touch):
@@ -206,90 +300,94 @@ class GameWidget(Widget):
                 return 'UP' if dy > 0 else 'DOWN'
         return self.snake_direction
 
-    def update(self, dt):
-        if self.change_to == 'UP' and self.snake_direction != 'DOWN':
-            self.snake_direction = 'UP'
-        elif self.change_to == 'DOWN' and self.snake_direction != 'UP':
-            self.snake_direction = 'DOWN'
-        elif self.change_to == 'LEFT' and self.snake_direction != 'RIGHT':
-            self.snake_direction = 'LEFT'
-        elif self.change_to == 'RIGHT' and self.snake_direction != 'LEFT':
-            self.snake_direction = 'RIGHT'
-        if self.snake_direction == 'UP':
-            self.snake_pos[1] += self.get_snake_size()
-        elif self.snake_direction == 'DOWN':
-            self.snake_pos[1] -= self.get_snake_size()
-        elif self.snake_direction == 'LEFT':
-            self.snake_pos[0] -= self.get_snake_size()
-        elif self.snake_direction == 'RIGHT':
-            self.snake_pos[0] += self.get_snake_size()
-        self.snake_pos[0] %= self.WIDTH
-        self.snake_pos[1] %= self.HEIGHT
-        self.snake_body.insert(0, list(self.snake_pos))
-        head_rect = (self.snake_pos[0], self.snake_pos[1], self.get_snake_size(), self.get_snake_size())
-        for i in range(len(self.apple_positions)):
-            apple = self.apple_positions[i]
-            apple_rect = (apple[0], apple[1], self.get_apple_size(), self.get_apple_size())
-            if self.check_collision(head_rect, apple_rect):
-                selected_option = self.options[i] if i < len(self.options) else ""
-                if selected_option == self.correct_answer:
-                    self.score += 1
-                    self.grow_snake = True
-                    print("Correct Answer!")
-                    self.show_feedback(True, apple)
-                else:
-                    self.score -= 1
-                    self.grow_snake = False
-                    if len(self.snake_body) > 1:
-                        self.snake_body.pop()
-                    print("Wrong Answer!")
-                    self.show_feedback(False, apple)
-                self.apple_positions.pop(i)
-                if i < len(self.options):
-                    self.options.pop(i)
-                self.get_random_question()
-                self.place_apples()
-                self.update_score_labels()
-                self.adjust_difficulty()
-                if self.score <= -3:
-                    if self.score > self.high_score:
-                        self.high_score = self.score
-                        self.save_high_score()
-                        print(f"New high score: {self.high_score}")
-                    self.game_over()
-                    return
-                break
-        if not self.grow_snake:
-            self.snake_body.pop()
-        else:
-            self.grow_snake = False
-        if self.snake_body[0] in self.snake_body[1:]:
-            if self.score > self.high_score:
-                self.high_score = self.score
-                self.save_high_score()
-                print(f"New high score: {self.high_score}")
+    def update(self):
+        if self.arena is not None:
+            self.update_arena()
+            return
+        self.refresh_grid()
+        if self.autopilot is not None:
+            self.change_to = self.autopilot.act()
+        if self.replay is not None:
+            self.replay.record(self.change_to)
+        engine = self.engine
+        question_key = engine.question_key
+        result = engine.step(self.change_to)
+        if engine.next_question is not self.prefetched_question:
+            self.prefetch_next_round()
+        if result.apple is not None:
+            log.debug("%s answer", "Correct" if result.correct else "Wrong")
+            events.emit('answer', category=question_key[0], difficulty=question_key[1], index=question_key[2],
+                        correct=result.correct, score=engine.score, ticks=engine.ticks)
+            self.show_feedback(result.correct, self.cell_pos(result.apple_cell))
+            self.question_callback(engine.question["question"])
+            self.emit_question_shown()
+            self.update_score_labels()
+            if result.difficulty_changed:
+                log.debug("Difficulty increased to %s", engine.difficulty)
+                events.emit('difficulty_change', difficulty=engine.difficulty, score=engine.score)
+            if result.fps_changed:
+                events.emit('fps_change', old=self.fps, new=engine.fps, reason='level')
+                self.fps = engine.fps
+                self.loop.set_tick_rate(self.fps)
+        elif result.distractor:
+            self.show_feedback(False, self.cell_pos(result.apple_cell))
+        if result.game_over:
             self.game_over()
             return
-        self.draw_elements()
         current_time = Clock.get_boottime()
         self.active_feedback = [fb for fb in self.active_feedback if fb['expire_time'] > current_time]
 
-    def adjust_difficulty(self):
-        if self.score > 0 and self.score % 5 == 0:
-            if self.current_difficulty == 'Easy':
-                self.current_difficulty = 'Medium'
-                print("Difficulty increased to Medium!")
-            elif self.current_difficulty == 'Medium':
-                self.current_difficulty = 'Hard'
-                print("Difficulty increased to Hard!")
-            elif self.current_difficulty == 'Hard':
-                print("Already at Hard difficulty.")
-            self.fps += 1
-            if self.fps > MAX_FPS:
-                self.fps = MAX_FPS
-                print("FPS reached maximum limit.")
-            Clock.unschedule(self.game_event)
-            self.game_event = Clock.schedule_interval(self.update, 1 / self.fps)
+    def emit_question_shown(self):
+        category, difficulty, index = self.engine.question_key
+        events.emit('question_shown', category=category, difficulty=difficulty, index=index, options=len(self.engine.options))
+
+    def prefetch_next_round(self):
+        # The engine drew the next question on a quiet tick. Its text goes to the hidden
+        # question label and its option labels plus both possible score labels are queued
+        # for the text cache, one per frame, so the pickup tick finds them all built.
+        question = self.prefetched_question = self.engine.next_question
+        self.label_prefetch.clear()
+        if question is None:
+            return
+        if self.next_question_callback is not None:
+            self.next_question_callback(question["question"])
+        if self.retained_rendering:
+            scores = [f"Score: {self.score + 1}", f"Score: {self.score - 1}"]
+            self.label_prefetch.extend(self.renderer.label_requests(question["options"], scores))
+
+    def render_prefetched_labels(self):
+        # At least one label per frame, more while the frame's prefetch budget lasts.
+        deadline = time.perf_counter() + LABEL_PREFETCH_BUDGET
+        while self.label_prefetch:
+            text_cache.get(*self.label_prefetch.popleft())
+            if time.perf_counter() > deadline:
+                break
+
+    def update_arena(self):
+        engine = self.engine
+        score = engine.score
+        question_changed = False
+        for kind, payload in self.arena.poll():
+            question_changed = engine.apply(kind, payload) or question_changed
+        # The arena board is scaled to fit the window once the server has sent its size.
+        self.refresh_grid()
+        if engine.tick_rate != self.fps:
+            self.fps = engine.tick_rate
+            self.loop.set_tick_rate(self.fps)
+        if question_changed:
+            self.question_callback(engine.question["question"])
+        if engine.score != score:
+            self.update_score_labels()
+            if engine.body:
+                self.show_feedback(engine.score > score, self.cell_pos(engine.body[0]))
+        if self.change_to != self.sent_direction:
+            self.sent_direction = self.change_to
+            self.arena.send_input(self.change_to)
+        if engine.game_over:
+            self.game_over()
+            return
+        current_time = Clock.get_boottime()
+        self.active_feedback = [fb for fb in self.active_feedback if fb['expire_time'] > current_time]
 
     def adjust_fps(self, delta):
         new_fps = self.fps + delta
@@ -298,81 +396,109 @@ class GameWidget(Widget):
         elif new_fps > MAX_FPS:
             new_fps = MAX_FPS
         if new_fps != self.fps:
-            print(f"Adjusting FPS from {self.fps} to {new_fps}")
+            log.info("Adjusting FPS from %d to %d", self.fps, new_fps)
+            events.emit('fps_change', old=self.fps, new=new_fps, reason='manual')
             self.fps = new_fps
-            Clock.unschedule(self.game_event)
-            self.game_event = Clock.schedule_interval(self.update, 1 / self.fps)
+            self.engine.fps = new_fps
+            self.loop.set_tick_rate(self.fps)
         else:
-            print(f"FPS is already at the {'minimum' if delta < 0 else 'maximum'} limit: {self.fps}")
+            log.debug("FPS is already at the %s limit: %d", 'minimum' if delta < 0 else 'maximum', self.fps)
 
     def update_score_labels(self):
         self.score_label_text = f"Score: {self.score}"
         self.high_score_label_text = f"High Score: {self.high_score}"
 
-    def check_collision(self, rect1, rect2):
-        return (rect1[0] < rect2[0] + rect2[2] and rect1[0] + rect1[2] > rect2[0] and rect1[1] < rect2[1] + rect2[3] and rect1[1] + rect1[3] > rect2[1])
+    def draw_elements(self, alpha=1.0):
+        self.refresh_grid()
+        if self.retained_rendering:
+            self.renderer.draw(alpha)
+            if self.label_prefetch:
+                self.render_prefetched_labels()
+        elif self.engine.ticks != self.immediate_ticks:
+            self.immediate_ticks = self.engine.ticks
+            self.renderer.detach()
+            self.draw_elements_immediate()
 
-    def draw_elements(self):
+    def draw_elements_immediate(self):
+        # Old path: rebuilds every instruction and only draws whole ticks, no interpolation.
         self.canvas.clear()
+        if not self.snake_body:
+            return
+        grid = self.grid
         with self.canvas:
             if self.background_texture:
                 Rectangle(texture=self.background_texture, pos=(0, 0), size=self.size)
-            head_x, head_y = self.snake_body[0]
-            head_texture = self.snake_head_textures[self.snake_direction]
-            Rectangle(texture=head_texture, pos=(head_x, head_y), size=(self.get_snake_size(), self.get_snake_size()))
-            for segment in self.snake_body[1:]:
-                Rectangle(texture=self.snake_body_texture, pos=segment, size=(self.get_snake_size(), self.get_snake_size()))
+            head_x, head_y = self.cell_pos(self.snake_body[0])
+            head_sprite = self.snake_head_sprites[self.snake_direction]
+            Rectangle(texture=head_sprite.texture, tex_coords=head_sprite.tex_coords, pos=(head_x, head_y), size=(grid.cell_size, grid.cell_size))
+            for segment in islice(self.snake_body, 1, None):
+                Rectangle(texture=self.snake_body_sprite.texture, tex_coords=self.snake_body_sprite.tex_coords, pos=self.cell_pos(segment), size=(grid.cell_size, grid.cell_size))
+            if self.engine.distractors:
+                Color(*DISTRACTOR_TINT)
+                for pos in self.distractor_positions:
+                    Rectangle(texture=self.apple_sprite.texture, tex_coords=self.apple_sprite.tex_coords, pos=pos, size=(grid.apple_size, grid.apple_size))
+                Color(1, 1, 1, 1)
             for i, apple in enumerate(self.apple_positions):
-                Rectangle(texture=self.apple_texture, pos=apple, size=(self.get_apple_size(), self.get_apple_size()))
+                Rectangle(texture=self.apple_sprite.texture, tex_coords=self.apple_sprite.tex_coords, pos=apple, size=(grid.apple_size, grid.apple_size))
                 option_text = self.options[i] if i < len(self.options) else ""
-                option_label = CoreLabel(text=option_text, font_size=dp(20), color=WHITE)
+                option_label = CoreLabel(text=option_text, font_size=grid.option_font_size, color=WHITE)
                 option_label.refresh()
                 text_texture = option_label.texture
                 text_size = text_texture.size
-                if apple[1] + self.get_apple_size() + dp(10) + text_size[1] > self.HEIGHT:
-                    text_y = apple[1] - text_size[1] - dp(10)
+                if apple[1] + grid.apple_size + grid.margin + text_size[1] > self.HEIGHT:
+                    text_y = apple[1] - text_size[1] - grid.margin
                 else:
-                    text_y = apple[1] + self.get_apple_size() + dp(10)
-                text_x = apple[0] + (self.get_apple_size() - text_size[0]) / 2
+                    text_y = apple[1] + grid.apple_size + grid.margin
+                text_x = apple[0] + (grid.apple_size - text_size[0]) / 2
                 if text_x + text_size[0] > self.WIDTH:
-                    text_x = self.WIDTH - text_size[0] - dp(10)
+                    text_x = self.WIDTH - text_size[0] - grid.margin
                 elif text_x < 0:
-                    text_x = dp(10)
+                    text_x = grid.margin
                 Rectangle(texture=text_texture, pos=(text_x, text_y), size=text_size)
-            score_label = CoreLabel(text=self.score_label_text, font_size=dp(24), color=WHITE)
+            score_label = CoreLabel(text=self.score_label_text, font_size=grid.hud_font_size, color=WHITE)
             score_label.refresh()
             text_texture = score_label.texture
             text_size = text_texture.size
-            Rectangle(texture=text_texture, pos=(dp(10), dp(10)), size=text_size)
-            high_score_label = CoreLabel(text=self.high_score_label_text, font_size=dp(24), color=YELLOW)
+            Rectangle(texture=text_texture, pos=(grid.margin, grid.margin), size=text_size)
+            high_score_label = CoreLabel(text=self.high_score_label_text, font_size=grid.hud_font_size, color=YELLOW)
             high_score_label.refresh()
             text_texture = high_score_label.texture
             text_size = text_texture.size
-            Rectangle(texture=text_texture, pos=(self.WIDTH - text_size[0] - dp(10), dp(10)), size=text_size)
+            Rectangle(texture=text_texture, pos=(self.WIDTH - text_size[0] - grid.margin, grid.margin), size=text_size)
             for feedback in self.active_feedback:
-                icon_size = self.get_icon_size()
-                Rectangle(texture=feedback['texture'], pos=feedback['pos'], size=(icon_size, icon_size))
+                icon_size = grid.icon_size
+                Rectangle(texture=feedback['sprite'].texture, tex_coords=feedback['sprite'].tex_coords, pos=feedback['pos'], size=(icon_size, icon_size))
 
     def show_feedback(self, is_correct, apple_position):
-        texture = self.checkmark_texture if is_correct else self.wrong_texture
-        if is_correct and self.correct_sound:
-            self.correct_sound.play()
-        elif not is_correct and self.wrong_sound:
-            self.wrong_sound.play()
-        icon_size = self.get_icon_size()
-        icon_x = apple_position[0] + (self.get_apple_size() / 2) - (icon_size / 2)
-        icon_y = apple_position[1] + self.get_apple_size() + dp(5)
+        sprite = self.checkmark_sprite if is_correct else self.wrong_sprite
+        self.audio.play('correct' if is_correct else 'wrong')
+        grid = self.grid
+        icon_size = grid.icon_size
+        icon_x = apple_position[0] + (grid.apple_size / 2) - (icon_size / 2)
+        icon_y = apple_position[1] + grid.apple_size + grid.icon_gap
         if icon_y + icon_size > self.HEIGHT:
-            icon_y = apple_position[1] - icon_size - dp(5)
+            icon_y = apple_position[1] - icon_size - grid.icon_gap
         expire_time = Clock.get_boottime() + 1
-        self.active_feedback.append({'texture': texture, 'pos': (icon_x, icon_y), 'expire_time': expire_time})
+        self.active_feedback.append({'sprite': sprite, 'pos': (icon_x, icon_y), 'expire_time': expire_time})
 
     def game_over(self):
-        Clock.unschedule(self.game_event)
-        if self.score > self.high_score:
-            self.high_score = self.score
-            self.save_high_score()
-            print(f"New high score: {self.high_score}")
+        self.loop.stop()
+        self.close_replay()
+        stats = self.loop.stats()
+        log.info("Frame time avg %.2f ms (max %.2f), tick time avg %.2f ms (max %.2f), %.0f FPS drawn, quality %s",
+                 stats['frame_ms_avg'], stats['frame_ms_max'], stats['tick_ms_avg'], stats['tick_ms_max'], stats['frames_per_second'],
+                 self.renderer.quality['name'])
+        engine = self.engine
+        events.emit('death', category=self.category, cause=engine.death_cause, score=engine.score, ticks=engine.ticks,
+                    difficulty=engine.difficulty, arena=self.arena is not None)
+        if self.arena is not None:
+            # Arena games are refereed by the server and stay out of the local high scores.
+            self.leave_arena()
+        else:
+            if self.store.record_game(self.category, engine.score, engine.ticks, engine.difficulty, engine.death_cause):
+                self.high_score = self.store.high_score
+                log.info("New high score: %d", self.high_score)
+            self.store.set_question_state(self.scheduler.to_dict())
         try:
             app = App.get_running_app()
             sm = app.root
@@ -380,4 +506,4 @@ class GameWidget(Widget):
             game_over_screen.update_scores(self.score, self.high_score)
             sm.current = 'game_over'
         except Exception as e:
-            print(f"Error transitioning to Game Over screen: {e}") 
\ No newline at end of file
+            log.error("Error transitioning to Game Over screen: %s", e) 
\ No newline at end of file
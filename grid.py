@@ -0,0 +1,48 @@
+from kivy.metrics import dp
+
+# Pixel transform for the integer board. The game state only holds cell numbers; this
+# turns them into window coordinates and holds every pixel size the game view needs.
+# Everything is derived in update(), which does nothing unless the window, the size
+# settings or the board changed, so drawing never calls dp() per element.
+class GridTransform(object):
+    def __init__(self):
+        self.key = None
+        self.version = 0
+        self.cols = self.rows = 0
+        self.cell_size = self.apple_size = self.icon_size = 0
+        self.xs = []
+        self.ys = []
+
+    def update(self, width, height, snake_size, apple_size, icon_size, cols, rows, fit_span=None):
+        # fit_span scales a fixed board (an arena room) to the window, with apples that
+        # many cells wide; otherwise the cell size comes from the snake size setting.
+        key = (width, height, snake_size, apple_size, icon_size, cols, rows, fit_span)
+        if key == self.key:
+            return False
+        self.key = key
+        self.cols, self.rows = cols, rows
+        if fit_span is not None:
+            self.cell_size = min(width / cols, height / rows)
+            self.apple_size = self.cell_size * fit_span
+        else:
+            self.cell_size = dp(snake_size)
+            self.apple_size = dp(apple_size)
+        self.icon_size = dp(icon_size)
+        self.margin = dp(10)
+        self.icon_gap = dp(5)
+        self.label_gap = dp(30)
+        self.option_font_size = dp(20)
+        self.hud_font_size = dp(24)
+        self.width, self.height = width, height
+        self.xs = [x * self.cell_size for x in range(cols)]
+        self.ys = [y * self.cell_size for y in range(rows)]
+        self.version += 1
+        return True
+
+    def cell_pos(self, cell):
+        y, x = divmod(cell, self.cols)
+        return (self.xs[x], self.ys[y])
+
+    def board_size(self, width, height):
+        # Columns and rows of a new local board for this window and cell size.
+        return max(1, int(width // self.cell_size)), max(1, int(height // self.cell_size))
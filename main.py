@@ -1,8 +1,15 @@
+from startup import startup_timer
+
+import os
 from kivy.app import App
 from kivy.uix.screenmanager import FadeTransition
 
+from game_log import setup_logging, flush_logging
 from screens import TriviaSnakeScreenManager, MenuScreen, GameScreen, GameOverScreen, SettingsScreen
-from utils import BASE_SNAKE_SIZE, BASE_APPLE_SIZE, BASE_ICON_SIZE
+from utils import BASE_SNAKE_SIZE, BASE_APPLE_SIZE, BASE_ICON_SIZE, APPLE_STORM_PICKUPS
+
+setup_logging()
+startup_timer.mark('imports')
 
 class TriviaSnakeApp(App):
     def build(self):
@@ -10,13 +17,35 @@ class TriviaSnakeApp(App):
         self.snake_size = BASE_SNAKE_SIZE
         self.apple_size = BASE_APPLE_SIZE
         self.icon_size = BASE_ICON_SIZE
+        self.storm_pickups = APPLE_STORM_PICKUPS
 
+        # Only the menu is built before the first frame; the other screens are built
+        # the first time they are shown.
         sm = TriviaSnakeScreenManager(transition=FadeTransition())
-        sm.add_widget(MenuScreen(name='menu'))
-        sm.add_widget(GameScreen(name='game'))
-        sm.add_widget(GameOverScreen(name='game_over'))
-        sm.add_widget(SettingsScreen(name='settings'))
+        sm.register('menu', MenuScreen)
+        sm.register('game', GameScreen)
+        sm.register('game_over', GameOverScreen)
+        sm.register('settings', SettingsScreen)
+        sm.current = 'menu'
+        startup_timer.mark('build')
+        startup_timer.watch_first_frame()
         return sm
 
+    def on_stop(self):
+        # These modules are loaded by the screens that use them, not on the startup path.
+        from audio import close_audio_engine
+        from question_packs import close_question_packs
+        from storage import close_game_store
+        # A game still running when the app quits keeps its replay.
+        if self.root is not None and 'game' not in self.root.screen_factories:
+            self.root.get_screen('game').game_widget.close_replay(wait=True)
+        close_game_store()
+        close_question_packs()
+        close_audio_engine()
+        report_file = os.environ.get('TRIVIA_SNAKE_STARTUP_REPORT')
+        if report_file:
+            startup_timer.save(report_file)
+        flush_logging()
+
 if __name__ == '__main__':
-    TriviaSnakeApp().run() 
\ No newline at end of file
+    TriviaSnakeApp().run()
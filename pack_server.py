@@ -0,0 +1,62 @@
+import argparse, hashlib, json, os
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Stand-in content server for question_packs.py. Serves a directory over HTTP/1.1 with
+# keep-alive, writes index.json from the *.json packs in it and answers If-None-Match
+# with 304, so downloads, conditional requests and connection reuse can be tested
+# without the real server.
+class PackRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        name = urlsplit(self.path).path.lstrip('/')
+        if name == 'index.json':
+            packs = sorted(entry for entry in os.listdir(self.directory) if entry.endswith('.json') and entry != 'index.json')
+            body = json.dumps({'packs': [{'name': entry[:-len('.json')], 'path': entry} for entry in packs]}).encode('utf-8')
+        else:
+            path = os.path.join(self.directory, os.path.basename(name))
+            if not name.endswith('.json') or not os.path.isfile(path):
+                self.send_error(404)
+                return
+            with open(path, 'rb') as file:
+                body = file.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve_packs(directory, host, port):
+    handler = lambda *args, **kwargs: PackRequestHandler(*args, directory=directory, **kwargs)
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving question packs from '{directory}' on http://{host}:{server.server_address[1]}/")
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a directory of question packs for testing.")
+    parser.add_argument('directory')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args(argv)
+    server = serve_packs(args.directory, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
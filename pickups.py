@@ -0,0 +1,77 @@
+# Things the snake can run into besides itself. Pickups are axis-aligned rectangles of
+# grid cells, stored in a uniform grid of buckets; a bucket is as wide as a pickup, so
+# a pickup touches at most four buckets and a point query only looks at one bucket,
+# whatever the number of pickups on the board.
+ANSWER = 'answer'
+DISTRACTOR = 'distractor'
+
+class Pickup(object):
+    __slots__ = ('kind', 'index', 'anchor', 'rect')
+
+    def __init__(self, kind, index, anchor, rect):
+        self.kind = kind
+        self.index = index
+        self.anchor = anchor
+        self.rect = rect
+
+class SpatialHash(object):
+    def __init__(self, cols, rows, bucket_size=1):
+        self.cols = cols
+        self.rows = rows
+        self.bucket_size = bucket_size
+        self.bucket_cols = (cols + bucket_size - 1) // bucket_size
+        self.buckets = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def bucket_keys(self, rect):
+        x0, y0, x1, y1 = rect
+        size = self.bucket_size
+        for by in range(y0 // size, (y1 - 1) // size + 1):
+            for bx in range(x0 // size, (x1 - 1) // size + 1):
+                yield by * self.bucket_cols + bx
+
+    def insert(self, pickup):
+        for key in self.bucket_keys(pickup.rect):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = [pickup]
+            else:
+                bucket.append(pickup)
+        self.count += 1
+
+    def remove(self, pickup):
+        for key in self.bucket_keys(pickup.rect):
+            bucket = self.buckets[key]
+            bucket.remove(pickup)
+            if not bucket:
+                del self.buckets[key]
+        self.count -= 1
+
+    def clear(self):
+        self.buckets.clear()
+        self.count = 0
+
+    def at(self, x, y):
+        size = self.bucket_size
+        bucket = self.buckets.get((y // size) * self.bucket_cols + x // size)
+        if bucket is not None:
+            for pickup in bucket:
+                x0, y0, x1, y1 = pickup.rect
+                if x0 <= x < x1 and y0 <= y < y1:
+                    return pickup
+        return None
+
+    def at_cell(self, cell):
+        return self.at(cell % self.cols, cell // self.cols)
+
+    def overlaps(self, rect):
+        x0, y0, x1, y1 = rect
+        for key in self.bucket_keys(rect):
+            for pickup in self.buckets.get(key, ()):
+                px0, py0, px1, py1 = pickup.rect
+                if x0 < px1 and x1 > px0 and y0 < py1 and y1 > py0:
+                    return True
+        return False
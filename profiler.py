@@ -0,0 +1,177 @@
+import json, sys, threading, time
+from array import array
+
+from game_log import get_logger
+from utils import PROFILE_BUFFER_SIZE
+
+log = get_logger('profiler')
+
+# Optional per-phase timing for the game loop. While the profiler is disabled nothing
+# is wrapped and the loop only pays for one attribute check per frame; enable() wraps
+# the hot-path methods with timing shims and disable() puts the originals back.
+# Every phase keeps its last `size` samples in a ring of start/duration pairs.
+class PhaseRing(object):
+    __slots__ = ('starts', 'durations', 'index', 'count')
+
+    def __init__(self, size):
+        self.starts = array('d', bytes(8 * size))
+        self.durations = array('d', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+
+    def add(self, start, duration):
+        index = self.index
+        self.starts[index] = start
+        self.durations[index] = duration
+        index += 1
+        self.index = index if index < len(self.starts) else 0
+        if self.count < len(self.starts):
+            self.count += 1
+
+    def samples(self):
+        # Oldest first.
+        size = len(self.starts)
+        first = (self.index - self.count) % size
+        for i in range(self.count):
+            j = (first + i) % size
+            yield self.starts[j], self.durations[j]
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class FrameProfiler(object):
+    def __init__(self, size=PROFILE_BUFFER_SIZE):
+        self.size = size
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.rings = {}
+        self.allocations = array('q', bytes(8 * size))
+        self.allocation_times = array('d', bytes(8 * size))
+        self.allocation_index = 0
+        self.allocation_count = 0
+        self.frame_blocks = 0
+        self.hooks = []
+        self.installed = []
+
+    def add_hook(self, target, name, phase):
+        # target is a class or an instance; hooks are only installed while enabled.
+        self.hooks.append((target, name, phase))
+        if self.enabled:
+            self.install(target, name, phase)
+
+    def install(self, target, name, phase):
+        original = getattr(target, name)
+        saved = vars(target).get(name)
+        record = self.record
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(phase, start, clock())
+        setattr(target, name, timed)
+        self.installed.append((target, name, saved))
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        for target, name, phase in self.hooks:
+            self.install(target, name, phase)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for target, name, saved in reversed(self.installed):
+            if saved is None:
+                delattr(target, name)
+            else:
+                setattr(target, name, saved)
+        self.installed = []
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def clear(self):
+        for ring in self.rings.values():
+            ring.clear()
+        self.allocation_index = 0
+        self.allocation_count = 0
+
+    def record(self, phase, start, end):
+        ring = self.rings.get(phase)
+        if ring is None:
+            ring = self.rings[phase] = PhaseRing(self.size)
+        ring.add(start, end - start)
+
+    def begin_frame(self):
+        self.frame_blocks = sys.getallocatedblocks()
+
+    def end_frame(self, start, end):
+        self.record('frame', start, end)
+        index = self.allocation_index
+        self.allocations[index] = sys.getallocatedblocks() - self.frame_blocks
+        self.allocation_times[index] = end
+        self.allocation_index = (index + 1) % self.size
+        self.allocation_count = min(self.allocation_count + 1, self.size)
+
+    def allocation_samples(self):
+        first = (self.allocation_index - self.allocation_count) % self.size
+        for i in range(self.allocation_count):
+            j = (first + i) % self.size
+            yield self.allocation_times[j], self.allocations[j]
+
+    def summary(self):
+        phases = {}
+        for phase, ring in self.rings.items():
+            durations = [duration for _, duration in ring.samples()]
+            phases[phase] = {
+                'count': len(durations),
+                'p50_ms': 1000.0 * percentile(durations, 0.5),
+                'p99_ms': 1000.0 * percentile(durations, 0.99),
+                'max_ms': 1000.0 * max(durations) if durations else 0.0,
+            }
+        blocks = [count for _, count in self.allocation_samples()]
+        return {
+            'phases': phases,
+            'allocated_blocks_p50': percentile(blocks, 0.5),
+            'allocated_blocks_p99': percentile(blocks, 0.99),
+            'allocated_blocks_total': sys.getallocatedblocks(),
+        }
+
+    def chrome_trace(self):
+        # Complete ("X") events for every phase sample plus a counter track for the
+        # allocated-block delta of each frame; timestamps are microseconds.
+        pid = 1
+        tid = threading.main_thread().ident
+        events = []
+        for phase, ring in self.rings.items():
+            for start, duration in ring.samples():
+                events.append({'name': phase, 'cat': 'phase', 'ph': 'X', 'pid': pid, 'tid': tid,
+                               'ts': 1e6 * (start - self.origin), 'dur': 1e6 * duration})
+        for end, blocks in self.allocation_samples():
+            events.append({'name': 'allocated_blocks', 'ph': 'C', 'pid': pid, 'tid': tid,
+                           'ts': 1e6 * (end - self.origin), 'args': {'blocks': blocks}})
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+        log.info("Wrote profiler trace to %s", path)
+
+profiler = FrameProfiler()
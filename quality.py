@@ -0,0 +1,96 @@
+import time
+from collections import deque
+
+from game_log import get_logger
+from profiler import percentile
+
+# Rendering quality steps, best first. Each step keeps the cuts of the ones before it.
+QUALITY_LEVELS = (
+    {'name': 'full', 'background': True, 'label_scale': 1.0, 'interpolate': True},
+    {'name': 'no_background', 'background': False, 'label_scale': 1.0, 'interpolate': True},
+    {'name': 'low_res_labels', 'background': False, 'label_scale': 0.6, 'interpolate': True},
+    {'name': 'tick_paced', 'background': False, 'label_scale': 0.6, 'interpolate': False},
+)
+EVALUATE_FRAMES = 60        # Frames between two decisions
+DOWNGRADE_RATIO = 1.25      # p90 frame interval above budget * ratio steps quality down
+UPGRADE_RATIO = 0.5         # p90 render time below budget * ratio for long enough steps it back up
+UPGRADE_DELAY = 5.0         # Seconds of headroom needed before stepping up; doubles after each step back down
+MAX_DECISIONS = 32
+
+log = get_logger('quality')
+
+# Watches the display frame interval and the time spent rendering each frame and moves
+# between QUALITY_LEVELS: one step down when frames arrive late, one step up after a
+# sustained stretch of headroom. A level that had to be left again waits twice as long
+# before it is retried, so the governor does not oscillate. It only changes how frames
+# are drawn, never the game tick rate. Decisions are kept for telemetry.
+class QualityGovernor(object):
+    def __init__(self, target_fps, on_change=None, levels=QUALITY_LEVELS, clock=time.monotonic):
+        self.budget = 1.0 / target_fps
+        self.on_change = on_change
+        self.levels = levels
+        self.clock = clock
+        self.level = 0
+        self.intervals = []
+        self.render_times = []
+        self.upgrade_delay = UPGRADE_DELAY
+        self.headroom_since = None
+        self.decisions = deque(maxlen=MAX_DECISIONS)
+        self.last_interval_p90 = 0.0
+        self.last_render_p90 = 0.0
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def reset(self):
+        self.intervals = []
+        self.render_times = []
+        self.headroom_since = None
+
+    def record(self, interval, render_time):
+        self.intervals.append(interval)
+        self.render_times.append(render_time)
+        if len(self.intervals) >= EVALUATE_FRAMES:
+            self.evaluate()
+
+    def evaluate(self):
+        interval = percentile(self.intervals, 0.9)
+        render = percentile(self.render_times, 0.9)
+        self.intervals = []
+        self.render_times = []
+        self.last_interval_p90 = interval
+        self.last_render_p90 = render
+        now = self.clock()
+        if interval > self.budget * DOWNGRADE_RATIO and self.level + 1 < len(self.levels):
+            if self.decisions and self.decisions[-1]['to'] < self.decisions[-1]['from']:
+                self.upgrade_delay *= 2
+            self.change(self.level + 1, 'late_frames', now)
+        elif render < self.budget * UPGRADE_RATIO and interval <= self.budget * DOWNGRADE_RATIO and self.level > 0:
+            if self.headroom_since is None:
+                self.headroom_since = now
+            elif now - self.headroom_since >= self.upgrade_delay:
+                self.change(self.level - 1, 'headroom', now)
+        else:
+            self.headroom_since = None
+
+    def change(self, level, reason, now):
+        self.decisions.append({'time': now, 'from': self.level, 'to': level, 'reason': reason,
+                               'interval_ms_p90': 1000.0 * self.last_interval_p90, 'render_ms_p90': 1000.0 * self.last_render_p90})
+        log.info("Quality %s -> %s (%s, frame interval p90 %.1f ms)", self.levels[self.level]['name'], self.levels[level]['name'],
+                 reason, 1000.0 * self.last_interval_p90)
+        self.level = level
+        self.headroom_since = None
+        if self.on_change is not None:
+            self.on_change(self.settings)
+
+    def telemetry(self):
+        return {
+            'level': self.level,
+            'settings': dict(self.settings),
+            'budget_ms': 1000.0 * self.budget,
+            'interval_ms_p90': 1000.0 * self.last_interval_p90,
+            'render_ms_p90': 1000.0 * self.last_render_p90,
+            'upgrade_delay_s': self.upgrade_delay,
+            'decisions': list(self.decisions),
+        }
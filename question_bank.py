@@ -0,0 +1,154 @@
+# Compiled question bank. `python question_bank.py build` turns trivia.json into an
+# SQLite file indexed by (category, difficulty, position); at runtime only the bucket
+# sizes are read up front and question rows are fetched one at a time when served.
+import argparse, json, os, sqlite3
+
+from game_log import get_logger
+from utils import TRIVIA_FILE, TRIVIA_DB, load_trivia_questions
+
+BANK_VERSION = 1
+
+log = get_logger('questions')
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE buckets (category_id INTEGER, difficulty TEXT, count INTEGER, PRIMARY KEY (category_id, difficulty));
+CREATE TABLE questions (
+    category_id INTEGER, difficulty TEXT, position INTEGER,
+    question TEXT, options TEXT, correct TEXT,
+    PRIMARY KEY (category_id, difficulty, position)
+) WITHOUT ROWID;
+"""
+
+def build_question_bank(questions, db_path):
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(SCHEMA)
+        connection.execute("INSERT INTO meta VALUES ('version', ?)", (str(BANK_VERSION),))
+        for category_id, (category, difficulties) in enumerate(questions.items()):
+            connection.execute("INSERT INTO categories VALUES (?, ?)", (category_id, category))
+            for difficulty, entries in difficulties.items():
+                connection.execute("INSERT INTO buckets VALUES (?, ?, ?)", (category_id, difficulty, len(entries)))
+                connection.executemany(
+                    "INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?)",
+                    ((category_id, difficulty, position, entry["question"], json.dumps(entry["options"]), entry["correct"])
+                     for position, entry in enumerate(entries)))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, db_path)
+
+class QuestionBank(object):
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = None
+        self.pid = None
+        self.category_ids = None
+        self.counts = None
+        self.served = {}
+
+    def connect(self):
+        # sqlite connections must not cross a fork, so worker processes open their own.
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.pid = os.getpid()
+        return self.connection
+
+    def load_index(self):
+        if self.counts is None:
+            connection = self.connect()
+            self.category_ids = {name: category_id for category_id, name in connection.execute("SELECT id, name FROM categories ORDER BY id")}
+            self.counts = {}
+            for category_id, difficulty, count in connection.execute("SELECT category_id, difficulty, count FROM buckets"):
+                self.counts[(category_id, difficulty)] = count
+
+    def categories(self):
+        self.load_index()
+        return list(self.category_ids)
+
+    def count(self, category, difficulty):
+        self.load_index()
+        category_id = self.category_ids.get(category)
+        if category_id is None:
+            return 0
+        return self.counts.get((category_id, difficulty), 0)
+
+    def get(self, category, difficulty, index):
+        key = (category, difficulty, index)
+        question = self.served.get(key)
+        if question is None:
+            self.load_index()
+            row = self.connect().execute(
+                "SELECT question, options, correct FROM questions WHERE category_id = ? AND difficulty = ? AND position = ?",
+                (self.category_ids[category], difficulty, index)).fetchone()
+            question = {"question": row[0], "options": json.loads(row[1]), "correct": row[2]}
+            self.served[key] = question
+        return question
+
+    # The built-in bank does not change while the game runs, so it is its own snapshot
+    # and has no per-bucket fingerprint.
+    def snapshot(self):
+        return self
+
+    def source(self, category, difficulty):
+        return None
+
+# In-memory bank with the same interface, for a plain dict in the trivia.json layout.
+class JsonQuestionBank(object):
+    def __init__(self, questions):
+        self.questions = questions
+
+    def categories(self):
+        return list(self.questions.keys())
+
+    def count(self, category, difficulty):
+        return len(self.questions.get(category, {}).get(difficulty, []))
+
+    def get(self, category, difficulty, index):
+        return self.questions[category][difficulty][index]
+
+    def snapshot(self):
+        return self
+
+    def source(self, category, difficulty):
+        return None
+
+def bank_is_stale(json_path, db_path):
+    if not os.path.exists(db_path):
+        return True
+    return os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(db_path)
+
+def load_question_bank(json_path=TRIVIA_FILE, db_path=TRIVIA_DB):
+    if bank_is_stale(json_path, db_path):
+        questions = load_trivia_questions(json_path)
+        try:
+            build_question_bank(questions, db_path)
+            log.info("Compiled question bank '%s'.", db_path)
+        except (OSError, sqlite3.Error) as e:
+            log.warning("Could not compile question bank, using '%s' directly: %s", json_path, e)
+            return JsonQuestionBank(questions)
+    return QuestionBank(db_path)
+
+_question_bank = None
+
+def get_question_bank():
+    global _question_bank
+    if _question_bank is None:
+        _question_bank = load_question_bank()
+    return _question_bank
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile trivia.json into an indexed question bank.")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--json', default=TRIVIA_FILE)
+    parser.add_argument('--db', default=TRIVIA_DB)
+    args = parser.parse_args(argv)
+    build_question_bank(load_trivia_questions(args.json), args.db)
+    print(f"Compiled question bank '{args.db}'.")
+
+if __name__ == '__main__':
+    main()
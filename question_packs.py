@@ -0,0 +1,387 @@
+# Downloadable question packs. A content server lists packs in `index.json` as
+# {"packs": [{"name": ..., "path": ...}]}; every pack is a JSON file in the trivia.json
+# layout. A background thread fetches them over one keep-alive connection with
+# If-None-Match, keeps the bodies in a size-bounded disk cache and merges their
+# categories into PackQuestionBank. Questions are served from memory, so the game never
+# waits on the network. pack_server.py is a local stand-in for the content server.
+import argparse, hashlib, json, os, threading, time, zlib
+from urllib.parse import urljoin, urlsplit
+
+from game_log import get_logger, setup_logging
+from question_bank import get_question_bank
+from utils import QUESTION_PACK_URL, PACK_CACHE_DIR, PACK_CACHE_BYTES, PACK_REFRESH_INTERVAL
+
+HTTP_TIMEOUT = 10
+INDEX_NAME = 'cache.json'
+
+log = get_logger('packs')
+
+# Keep-alive HTTP client for one server. The connection is reused for every request
+# and reopened once if the server closed it between requests.
+class PackClient(object):
+    def __init__(self, base_url, timeout=HTTP_TIMEOUT):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.timeout = timeout
+        self.connection = None
+        self.requests = 0
+        self.connections = 0
+
+    def connect(self):
+        # http.client pulls in ssl, so it is only imported on the download thread.
+        import http.client
+        parts = urlsplit(self.base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=self.timeout)
+        self.connections += 1
+
+    def get(self, path, etag=None):
+        # Returns (status, etag, body); body is None for 304 Not Modified.
+        import http.client
+        url = urlsplit(urljoin(self.base_url, path))
+        target = url.path + ('?' + url.query if url.query else '')
+        headers = {'Accept': 'application/json'}
+        if etag:
+            headers['If-None-Match'] = etag
+        for attempt in range(2):
+            if self.connection is None:
+                self.connect()
+            try:
+                self.connection.request('GET', target, headers=headers)
+                response = self.connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+        self.requests += 1
+        if response.will_close:
+            self.close()
+        if response.status == 304:
+            return 304, etag, None
+        return response.status, response.getheader('ETag'), body
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+# Pack bodies on disk, one file per URL, with an index of ETags, sizes and last use.
+# Storing past max_bytes evicts the least recently used packs. Reads only mark the
+# index dirty; flush() saves the new use times once per pass.
+class PackCache(object):
+    def __init__(self, directory=PACK_CACHE_DIR, max_bytes=PACK_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.dirty = False
+        self.load_index()
+
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_NAME)
+
+    def load_index(self):
+        try:
+            with open(self.index_path(), 'r') as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+        for url in [url for url, entry in self.entries.items() if not os.path.exists(self.file_path(entry))]:
+            del self.entries[url]
+        if self.size() > self.max_bytes:
+            self.evict()
+            self.save_index()
+
+    def save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path() + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.index_path())
+        self.dirty = False
+
+    def flush(self):
+        if not self.dirty:
+            return
+        try:
+            self.save_index()
+        except OSError as e:
+            log.warning("Could not save the question pack cache index: %s", e)
+
+    def file_path(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def urls(self):
+        return list(self.entries)
+
+    def etag(self, url):
+        entry = self.entries.get(url)
+        return entry['etag'] if entry else None
+
+    def read(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        try:
+            with open(self.file_path(entry), 'rb') as file:
+                body = file.read()
+        except OSError:
+            del self.entries[url]
+            self.dirty = True
+            return None
+        entry['used'] = time.time()
+        self.dirty = True
+        return body
+
+    def store(self, url, etag, body):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {'file': hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json', 'etag': etag, 'size': len(body), 'used': time.time()}
+        tmp_path = self.file_path(entry) + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(body)
+        os.replace(tmp_path, self.file_path(entry))
+        self.entries[url] = entry
+        self.evict(keep=url)
+        self.save_index()
+
+    def forget(self, url):
+        entry = self.entries.pop(url, None)
+        if entry is not None:
+            try:
+                os.remove(self.file_path(entry))
+            except OSError:
+                pass
+
+    def size(self):
+        return sum(entry['size'] for entry in self.entries.values())
+
+    def evict(self, keep=None):
+        total = self.size()
+        for url, entry in sorted(self.entries.items(), key=lambda item: item[1]['used']):
+            if total <= self.max_bytes:
+                break
+            if url != keep:
+                total -= entry['size']
+                self.forget(url)
+
+def parse_pack(body):
+    # A pack in the trivia.json layout, keeping only well-formed questions.
+    data = json.loads(body)
+    if not isinstance(data, dict) or not all(isinstance(difficulties, dict) for difficulties in data.values()):
+        raise ValueError("not a category -> difficulty -> questions object")
+    questions = {}
+    for category, difficulties in data.items():
+        for difficulty, entries in difficulties.items():
+            if not isinstance(entries, list):
+                continue
+            valid = [entry for entry in entries
+                     if isinstance(entry, dict) and isinstance(entry.get('options'), list) and entry.get('correct') in entry['options'] and 'question' in entry]
+            if valid:
+                questions.setdefault(category, {})[difficulty] = valid
+    return questions
+
+# The built-in bank plus every loaded pack. Packs are merged per category and
+# difficulty in the order they were loaded, and a difficulty a pack supplies shadows
+# the built-in questions of that category and difficulty; the others still come from
+# the built-in bank. Reloading a pack replaces what it added before. add_pack() builds
+# a new dict and swaps it in, so readers on the main thread never see a half-merged pack;
+# code that calls count() and then get() takes a snapshot() first, so both read the same
+# packs. source() fingerprints a bucket's questions, so the scheduler can tell when a
+# pack replaced them.
+class PackQuestionBank(object):
+    def __init__(self, base, sources=None, packs=None):
+        self.base = base
+        self.sources = sources if sources is not None else {}
+        self.packs = packs if packs is not None else {}
+
+    def add_pack(self, url, questions):
+        sources = dict(self.sources)
+        sources[url] = questions
+        merged = {}
+        for pack in sources.values():
+            for category, difficulties in pack.items():
+                for difficulty, entries in difficulties.items():
+                    merged.setdefault(category, {}).setdefault(difficulty, []).extend(entries)
+        packs = {}
+        for category, difficulties in merged.items():
+            packs[category] = {}
+            for difficulty, entries in difficulties.items():
+                fingerprint = zlib.crc32('\n'.join(entry['question'] for entry in entries).encode('utf-8'))
+                packs[category][difficulty] = (entries, fingerprint)
+        self.sources = sources
+        self.packs = packs
+        return list(questions)
+
+    def snapshot(self):
+        return PackQuestionBank(self.base, self.sources, self.packs)
+
+    def categories(self):
+        categories = self.base.categories()
+        return categories + [category for category in self.packs if category not in categories]
+
+    def count(self, category, difficulty):
+        bucket = self.packs.get(category, {}).get(difficulty)
+        if bucket is None:
+            return self.base.count(category, difficulty)
+        return len(bucket[0])
+
+    def get(self, category, difficulty, index):
+        bucket = self.packs.get(category, {}).get(difficulty)
+        if bucket is None:
+            return self.base.get(category, difficulty, index)
+        return bucket[0][index]
+
+    def source(self, category, difficulty):
+        bucket = self.packs.get(category, {}).get(difficulty)
+        if bucket is None:
+            return self.base.source(category, difficulty)
+        return bucket[1]
+
+# Owns the download thread. The first pass loads the cached packs, then the server is
+# asked for its index and every pack with a conditional request; refresh() starts
+# another pass. Listeners are called on the download thread with the names of the
+# categories a pack added, so UI code schedules its own update with Clock.
+class QuestionPacks(object):
+    def __init__(self, bank, url=None, cache=None, refresh_interval=PACK_REFRESH_INTERVAL):
+        self.bank = bank
+        self.url = url if url is not None else os.environ.get('TRIVIA_SNAKE_PACKS', QUESTION_PACK_URL)
+        self.cache = cache if cache is not None else PackCache()
+        self.refresh_interval = refresh_interval
+        self.listeners = []
+        self.condition = threading.Condition()
+        self.pending = False
+        self.closed = False
+        self.thread = None
+        self.last_refresh = None
+        self.loaded = {}
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def refresh(self, force=False):
+        with self.condition:
+            if not force and self.last_refresh is not None and time.monotonic() - self.last_refresh < self.refresh_interval:
+                return
+            self.last_refresh = time.monotonic()
+            self.pending = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='QuestionPacks', daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def run(self):
+        from http.client import HTTPException
+        try:
+            client = PackClient(self.url) if self.url else None
+            self.load_cached()
+            self.cache.flush()
+            while True:
+                with self.condition:
+                    while not self.pending and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        break
+                    self.pending = False
+                if client is not None:
+                    try:
+                        self.download(client)
+                    except (OSError, HTTPException, ValueError) as e:
+                        log.warning("Could not update question packs from %s: %s", self.url, e)
+                    client.close()
+                    self.cache.flush()
+        finally:
+            # Lets the next refresh() start a new thread if this one died.
+            with self.condition:
+                self.thread = None
+
+    def load_cached(self):
+        for url in self.cache.urls():
+            if url not in self.loaded:
+                self.load(url, self.cache.read(url))
+
+    def download(self, client):
+        status, etag, body = client.get('index.json')
+        if status != 200:
+            raise ValueError(f"index.json returned HTTP {status}")
+        index = json.loads(body)
+        packs = index.get('packs', []) if isinstance(index, dict) else None
+        if not isinstance(packs, list):
+            raise ValueError("index.json has no list of packs")
+        for pack in packs:
+            if not isinstance(pack, dict) or not isinstance(pack.get('path'), str):
+                log.warning("Skipping malformed pack index entry %r", pack)
+                continue
+            url = urljoin(client.base_url, pack['path'])
+            cached_etag = self.cache.etag(url)
+            status, etag, body = client.get(url, cached_etag)
+            if status == 304:
+                if url not in self.loaded:
+                    self.load(url, self.cache.read(url))
+                continue
+            if status != 200:
+                log.warning("Question pack '%s' returned HTTP %d", pack.get('name', url), status)
+                continue
+            if self.load(url, body):
+                self.cache.store(url, etag, body)
+
+    def load(self, url, body):
+        if body is None:
+            return False
+        try:
+            questions = parse_pack(body)
+        except ValueError as e:
+            log.warning("Skipping malformed question pack %s: %s", url, e)
+            self.cache.forget(url)
+            return False
+        self.loaded[url] = list(questions)
+        categories = self.bank.add_pack(url, questions)
+        log.info("Loaded question pack %s: %s", url, ', '.join(categories) or 'no questions')
+        for listener in list(self.listeners):
+            listener(categories)
+        return True
+
+    def close(self, timeout=5):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+_question_packs = None
+
+def get_question_packs():
+    global _question_packs
+    if _question_packs is None:
+        _question_packs = QuestionPacks(PackQuestionBank(get_question_bank()))
+    return _question_packs
+
+def get_pack_bank():
+    return get_question_packs().bank
+
+def close_question_packs():
+    if _question_packs is not None:
+        _question_packs.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download question packs into the cache and list the categories.")
+    parser.add_argument('command', choices=['fetch'])
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--cache-dir', default=PACK_CACHE_DIR)
+    args = parser.parse_args(argv)
+    setup_logging(analytics_file=None)
+    packs = QuestionPacks(PackQuestionBank(get_question_bank()), url=args.url, cache=PackCache(args.cache_dir))
+    if not packs.url:
+        parser.error("no pack server: pass --url or set TRIVIA_SNAKE_PACKS")
+    client = PackClient(packs.url)
+    packs.load_cached()
+    packs.download(client)
+    client.close()
+    print(f"{client.requests} requests over {client.connections} connection(s), cache {packs.cache.size()} bytes")
+    print(f"Categories: {', '.join(packs.bank.categories())}")
+
+if __name__ == '__main__':
+    main()
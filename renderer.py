@@ -0,0 +1,337 @@
+from itertools import islice
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, InstructionGroup, Rectangle
+from kivy.metrics import dp
+
+from profiler import profiler
+from quality import QUALITY_LEVELS
+from snake_mesh import BodyMesh
+from text_cache import text_cache
+from utils import WHITE, YELLOW
+
+DISTRACTOR_TINT = (0.45, 0.45, 0.45, 1)
+RIVAL_TINT = (1, 0.55, 0.55, 1)
+
+# Retained scene for GameWidget: every layer is a persistent InstructionGroup that is
+# edited in place. The body is one BodyMesh, so a normal tick only moves the head
+# rectangle and rewrites the neck and tail quads. Between ticks only the head and the
+# tail quad are interpolated, which keeps each display frame O(1) while the snake still
+# glides instead of jumping a cell per tick. The quality settings (see quality.py) can
+# drop the background, render labels at lower resolution and turn interpolation off.
+class SnakeRenderer(object):
+    def __init__(self, widget):
+        self.widget = widget
+        self.quality = QUALITY_LEVELS[0]
+        self.background = InstructionGroup()
+        self.rivals = InstructionGroup()
+        self.snake = InstructionGroup()
+        self.distractors = InstructionGroup()
+        self.apples = InstructionGroup()
+        self.hud = InstructionGroup()
+        self.feedback = InstructionGroup()
+        self.layers = (self.background, self.rivals, self.snake, self.distractors, self.apples, self.hud, self.feedback)
+        self.attached = False
+        self.reset()
+
+    def reset(self):
+        for layer in self.layers:
+            layer.clear()
+        self.background_rect = None
+        self.head_rect = None
+        self.tail_rect = None
+        self.body_mesh = None
+        self.rival_meshes = {}
+        self.head_direction = None
+        self.head_pos = None
+        self.tail_pos = None
+        self.last_head = None
+        self.tail_cell = None
+        self.prev_tail_cell = None
+        self.synced_ticks = None
+        self.snake_size = None
+        self.grid_version = None
+        self.apples_key = None
+        self.rivals_key = None
+        self.distractors_key = None
+        self.hud_key = None
+        self.feedback_key = None
+
+    def attach(self):
+        canvas = self.widget.canvas
+        canvas.clear()
+        for layer in self.layers:
+            canvas.add(layer)
+        self.attached = True
+
+    def detach(self):
+        if self.attached:
+            self.attached = False
+            self.reset()
+
+    def set_quality(self, settings):
+        # Every layer is rebuilt with the new settings on the next frame.
+        self.quality = settings
+        self.attached = False
+        self.reset()
+
+    def draw(self, alpha=1.0):
+        if not self.attached:
+            self.attach()
+        ticks = self.widget.engine.ticks
+        if ticks != self.synced_ticks:
+            self.synced_ticks = ticks
+            self.draw_background()
+            self.draw_rivals()
+            if self.widget.snake_body:
+                self.draw_snake()
+            self.draw_distractors()
+            self.draw_apples()
+            self.draw_hud()
+            self.draw_feedback()
+        self.interpolate(alpha if self.quality['interpolate'] else 1.0)
+
+    def interpolate(self, alpha):
+        if self.head_rect is None:
+            return
+        widget = self.widget
+        body = widget.snake_body
+        # Positions are only written when they change, so a frame between two ticks with
+        # interpolation off leaves the canvas untouched.
+        if len(body) > 1:
+            pos = self.lerp(widget.cell_pos(body[1]), widget.cell_pos(self.last_head), alpha)
+            if pos != self.head_pos:
+                self.head_pos = self.head_rect.pos = pos
+        # The sliding tail is its own rectangle like the head, so frames between ticks
+        # never touch the body mesh and its vertex buffer is only uploaded on ticks.
+        if self.tail_rect is not None:
+            pos = self.lerp(widget.cell_pos(self.prev_tail_cell), widget.cell_pos(self.tail_cell), alpha)
+            if pos != self.tail_pos:
+                self.tail_pos = self.tail_rect.pos = pos
+
+    def lerp(self, start, end, alpha):
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        # Wrapping round the board or jumping more than one cell snaps straight to the end.
+        if abs(dx) + abs(dy) > self.snake_size * 1.01:
+            return end
+        return (start[0] + dx * alpha, start[1] + dy * alpha)
+
+    def draw_background(self):
+        widget = self.widget
+        if not widget.background_texture or not self.quality['background']:
+            return
+        if self.background_rect is None:
+            self.background_rect = Rectangle(texture=widget.background_texture, pos=(0, 0), size=widget.size)
+            self.background.add(self.background_rect)
+        elif tuple(self.background_rect.size) != tuple(widget.size):
+            self.background_rect.size = widget.size
+
+    def draw_rivals(self):
+        # The other snakes in an arena room, tinted and rebuilt on ticks where any of
+        # them moved. Local games have no rivals and leave the layer empty.
+        widget = self.widget
+        grid = widget.grid
+        size = grid.cell_size
+        key = (getattr(widget.engine, 'rivals_version', None), grid.version)
+        if key == self.rivals_key:
+            return
+        self.rivals_key = key
+        rivals = getattr(widget.engine, 'rivals', None) or {}
+        meshes = self.rival_meshes
+        for player_id in [player_id for player_id in meshes if player_id not in rivals]:
+            self.rivals.remove(meshes.pop(player_id).group)
+        sprite = widget.snake_body_sprite
+        for player_id, body in rivals.items():
+            mesh = meshes.get(player_id)
+            if mesh is None:
+                mesh = meshes[player_id] = BodyMesh(sprite.texture, sprite.tex_coords)
+                mesh.set_tint(RIVAL_TINT)
+                self.rivals.add(mesh.group)
+            mesh.set_body((widget.cell_pos(cell) for cell in body), size)
+            mesh.commit()
+
+    def draw_snake(self):
+        widget = self.widget
+        body = widget.snake_body
+        grid = widget.grid
+        size = grid.cell_size
+        mesh = self.body_mesh
+        if mesh is None or grid.version != self.grid_version or self.last_head is None or len(body) < 2 or body[1] != self.last_head:
+            self.rebuild_snake(size)
+            return
+        # Last tick's head cell is the new neck; then drop tail quads down to the new length.
+        # The mesh holds the segments between the head and the tail.
+        target = len(body) - 2
+        if target > len(mesh) + 1:
+            self.rebuild_snake(size)
+            return
+        x, y = widget.cell_pos(self.last_head)
+        mesh.push_neck(x, y, size)
+        while len(mesh) > target:
+            mesh.pop_tail()
+        mesh.commit()
+        self.move_head(body[0])
+        self.prev_tail_cell = self.tail_cell
+        self.tail_cell = body[-1]
+        self.tail_pos = None
+
+    def rebuild_snake(self, size):
+        widget = self.widget
+        self.snake.clear()
+        self.snake_size = size
+        self.grid_version = widget.grid.version
+        self.head_direction = widget.snake_direction
+        self.last_head = widget.snake_body[0]
+        body_sprite = widget.snake_body_sprite
+        body = widget.snake_body
+        self.body_mesh = BodyMesh(body_sprite.texture, body_sprite.tex_coords)
+        self.body_mesh.set_body((widget.cell_pos(segment) for segment in islice(body, 1, len(body) - 1)), size)
+        self.body_mesh.commit()
+        self.snake.add(self.body_mesh.group)
+        self.tail_rect = None
+        if len(body) > 1:
+            self.tail_rect = Rectangle(texture=body_sprite.texture, tex_coords=body_sprite.tex_coords, pos=widget.cell_pos(body[-1]), size=(size, size))
+            self.snake.add(self.tail_rect)
+        head_sprite = widget.snake_head_sprites[self.head_direction]
+        self.head_pos = widget.cell_pos(self.last_head)
+        self.head_rect = Rectangle(texture=head_sprite.texture, tex_coords=head_sprite.tex_coords, pos=self.head_pos, size=(size, size))
+        self.snake.add(self.head_rect)
+        self.tail_cell = widget.snake_body[-1]
+        self.prev_tail_cell = self.tail_cell
+        self.tail_pos = None
+
+    def move_head(self, head):
+        widget = self.widget
+        if widget.snake_direction != self.head_direction:
+            self.head_direction = widget.snake_direction
+            self.head_rect.tex_coords = widget.snake_head_sprites[self.head_direction].tex_coords
+        self.last_head = head
+        self.head_pos = self.head_rect.pos = widget.cell_pos(head)
+
+    def draw_apples(self):
+        widget = self.widget
+        grid = widget.grid
+        apple_size = grid.apple_size
+        key = (widget.engine.apples_version, grid.version)
+        if key == self.apples_key:
+            return
+        self.apples_key = key
+        scale = self.quality['label_scale']
+        self.apples.clear()
+        for i, apple in enumerate(widget.apple_positions):
+            self.apples.add(Rectangle(texture=widget.apple_sprite.texture, tex_coords=widget.apple_sprite.tex_coords, pos=apple, size=(apple_size, apple_size)))
+            option_text = widget.options[i] if i < len(widget.options) else ""
+            # Low-resolution labels are rendered smaller and stretched back to size.
+            text_texture = text_cache.get(option_text, grid.option_font_size * scale, WHITE)
+            text_size = (text_texture.width / scale, text_texture.height / scale)
+            if apple[1] + apple_size + grid.margin + text_size[1] > grid.height:
+                text_y = apple[1] - text_size[1] - grid.margin
+            else:
+                text_y = apple[1] + apple_size + grid.margin
+            text_x = apple[0] + (apple_size - text_size[0]) / 2
+            if text_x + text_size[0] > grid.width:
+                text_x = grid.width - text_size[0] - grid.margin
+            elif text_x < 0:
+                text_x = grid.margin
+            self.apples.add(Rectangle(texture=text_texture, pos=(text_x, text_y), size=text_size))
+
+    def label_requests(self, options, scores):
+        # The text cache keys draw_apples() and draw_hud() will ask for, for prefetching.
+        grid = self.widget.grid
+        scale = self.quality['label_scale']
+        return ([(text, grid.option_font_size * scale, WHITE) for text in options] +
+                [(text, grid.hud_font_size * scale, WHITE) for text in scores])
+
+    def draw_distractors(self):
+        # Storm pickups share the apple sprite, tinted grey; the layer is only rebuilt
+        # when one is eaten and respawns, not every tick.
+        widget = self.widget
+        apple_size = widget.grid.apple_size
+        key = (widget.engine.distractors_version, widget.grid.version)
+        if key == self.distractors_key:
+            return
+        self.distractors_key = key
+        self.distractors.clear()
+        if not widget.engine.distractors:
+            return
+        sprite = widget.apple_sprite
+        self.distractors.add(Color(*DISTRACTOR_TINT))
+        for pos in widget.distractor_positions:
+            self.distractors.add(Rectangle(texture=sprite.texture, tex_coords=sprite.tex_coords, pos=pos, size=(apple_size, apple_size)))
+        self.distractors.add(Color(1, 1, 1, 1))
+
+    def draw_hud(self):
+        widget = self.widget
+        grid = widget.grid
+        key = (widget.score_label_text, widget.high_score_label_text, grid.version)
+        if key == self.hud_key:
+            return
+        self.hud_key = key
+        self.hud.clear()
+        scale = self.quality['label_scale']
+        text_texture = text_cache.get(widget.score_label_text, grid.hud_font_size * scale, WHITE)
+        self.hud.add(Rectangle(texture=text_texture, pos=(grid.margin, grid.margin), size=(text_texture.width / scale, text_texture.height / scale)))
+        text_texture = text_cache.get(widget.high_score_label_text, grid.hud_font_size * scale, YELLOW)
+        text_size = (text_texture.width / scale, text_texture.height / scale)
+        self.hud.add(Rectangle(texture=text_texture, pos=(grid.width - text_size[0] - grid.margin, grid.margin), size=text_size))
+
+    def draw_feedback(self):
+        widget = self.widget
+        icon_size = widget.grid.icon_size
+        key = (tuple((feedback['pos'], feedback['expire_time']) for feedback in widget.active_feedback), icon_size)
+        if key == self.feedback_key:
+            return
+        self.feedback_key = key
+        self.feedback.clear()
+        for feedback in widget.active_feedback:
+            sprite = feedback['sprite']
+            self.feedback.add(Rectangle(texture=sprite.texture, tex_coords=sprite.tex_coords, pos=feedback['pos'], size=(icon_size, icon_size)))
+
+PROFILER_PHASES = ('frame', 'tick', 'draw', 'input', 'movement', 'collision', 'question_fetch', 'apple_placement', 'prefetch', 'labels')
+
+# Profiler readout drawn on the widget's canvas.after, above the retained scene. The text
+# changes every refresh, so it is rendered straight to a CoreLabel instead of the cache.
+class ProfilerOverlay(object):
+    def __init__(self, widget, refresh_interval=0.5):
+        self.widget = widget
+        self.refresh_interval = refresh_interval
+        self.group = InstructionGroup()
+        self.event = None
+
+    @property
+    def visible(self):
+        return self.event is not None
+
+    def show(self):
+        if self.event is None:
+            self.widget.canvas.after.add(self.group)
+            self.event = Clock.schedule_interval(self.refresh, self.refresh_interval)
+            self.refresh()
+
+    def hide(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+            self.group.clear()
+            self.widget.canvas.after.remove(self.group)
+
+    def refresh(self, dt=None):
+        summary = profiler.summary()
+        lines = []
+        for phase in PROFILER_PHASES:
+            stats = summary['phases'].get(phase)
+            if stats is not None:
+                lines.append(f"{phase:<16}p50 {stats['p50_ms']:6.2f}  p99 {stats['p99_ms']:6.2f} ms")
+        lines.append(f"{'allocs/frame':<16}p50 {summary['allocated_blocks_p50']:6.0f}  p99 {summary['allocated_blocks_p99']:6.0f}")
+        lines.append(f"{'quality':<16}{self.widget.renderer.quality['name']}")
+        label = CoreLabel(text='\n'.join(lines), font_size=dp(12), font_name='RobotoMono-Regular', color=WHITE)
+        label.refresh()
+        texture = label.texture
+        x = dp(10)
+        y = self.widget.HEIGHT - texture.height - dp(10)
+        self.group.clear()
+        self.group.add(Color(0, 0, 0, 0.6))
+        self.group.add(Rectangle(pos=(x - dp(4), y - dp(4)), size=(texture.width + dp(8), texture.height + dp(8))))
+        self.group.add(Color(1, 1, 1, 1))
+        self.group.add(Rectangle(texture=texture, pos=(x, y), size=texture.size))
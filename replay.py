@@ -0,0 +1,197 @@
+# Binary game replays. A replay is a small header (board setup, seed, category and the
+# question scheduler state at the start of the game) followed by one byte per tick with
+# the direction passed to SnakeEngine.step. Replaying runs the same engine with the same
+# seed, so the game comes out identical at hundreds of thousands of ticks per second.
+# Run with: python replay.py FILE [--seek TICK] [--expect-score N]
+import argparse, itertools, json, os, queue, struct, threading, time, zlib
+
+from engine import SnakeEngine, DIRECTIONS
+from game_log import get_logger, setup_logging
+from question_packs import get_pack_bank, get_question_packs
+from scheduler import QuestionScheduler
+from utils import REPLAY_DIR, REPLAY_LIMIT
+
+MAGIC = b'TSRP'
+REPLAY_VERSION = 2
+# magic, version, seed, cols, rows, apple span, label rows, apples (0 = per question),
+# distractors, starting fps, length of the compressed category/scheduler block
+HEADER = struct.Struct('<4sBQHHBBBHBI')
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+WRITE_CHUNK = 4096          # Tick bytes buffered before they are handed to the writer thread
+
+log = get_logger('replay')
+
+class ReplayHeader(object):
+    def __init__(self, seed, cols, rows, apple_span, label_rows, num_apples, distractors, fps, category, scheduler_state):
+        self.seed = seed
+        self.cols = cols
+        self.rows = rows
+        self.apple_span = apple_span
+        self.label_rows = label_rows
+        self.num_apples = num_apples
+        self.distractors = distractors
+        self.fps = fps
+        self.category = category
+        self.scheduler_state = scheduler_state
+
+    @classmethod
+    def for_engine(cls, engine, seed, category, fps, scheduler_state):
+        return cls(seed, engine.cols, engine.rows, engine.apple_span, engine.label_rows, engine.num_apples,
+                   engine.num_distractors, fps, category, scheduler_state)
+
+    def encode(self):
+        block = zlib.compress(json.dumps({'category': self.category, 'scheduler': self.scheduler_state}).encode('utf-8'))
+        return HEADER.pack(MAGIC, REPLAY_VERSION, self.seed, self.cols, self.rows, self.apple_span, self.label_rows,
+                           self.num_apples or 0, self.distractors, self.fps, len(block)) + block
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Replay is too short")
+        magic, version, seed, cols, rows, apple_span, label_rows, num_apples, distractors, fps, block_size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != REPLAY_VERSION:
+            raise ValueError("Not a Trivia Snake replay or unsupported version")
+        end = HEADER.size + block_size
+        block = json.loads(zlib.decompress(data[HEADER.size:end]).decode('utf-8'))
+        header = cls(seed, cols, rows, apple_span, label_rows, num_apples or None, distractors, fps, block['category'], block['scheduler'])
+        return header, end
+
+# Collects tick bytes on the game thread and hands full chunks to a daemon thread that
+# appends them to the file, so recording never blocks a frame on disk I/O.
+class ReplayWriter(object):
+    def __init__(self, path, header):
+        self.path = path
+        self.buffer = bytearray()
+        self.ticks = 0
+        self.queue = queue.Queue()
+        self.queue.put(header.encode())
+        self.thread = threading.Thread(target=self.run, name='ReplayWriter', daemon=True)
+        self.thread.start()
+
+    def record(self, direction):
+        self.buffer.append(DIRECTION_CODES[direction])
+        self.ticks += 1
+        if len(self.buffer) >= WRITE_CHUNK:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self, wait=False):
+        if self.buffer:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+        self.queue.put(None)
+        if wait:
+            self.thread.join()
+
+    def run(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'wb') as file:
+                while True:
+                    chunk = self.queue.get()
+                    if chunk is None:
+                        break
+                    file.write(chunk)
+            prune_replays(directory)
+        except OSError as e:
+            log.error("Error writing replay: %s", e)
+
+# Replays started within the same second by one process are told apart by a counter, so
+# a quick restart never reopens (and truncates) the previous game's file.
+_replay_numbers = itertools.count(1)
+
+def new_replay_path(directory=REPLAY_DIR):
+    name = time.strftime('%Y%m%d-%H%M%S') + f"-{os.getpid()}-{next(_replay_numbers):04d}.tsr"
+    return os.path.join(directory, name)
+
+def prune_replays(directory, limit=REPLAY_LIMIT):
+    if not directory or not os.path.isdir(directory):
+        return
+    replays = sorted((name for name in os.listdir(directory) if name.endswith('.tsr')), reverse=True)
+    for name in replays[limit:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+class ReplayPlayer(object):
+    def __init__(self, data, questions=None):
+        self.header, self.offset = ReplayHeader.decode(data)
+        self.inputs = memoryview(data)[self.offset:]
+        self.questions = questions if questions is not None else get_pack_bank()
+        self.restart()
+
+    @classmethod
+    def load(cls, path, questions=None):
+        with open(path, 'rb') as file:
+            return cls(file.read(), questions)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def restart(self):
+        header = self.header
+        scheduler = QuestionScheduler.from_dict(header.scheduler_state, self.questions) if header.scheduler_state else QuestionScheduler(self.questions)
+        self.engine = SnakeEngine(header.cols, header.rows, questions=self.questions, seed=header.seed, num_apples=header.num_apples,
+                                  apple_span=header.apple_span, label_rows=header.label_rows, scheduler=scheduler,
+                                  distractors=header.distractors)
+        scheduler.rng = self.engine.rng
+        self.engine.reset(header.category, fps=header.fps)
+        self.position = 0
+
+    def step(self):
+        if self.position >= len(self.inputs):
+            return None
+        result = self.engine.step(DIRECTIONS[self.inputs[self.position]])
+        self.position += 1
+        return result
+
+    def fast_forward(self, ticks):
+        # Runs up to `ticks` inputs without looking at the step results.
+        step = self.engine.step
+        inputs = self.inputs
+        end = min(len(inputs), self.position + ticks)
+        for position in range(self.position, end):
+            step(DIRECTIONS[inputs[position]])
+        self.position = end
+
+    def seek(self, tick):
+        # The engine cannot run backwards, so seeking back replays from the start.
+        if tick < self.position:
+            self.restart()
+        self.fast_forward(tick - self.position)
+
+    def play_all(self):
+        self.fast_forward(len(self.inputs) - self.position)
+        return self.engine
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Trivia Snake game.")
+    parser.add_argument('file')
+    parser.add_argument('--seek', type=int, help="stop at this tick instead of the end")
+    parser.add_argument('--expect-score', type=int, help="exit with an error unless the replay ends with this score")
+    args = parser.parse_args(argv)
+    setup_logging(analytics_file=None)
+    # Games in a downloaded category replay from the cached pack.
+    get_question_packs().load_cached()
+    player = ReplayPlayer.load(args.file)
+    header = player.header
+    print(f"{args.file}: {len(player)} ticks, {os.path.getsize(args.file)} bytes, category {header.category}, seed {header.seed}, board {header.cols}x{header.rows}")
+    start = time.perf_counter()
+    if args.seek is not None:
+        player.seek(args.seek)
+    else:
+        player.play_all()
+    elapsed = time.perf_counter() - start
+    engine = player.engine
+    print(f"Tick {player.position}: score {engine.score}, length {len(engine.body)}, difficulty {engine.difficulty}, "
+          f"game over {engine.game_over} ({engine.death_cause}); {player.position / elapsed if elapsed else 0:.0f} ticks/s")
+    if args.expect_score is not None and engine.score != args.expect_score:
+        print(f"Score mismatch: replay ends with {engine.score}, expected {args.expect_score}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+import hashlib, random
+from collections import deque
+
+# Per-session question scheduler. Every (category, difficulty) bucket is a shuffled deck
+# dealt without repeats; the shuffle is a lazy Fisher-Yates that only stores the swapped
+# slots, so a draw is O(1) and the state grows with questions served, not bank size.
+# Missed questions come back Leitner style: a wrong answer puts the question in box 0,
+# each correct review moves it up a box with a longer gap, and past the last box it is
+# only seen through the deck again. Well-known questions are dealt less often.
+# Answer stats are keyed by question_id(), so they follow a question when a pack moves
+# it to another index; a deck (and the reviews queued in it) starts over when the bank
+# reports a different size or source for its bucket.
+REVIEW_INTERVALS = (3, 8, 20, 50)   # Draws from the same bucket before a review is due
+MASTERED_MARGIN = 3                 # Correct minus wrong answers that counts as mastered
+MASTERED_SKIP_CHANCE = 0.5
+MASTERED_RETRIES = 2
+
+def question_id(question):
+    return hashlib.sha1(question["question"].encode('utf-8')).hexdigest()[:16]
+
+class Deck(object):
+    def __init__(self, size, source=None):
+        self.size = size
+        self.source = source
+        self.position = 0
+        self.swaps = {}
+        self.draws = 0
+        self.due = {}
+        self.pending = deque()
+        self.last = None
+
+    def deal(self, rng):
+        if self.position >= self.size:
+            # Start the next round with the last question already dealt, so a new
+            # shuffle can never open with the question that was just shown.
+            self.position = 0
+            self.swaps = {}
+            if self.last is not None and 0 < self.last < self.size:
+                self.swaps = {self.last: 0}
+                self.position = 1
+            elif self.last == 0 and self.size > 1:
+                self.position = 1
+        position = self.position
+        pick = rng.randrange(position, self.size)
+        index = self.swaps.get(pick, pick)
+        self.swaps[pick] = self.swaps.pop(position, position)
+        if pick == position:
+            del self.swaps[pick]
+        self.position = position + 1
+        return index
+
+    def to_dict(self):
+        return {'size': self.size, 'position': self.position, 'swaps': [[k, v] for k, v in self.swaps.items()],
+                'draws': self.draws, 'due': [[k, v] for k, v in self.due.items()], 'pending': list(self.pending), 'last': self.last,
+                'source': self.source}
+
+    @classmethod
+    def from_dict(cls, data):
+        deck = cls(data['size'], data.get('source'))
+        deck.position = data['position']
+        deck.swaps = {k: v for k, v in data['swaps']}
+        deck.draws = data['draws']
+        deck.due = {k: list(v) for k, v in data['due']}
+        deck.pending = deque(data['pending'])
+        deck.last = data.get('last')
+        return deck
+
+class QuestionScheduler(object):
+    def __init__(self, bank, rng=None):
+        self.bank = bank
+        self.rng = rng if rng is not None else random.Random()
+        self.decks = {}
+        self.stats = {}
+
+    def deck(self, category, difficulty, bank=None):
+        bank = bank if bank is not None else self.bank
+        size = bank.count(category, difficulty)
+        source = bank.source(category, difficulty)
+        deck = self.decks.get((category, difficulty))
+        if deck is None or deck.size != size or deck.source != source:
+            deck = Deck(size, source)
+            self.decks[(category, difficulty)] = deck
+        return deck
+
+    def next_index(self, category, difficulty, bank=None):
+        # bank is a snapshot the caller also reads the question from.
+        bank = bank if bank is not None else self.bank
+        deck = self.deck(category, difficulty, bank)
+        if not deck.size:
+            return None
+        deck.draws += 1
+        due = deck.due.pop(deck.draws, None)
+        if due:
+            deck.pending.extend(due)
+        if deck.pending and (deck.pending[0] != deck.last or deck.size == 1):
+            index = deck.pending.popleft()
+        else:
+            index = deck.deal(self.rng)
+            for _ in range(MASTERED_RETRIES):
+                if not self.is_mastered(category, difficulty, index, bank) or self.rng.random() >= MASTERED_SKIP_CHANCE:
+                    break
+                index = deck.deal(self.rng)
+        deck.last = index
+        return index
+
+    def give_back(self, category, difficulty, index):
+        # An index from next_index() that was never shown goes back to the front of its
+        # bucket, so it is dealt next instead of using up a deck slot.
+        if index is None:
+            return
+        deck = self.deck(category, difficulty)
+        if index >= deck.size:
+            return
+        deck.pending.appendleft(index)
+        deck.draws -= 1
+        if deck.last == index:
+            deck.last = None
+
+    def is_mastered(self, category, difficulty, index, bank=None):
+        if not self.stats:
+            return False
+        bank = bank if bank is not None else self.bank
+        stats = self.stats.get((category, difficulty, question_id(bank.get(category, difficulty, index))))
+        return stats is not None and stats[0] - stats[1] >= MASTERED_MARGIN
+
+    def record(self, category, difficulty, index, correct, question=None):
+        # question is the one that was answered; without it it is looked up by index.
+        if index is None:
+            return
+        bank = self.bank.snapshot()
+        if question is None:
+            question = bank.get(category, difficulty, index)
+        key = (category, difficulty, question_id(question))
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = [0, 0, None]
+        deck = self.deck(category, difficulty, bank)
+        if index >= deck.size or question_id(bank.get(category, difficulty, index)) != key[2]:
+            # A pack replaced the bucket since the question was drawn, so the index
+            # names another question now; keep the stats but queue no review.
+            deck = None
+        if correct:
+            stats[0] += 1
+            if stats[2] is None:
+                return
+            stats[2] += 1
+            if stats[2] >= len(REVIEW_INTERVALS):
+                stats[2] = None
+                return
+        else:
+            stats[1] += 1
+            stats[2] = 0
+        if deck is not None:
+            deck.due.setdefault(deck.draws + REVIEW_INTERVALS[stats[2]], []).append(index)
+
+    def to_dict(self):
+        return {
+            'decks': [[category, difficulty, deck.to_dict()] for (category, difficulty), deck in self.decks.items()],
+            'stats': [[category, difficulty, key] + stats for (category, difficulty, key), stats in self.stats.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data, bank, rng=None):
+        scheduler = cls(bank, rng)
+        for category, difficulty, deck in data.get('decks', []):
+            scheduler.decks[(category, difficulty)] = Deck.from_dict(deck)
+        for category, difficulty, key, correct, wrong, box in data.get('stats', []):
+            if isinstance(key, int):
+                # Older state keyed stats by index; those still name the same question
+                # as long as the bucket has not changed since.
+                if key >= bank.count(category, difficulty):
+                    continue
+                key = question_id(bank.get(category, difficulty, key))
+            scheduler.stats[(category, difficulty, key)] = [correct, wrong, box]
+        return scheduler
@@ -1,5 +1,6 @@
 import os
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.graphics import Rectangle
 from kivy.uix.screenmanager import Screen, ScreenManager, FadeTransition
@@ -12,14 +13,33 @@ from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.slider import Slider
 from kivy.utils import get_color_from_hex
 from kivy.metrics import dp
-from PIL import Image as PILImage
-from kivy.graphics.texture import Texture
 
-from game_widget import GameWidget
-from utils import INITIAL_FPS, MIN_FPS, MAX_FPS, WHITE, YELLOW, ASSETS_DIR, trivia_questions
+from assets import assets, GAME_SPRITES, MENU_SPRITES
+from game_log import get_logger
+from startup import startup_timer
+from utils import INITIAL_FPS, MIN_FPS, MAX_FPS, WHITE, YELLOW, MAX_STORM_PICKUPS, ARENA_HOST, ARENA_PORT
 
+log = get_logger('screens')
+
+# Screens are registered as factories and built the first time get_screen() asks for
+# them, which covers both switching with `current` and looking a screen up directly.
 class TriviaSnakeScreenManager(ScreenManager):
-    pass
+    def __init__(self, **kwargs):
+        super(TriviaSnakeScreenManager, self).__init__(**kwargs)
+        self.screen_factories = {}
+
+    def register(self, name, factory):
+        self.screen_factories[name] = factory
+
+    def get_screen(self, name):
+        factory = self.screen_factories.pop(name, None)
+        if factory is not None:
+            with startup_timer.measure(f"build_{name}"):
+                self.add_widget(factory(name=name))
+        return super(TriviaSnakeScreenManager, self).get_screen(name)
+
+    def has_screen(self, name):
+        return name in self.screen_factories or super(TriviaSnakeScreenManager, self).has_screen(name)
 
 class MenuScreen(Screen):
     def __init__(self, **kwargs):
@@ -39,11 +59,12 @@ class MenuScreen(Screen):
         # Categories
         categories_layout = BoxLayout(orientation='vertical', spacing=dp(15), size_hint=(1, None))
         categories_layout.bind(minimum_height=categories_layout.setter('height'))
-        categories = list(trivia_questions.keys())
-        for category in categories:
-            btn = Button(text=category, font_size=dp(24), size_hint=(1, None), height=dp(60), background_color=get_color_from_hex('#4CAF50'), color=WHITE)
-            btn.bind(on_release=self.select_category)
-            categories_layout.add_widget(btn)
+        self.categories_layout = categories_layout
+        self.category_buttons = {}
+        # Imported here so the question bank loads while the menu is built, not at import.
+        from question_packs import get_question_packs
+        self.question_packs = get_question_packs()
+        self.add_categories(self.question_packs.bank.categories())
         categories_anchor = AnchorLayout(anchor_x='center', anchor_y='center', size_hint=(1, None))
         categories_anchor.add_widget(categories_layout)
         main_layout.add_widget(categories_anchor)
@@ -67,22 +88,23 @@ class MenuScreen(Screen):
         settings_btn.bind(on_release=self.open_settings)
         main_layout.add_widget(settings_btn)
 
+        # Arena Button
+        arena_btn = Button(text="Arena", font_size=dp(24), size_hint=(1, None), height=dp(60), background_color=get_color_from_hex('#FF9800'), color=WHITE)
+        arena_btn.bind(on_release=self.join_arena)
+        main_layout.add_widget(arena_btn)
+
         root_layout.add_widget(main_layout)
 
         # Speed Control Buttons
         speed_layout = BoxLayout(orientation='horizontal', spacing=dp(20), size_hint=(None, None), size=(dp(140), dp(60)))
-        speed_up_icon = self.load_icon('speed_up.png')
-        slow_down_icon = self.load_icon('slow_down.png')
-
         speed_up_btn = Button(background_normal='', background_color=(0, 0, 0, 0), size_hint=(None, None), size=(dp(60), dp(60)))
         speed_up_btn.bind(on_release=self.speed_up)
-        speed_up_btn.canvas.before.add(Rectangle(texture=speed_up_icon, pos=speed_up_btn.pos, size=speed_up_btn.size))
         speed_up_btn.bind(pos=self.update_icon, size=self.update_icon)
 
         slow_down_btn = Button(background_normal='', background_color=(0, 0, 0, 0), size_hint=(None, None), size=(dp(60), dp(60)))
         slow_down_btn.bind(on_release=self.slow_down)
-        slow_down_btn.canvas.before.add(Rectangle(texture=slow_down_icon, pos=slow_down_btn.pos, size=slow_down_btn.size))
         slow_down_btn.bind(pos=self.update_icon, size=self.update_icon)
+        self.icon_buttons = ((speed_up_btn, 'speed_up.png'), (slow_down_btn, 'slow_down.png'))
 
         speed_layout.add_widget(slow_down_btn)
         speed_layout.add_widget(speed_up_btn)
@@ -96,6 +118,29 @@ class MenuScreen(Screen):
         root_layout.add_widget(speed_box)
 
         self.add_widget(root_layout)
+        # The icons and the game sprites are decoded off the main thread after the
+        # menu is on screen; the icons are added to the buttons when that is done.
+        startup_timer.after_first_frame(lambda: assets.preload(MENU_SPRITES + GAME_SPRITES, callback=self.load_icons))
+        # Question packs load on their own thread; categories they add get a button on
+        # the next frame.
+        self.question_packs.add_listener(lambda categories: Clock.schedule_once(lambda dt: self.add_categories(categories)))
+        startup_timer.after_first_frame(self.question_packs.refresh)
+
+    def on_pre_enter(self, *args):
+        self.question_packs.refresh()
+
+    def add_categories(self, categories):
+        for category in categories:
+            if category not in self.category_buttons:
+                btn = Button(text=category, font_size=dp(24), size_hint=(1, None), height=dp(60), background_color=get_color_from_hex('#4CAF50'), color=WHITE)
+                btn.bind(on_release=self.select_category)
+                self.categories_layout.add_widget(btn)
+                self.category_buttons[category] = btn
+
+    def load_icons(self):
+        for button, name in self.icon_buttons:
+            icon = assets.sprite(name)
+            button.canvas.before.add(Rectangle(texture=icon.texture, tex_coords=icon.tex_coords, pos=button.pos, size=button.size))
 
     def select_category(self, instance):
         category = instance.text
@@ -104,21 +149,15 @@ class MenuScreen(Screen):
         game_screen.start_game(category)
         self.manager.current = 'game'
 
+    def join_arena(self, instance):
+        host, _, port = os.environ.get('TRIVIA_SNAKE_ARENA', f"{ARENA_HOST}:{ARENA_PORT}").rpartition(':')
+        game_screen = self.manager.get_screen('game')
+        game_screen.join_arena(host, int(port))
+        self.manager.current = 'game'
+
     def open_settings(self, instance):
         self.manager.current = 'settings'
 
-    def load_icon(self, filename):
-        fullname = os.path.join(ASSETS_DIR, filename)
-        if not os.path.exists(fullname):
-            print(f"Icon file '{filename}' not found.")
-            return Texture.create(size=(dp(60), dp(60)))
-        pil_image = PILImage.open(fullname).convert('RGBA')
-        data = pil_image.tobytes()
-        texture = Texture.create(size=pil_image.size)
-        texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
-        texture.flip_vertical()
-        return texture
-
     def update_icon(self, instance, value):
         for instruction in instance.canvas.before.children:
             if isinstance(instruction, Rectangle):
@@ -129,14 +168,14 @@ class MenuScreen(Screen):
         if self.fps < MAX_FPS:
             self.fps += 1
         else:
-            print(f"FPS is already at maximum limit: {self.fps}")
+            log.debug("FPS is already at maximum limit: %d", self.fps)
         self.update_speed_label(self.fps)
 
     def slow_down(self, instance):
         if self.fps > MIN_FPS:
             self.fps -= 1
         else:
-            print(f"FPS is already at minimum limit: {self.fps}")
+            log.debug("FPS is already at minimum limit: %d", self.fps)
         self.update_speed_label(self.fps)
 
     def update_speed_label(self, current_fps):
@@ -185,6 +224,17 @@ class SettingsScreen(Screen):
         )
         self.layout.add_widget(self.icon_size_slider)
 
+        # Apple Storm Slider
+        self.storm_slider = self.create_slider(
+            "Apple Storm",
+            self.app.storm_pickups,
+            self.on_storm_change,
+            0,
+            MAX_STORM_PICKUPS,
+            10
+        )
+        self.layout.add_widget(self.storm_slider)
+
         # Save Button
         save_btn = Button(
             text="Save",
@@ -199,7 +249,7 @@ class SettingsScreen(Screen):
 
         self.add_widget(self.layout)
 
-    def create_slider(self, label_text, value, callback):
+    def create_slider(self, label_text, value, callback, min_value=20, max_value=60, step=1):
         layout = BoxLayout(orientation='vertical', size_hint=(1, None), height=dp(100))
         label = Label(
             text=f"{label_text}: {value}",
@@ -212,10 +262,10 @@ class SettingsScreen(Screen):
         )
         label.bind(size=label.setter('text_size'))
         slider = Slider(
-            min=20,
-            max=60,
+            min=min_value,
+            max=max_value,
             value=value,
-            step=1,
+            step=step,
             size_hint=(1, None),
             height=dp(40)
         )
@@ -237,6 +287,10 @@ class SettingsScreen(Screen):
         instance.label.text = f"Icon Size: {int(value)}"
         self.app.icon_size = int(value)
 
+    def on_storm_change(self, instance, value):
+        instance.label.text = f"Apple Storm: {int(value)}"
+        self.app.storm_pickups = int(value)
+
     def save_settings(self, instance):
         self.manager.current = 'menu'
 
@@ -281,21 +335,42 @@ class GameOverScreen(Screen):
 class GameScreen(Screen):
     def __init__(self, **kwargs):
         super(GameScreen, self).__init__(**kwargs)
+        # Imported here so the audio stack and the game modules load on first play.
+        from game_widget import GameWidget
         self.layout = BoxLayout(orientation='vertical', size_hint=(1, 1))
-        self.question_label = Label(text='', font_size=dp(24), size_hint=(1, 0.1), color=YELLOW, halign='center', valign='middle')
-        self.question_label.bind(size=self.question_label.setter('text_size'))
-        self.layout.add_widget(self.question_label)
+        # Two stacked question labels: the next question is laid out and rasterized in the
+        # hidden one ahead of time, so a pickup only swaps which one is visible.
+        question_box = FloatLayout(size_hint=(1, 0.1))
+        self.question_labels = []
+        for opacity in (1, 0):
+            label = Label(text='', font_size=dp(24), size_hint=(1, 1), pos_hint={'x': 0, 'y': 0}, color=YELLOW, halign='center', valign='middle', opacity=opacity)
+            label.bind(size=label.setter('text_size'))
+            question_box.add_widget(label)
+            self.question_labels.append(label)
+        self.layout.add_widget(question_box)
         self.game_widget = GameWidget(self.update_question_label, size_hint=(1, 0.9))
+        self.game_widget.next_question_callback = self.prepare_question_label
         self.layout.add_widget(self.game_widget)
         self.add_widget(self.layout)
         self.fps = INITIAL_FPS
 
     def update_question_label(self, question_text):
-        self.question_label.text = question_text
+        shown, hidden = self.question_labels
+        if question_text and hidden.text == question_text:
+            shown.opacity, hidden.opacity = 0, 1
+            self.question_labels = [hidden, shown]
+        else:
+            shown.text = question_text
+
+    def prepare_question_label(self, question_text):
+        self.question_labels[1].text = question_text
 
     def set_fps(self, fps):
         self.fps = fps
 
     def start_game(self, category):
         self.game_widget.fps = self.fps
-        self.game_widget.start_game(category) 
\ No newline at end of file
+        self.game_widget.start_game(category)
+
+    def join_arena(self, host, port, room='lobby'):
+        self.game_widget.join_arena(host, port, room) 
\ No newline at end of file
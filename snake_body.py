@@ -0,0 +1,65 @@
+from collections import deque
+
+# Snake cells ordered head to tail, plus a count of how many segments sit on each cell.
+# Head insert, tail removal, occupancy and self-collision checks are all O(1).
+# An optional listener is told when a cell starts or stops being covered by the snake.
+class SnakeBody(object):
+    def __init__(self, cells=()):
+        self.cells = deque()
+        self.counts = {}
+        self.listener = None
+        for cell in cells:
+            self.append_tail(cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __getitem__(self, index):
+        return self.cells[index]
+
+    def __contains__(self, cell):
+        return cell in self.counts
+
+    def head(self):
+        return self.cells[0]
+
+    def tail(self):
+        return self.cells[-1]
+
+    def push_head(self, cell):
+        self.cells.appendleft(cell)
+        count = self.counts.get(cell, 0)
+        self.counts[cell] = count + 1
+        if not count and self.listener is not None:
+            self.listener.occupy(cell)
+
+    def append_tail(self, cell):
+        self.cells.append(cell)
+        count = self.counts.get(cell, 0)
+        self.counts[cell] = count + 1
+        if not count and self.listener is not None:
+            self.listener.occupy(cell)
+
+    def pop_tail(self):
+        cell = self.cells.pop()
+        count = self.counts[cell] - 1
+        if count:
+            self.counts[cell] = count
+        else:
+            del self.counts[cell]
+            if self.listener is not None:
+                self.listener.vacate(cell)
+        return cell
+
+    def head_collides(self):
+        return self.counts[self.cells[0]] > 1
+
+    def clear(self):
+        if self.listener is not None:
+            for cell in self.counts:
+                self.listener.vacate(cell)
+        self.cells.clear()
+        self.counts.clear()
@@ -0,0 +1,126 @@
+from array import array
+from kivy.graphics import Color, InstructionGroup, Mesh
+
+CHUNK_SEGMENTS = 8192       # Quads per Mesh; 4 vertices each must stay addressable by 16-bit indices
+INITIAL_CAPACITY = 64
+FLOATS_PER_QUAD = 16        # 4 vertices of x, y, u, v
+BLANK_QUAD = array('f', bytes(4 * FLOATS_PER_QUAD))
+
+# The snake body as one textured Mesh. Every segment is a quad in a ring of preallocated
+# vertex slots ordered tail to neck, so a tick writes the new neck quad and blanks the
+# tail quad in place; nothing else in the buffer is touched and the body stays one draw
+# call. Free slots are zero-area quads. The buffer doubles when the snake outgrows it and
+# only splits into a second Mesh past CHUNK_SEGMENTS segments. Tinting is the Color in
+# front of the meshes, and segments can be moved or resized in place for animations.
+class BodyMesh(object):
+    def __init__(self, texture, tex_coords, capacity=INITIAL_CAPACITY):
+        self.texture = texture
+        self.tex_coords = tuple(tex_coords)
+        self.color = Color(1, 1, 1, 1)
+        self.group = InstructionGroup()
+        self.count = 0
+        self.neck = -1
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.chunk_size = min(capacity, CHUNK_SEGMENTS)
+        self.chunks = []
+        self.meshes = []
+        indices = array('H')
+        for k in range(self.chunk_size):
+            base = 4 * k
+            indices.extend((base, base + 1, base + 2, base + 2, base + 3, base))
+        self.group.clear()
+        self.group.add(self.color)
+        for _ in range(capacity // self.chunk_size):
+            vertices = array('f', bytes(4 * FLOATS_PER_QUAD * self.chunk_size))
+            mesh = Mesh(mode='triangles', texture=self.texture, vertices=vertices, indices=indices)
+            self.chunks.append(vertices)
+            self.meshes.append(mesh)
+            self.group.add(mesh)
+        self.dirty = set()
+        self.count = 0
+        self.neck = -1
+
+    def __len__(self):
+        return self.count
+
+    def slot(self, index):
+        # Slot of the segment `index` places behind the neck.
+        return (self.neck - index) % self.capacity
+
+    def write(self, slot, x, y, size):
+        chunk, offset = divmod(slot, self.chunk_size)
+        u0, v0, u1, v1, u2, v2, u3, v3 = self.tex_coords
+        right, top = x + size, y + size
+        self.chunks[chunk][offset * FLOATS_PER_QUAD:(offset + 1) * FLOATS_PER_QUAD] = array(
+            'f', (x, y, u0, v0, right, y, u1, v1, right, top, u2, v2, x, top, u3, v3))
+        self.dirty.add(chunk)
+
+    def blank(self, slot):
+        chunk, offset = divmod(slot, self.chunk_size)
+        self.chunks[chunk][offset * FLOATS_PER_QUAD:(offset + 1) * FLOATS_PER_QUAD] = BLANK_QUAD
+        self.dirty.add(chunk)
+
+    def set_body(self, positions, size):
+        # Rebuilds from (x, y) positions ordered neck to tail.
+        positions = list(positions)
+        capacity = self.capacity
+        while capacity < len(positions):
+            capacity *= 2
+        if capacity > CHUNK_SEGMENTS:
+            capacity = -(-capacity // CHUNK_SEGMENTS) * CHUNK_SEGMENTS
+        if capacity != self.capacity:
+            self.allocate(capacity)
+        else:
+            for vertices in self.chunks:
+                vertices[:] = array('f', bytes(4 * len(vertices)))
+        for slot, (x, y) in enumerate(reversed(positions)):
+            self.write(slot, x, y, size)
+        self.count = len(positions)
+        self.neck = self.count - 1
+        self.dirty.update(range(len(self.chunks)))
+
+    def push_neck(self, x, y, size):
+        if self.count == self.capacity:
+            self.grow()
+        self.neck = (self.neck + 1) % self.capacity
+        self.count += 1
+        self.write(self.neck, x, y, size)
+
+    def pop_tail(self):
+        self.blank(self.slot(self.count - 1))
+        self.count -= 1
+
+    def move_segment(self, index, x, y, size):
+        self.write(self.slot(index), x, y, size)
+
+    def grow(self):
+        # Copies the quads out tail first and lays them out again in a buffer twice as big.
+        count = self.count
+        quads = []
+        for index in range(count - 1, -1, -1):
+            chunk, offset = divmod(self.slot(index), self.chunk_size)
+            quads.append(self.chunks[chunk][offset * FLOATS_PER_QUAD:(offset + 1) * FLOATS_PER_QUAD])
+        capacity = self.capacity * 2
+        if capacity > CHUNK_SEGMENTS:
+            capacity = -(-capacity // CHUNK_SEGMENTS) * CHUNK_SEGMENTS
+        self.allocate(capacity)
+        for slot, quad in enumerate(quads):
+            chunk, offset = divmod(slot, self.chunk_size)
+            self.chunks[chunk][offset * FLOATS_PER_QUAD:(offset + 1) * FLOATS_PER_QUAD] = quad
+        self.count = count
+        self.neck = count - 1
+        self.dirty.update(range(len(self.chunks)))
+
+    def set_tint(self, rgba):
+        self.color.rgba = rgba
+
+    def commit(self):
+        # Hands the edited buffers back to their meshes. Kivy copies the array and uploads
+        # the whole chunk again on the next draw, so this is for ticks that changed the
+        # body, not for every frame.
+        for chunk in self.dirty:
+            self.meshes[chunk].vertices = self.chunks[chunk]
+        self.dirty.clear()
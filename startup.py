@@ -0,0 +1,76 @@
+import json, time
+from contextlib import contextmanager
+
+from utils import STARTUP_BUDGET_MS
+
+# Cold start timing. main.py imports this module before anything else, so the clock
+# starts as close to process start as Python allows. Marks split the startup into
+# consecutive phases (imports, build, first frame); measure() times work that happens
+# later, like a screen built on first navigation.
+class StartupTimer(object):
+    def __init__(self, budget_ms=STARTUP_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+        self.extra = []
+        self.first_frame = None
+        self.first_frame_callbacks = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, 1000.0 * (now - self.last)))
+        self.last = now
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.extra.append((name, 1000.0 * (time.perf_counter() - start)))
+
+    def watch_first_frame(self):
+        from kivy.core.window import Window
+        Window.fbind('on_flip', self.on_flip)
+
+    def on_flip(self, *args):
+        from kivy.core.window import Window
+        Window.funbind('on_flip', self.on_flip)
+        self.mark('first_frame')
+        self.first_frame = 1000.0 * (self.last - self.start)
+        self.print_report()
+        callbacks, self.first_frame_callbacks = self.first_frame_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def after_first_frame(self, callback):
+        # Work that is not needed to show the menu waits until it has been drawn once.
+        if self.first_frame is not None:
+            callback()
+        else:
+            self.first_frame_callbacks.append(callback)
+
+    def report(self):
+        return {
+            'budget_ms': self.budget_ms,
+            'first_frame_ms': self.first_frame,
+            'over_budget': self.first_frame is not None and self.first_frame > self.budget_ms,
+            'phases': {name: ms for name, ms in self.phases},
+            'deferred': {name: ms for name, ms in self.extra},
+        }
+
+    def print_report(self):
+        # Imported here so the logging setup is not counted before the clock starts.
+        from game_log import get_logger
+        log = get_logger('startup')
+        phases = ', '.join(f"{name} {ms:.0f} ms" for name, ms in self.phases)
+        log.info("Startup: %s; first frame after %.0f ms (budget %s ms)", phases, self.first_frame, self.budget_ms)
+        if self.first_frame > self.budget_ms:
+            log.warning("Startup is %.0f ms over budget", self.first_frame - self.budget_ms)
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+startup_timer = StartupTimer()
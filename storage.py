@@ -0,0 +1,162 @@
+import json, os, threading
+
+from game_log import get_logger
+from utils import HIGH_SCORE_FILE
+
+HISTORY_LIMIT = 200         # Finished games kept in the history list
+COALESCE_DELAY = 0.5        # Seconds the writer waits for more changes before writing
+RETRY_DELAY = 1.0           # Seconds before a failed write is retried, doubling each time
+RETRY_DELAY_MAX = 30.0
+
+log = get_logger('storage')
+
+# Persistent player data: overall and per-category high scores, recent game history and
+# the question scheduler state (which holds the per-question answer stats). Changes only
+# mark the store dirty; a background thread batches them into one write-and-rename, so
+# the Kivy main thread never touches the disk. The writer copies the data under the lock
+# and serializes it outside, and a failed write leaves the store dirty and is retried
+# with backoff.
+class GameStore(object):
+    def __init__(self, path=HIGH_SCORE_FILE, history_limit=HISTORY_LIMIT, coalesce_delay=COALESCE_DELAY, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.history_limit = history_limit
+        self.coalesce_delay = coalesce_delay
+        self.retry_delay = retry_delay
+        self.condition = threading.Condition()
+        self.dirty = False
+        self.writing = False
+        self.flushing = 0
+        self.closed = False
+        self.thread = None
+        self.data = self.load()
+
+    def load(self):
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as file:
+                    data = json.load(file)
+                    log.info("Loaded high score: %s", data.get('high_score', 0))
+            except Exception as e:
+                log.warning("Error loading high score: %s", e)
+                data = {}
+        data.setdefault('high_score', 0)
+        data.setdefault('category_high_scores', {})
+        data.setdefault('history', [])
+        data.setdefault('questions', None)
+        return data
+
+    @property
+    def high_score(self):
+        return self.data['high_score']
+
+    def category_high_score(self, category):
+        return self.data['category_high_scores'].get(category, 0)
+
+    @property
+    def question_state(self):
+        return self.data['questions']
+
+    def record_game(self, category, score, ticks, difficulty, death_cause):
+        with self.condition:
+            new_high_score = score > self.data['high_score']
+            if new_high_score:
+                self.data['high_score'] = score
+            if score > self.data['category_high_scores'].get(category, 0):
+                self.data['category_high_scores'][category] = score
+            history = self.data['history']
+            history.append({'category': category, 'score': score, 'ticks': ticks, 'difficulty': difficulty, 'death_cause': death_cause})
+            del history[:-self.history_limit]
+            self.mark_dirty()
+        return new_high_score
+
+    def set_question_state(self, state):
+        with self.condition:
+            self.data['questions'] = state
+            self.mark_dirty()
+
+    def mark_dirty(self):
+        with self.condition:
+            self.dirty = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='GameStoreWriter', daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def run(self):
+        delay = self.retry_delay
+        while True:
+            with self.condition:
+                while not self.dirty and not self.closed:
+                    self.condition.wait()
+                if not self.dirty:
+                    return
+                self.condition.wait_for(lambda: self.closed or self.flushing, self.coalesce_delay)
+                data = self.snapshot()
+                self.dirty = False
+                self.writing = True
+            try:
+                self.write(json.dumps(data))
+                failed = False
+            except Exception as e:
+                log.error("Error saving game data: %s", e)
+                failed = True
+            with self.condition:
+                self.writing = False
+                if failed:
+                    self.dirty = True
+                self.condition.notify_all()
+                if not failed:
+                    delay = self.retry_delay
+                    continue
+                if self.closed:
+                    return
+                self.condition.wait_for(lambda: self.closed, delay)
+                delay = min(2 * delay, RETRY_DELAY_MAX)
+
+    def snapshot(self):
+        # Called with the lock held. Games are appended to the history and the question
+        # state is replaced whole, so copying the containers is enough.
+        data = dict(self.data)
+        data['category_high_scores'] = dict(data['category_high_scores'])
+        data['history'] = list(data['history'])
+        return data
+
+    def write(self, payload):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def flush(self, timeout=None):
+        with self.condition:
+            if self.thread is None:
+                return True
+            self.flushing += 1
+            self.condition.notify_all()
+            try:
+                return self.condition.wait_for(lambda: not self.dirty and not self.writing, timeout)
+            finally:
+                self.flushing -= 1
+
+    def close(self, timeout=5):
+        self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+_game_store = None
+
+def get_game_store():
+    global _game_store
+    if _game_store is None:
+        _game_store = GameStore()
+    return _game_store
+
+def close_game_store():
+    if _game_store is not None:
+        _game_store.close()
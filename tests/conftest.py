@@ -0,0 +1,22 @@
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import DIFFICULTIES
+from question_bank import JsonQuestionBank
+
+def make_bank(sizes=(8, 6, 4), categories=('Science', 'History')):
+    questions = {}
+    for category in categories:
+        questions[category] = {}
+        for difficulty, size in zip(DIFFICULTIES, sizes):
+            questions[category][difficulty] = [
+                {"question": f"{category} {difficulty} {i}?", "options": [f"a{i}", f"b{i}", f"c{i}"], "correct": f"a{i}"}
+                for i in range(size)]
+    return JsonQuestionBank(questions)
+
+@pytest.fixture
+def bank():
+    return make_bank()
@@ -0,0 +1,67 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch_engine import BatchSnakeEnv, DEATH_SCORE, question_counts
+from engine import DIFFICULTIES, GAME_OVER_SCORE, POINTS_PER_LEVEL, START_LENGTH
+from utils import INITIAL_FPS
+
+def new_env(bank, num_games=4, seed=1):
+    env = BatchSnakeEnv(num_games, 24, 20, question_counts(bank, bank.categories()), seed=seed)
+    env.reset()
+    return env
+
+def eat(env, correct):
+    # Puts the correct (or a wrong) apple of every game in front of its head and steps.
+    games = np.arange(env.n)
+    slot = env.correct_slot if correct else (env.correct_slot + 1) % env.num_apples
+    ahead = env.neighbors[env.direction, env.heads()]
+    env.apples[env.apples == ahead[:, None]] = -1
+    env.apples[games, slot] = ahead
+    return env.step()
+
+def test_question_counts_match_the_bank(bank):
+    counts = question_counts(bank, bank.categories())
+    for c, category in enumerate(bank.categories()):
+        for d, difficulty in enumerate(DIFFICULTIES):
+            assert counts[c, d] == bank.count(category, difficulty)
+
+def test_questions_do_not_repeat_within_a_round(bank):
+    env = new_env(bank, num_games=16)
+    games = np.arange(env.n)
+    sizes = env.counts[env.category, 0]
+    dealt = [env.question.copy()] + [env.deal(games) for _ in range(int(sizes.max()) - 1)]
+    dealt = np.stack(dealt, axis=1)
+    for g in games:
+        size = sizes[g]
+        assert sorted(dealt[g, :size]) == list(range(size))
+
+def test_wrong_answer_shrinks_and_ends_the_game(bank):
+    env = new_env(bank)
+    _, ate, correct = eat(env, correct=False)
+    assert ate.all() and not correct.any()
+    assert (env.score == -1).all()
+    assert (env.length == START_LENGTH - 1).all()
+    for _ in range(-GAME_OVER_SCORE - 1):
+        eat(env, correct=False)
+    assert env.done.all()
+    assert (env.death_cause == DEATH_SCORE).all()
+
+def test_difficulty_and_speed_step_every_level(bank):
+    env = new_env(bank)
+    for _ in range(POINTS_PER_LEVEL):
+        eat(env, correct=True)
+    assert (env.score == POINTS_PER_LEVEL).all()
+    assert (env.length == START_LENGTH + POINTS_PER_LEVEL).all()
+    assert (env.difficulty == 1).all()
+    assert (env.fps == INITIAL_FPS + 1).all()
+
+def test_same_seed_plays_the_same_games(bank):
+    def play(seed):
+        env = new_env(bank, num_games=32, seed=seed)
+        for _ in range(300):
+            env.step(env.greedy_actions())
+        return env.score.copy(), env.ticks.copy(), env.exposure.copy()
+    first = play(3)
+    assert all((a == b).all() for a, b in zip(first, play(3)))
+    assert not all((a == b).all() for a, b in zip(first, play(4)))
@@ -0,0 +1,84 @@
+import random
+
+from engine import DIFFICULTIES, DIRECTIONS, GAME_OVER_SCORE, POINTS_PER_LEVEL, START_LENGTH, QUIET, SnakeEngine
+from utils import MAX_FPS
+
+def new_engine(bank, seed=1, fps=10):
+    engine = SnakeEngine(24, 20, questions=bank, seed=seed)
+    engine.reset('Science', fps=fps)
+    return engine
+
+def eat(engine, correct):
+    # Moves an apple with the wanted answer in front of the head and steps into it.
+    index = next(i for i, option in enumerate(engine.options) if (option == engine.correct_answer) == correct)
+    ahead = engine.neighbors[engine.direction][engine.body.cells[0]]
+    pickup = engine.apple_pickups[index]
+    moves = [(pickup, ahead)]
+    other = engine.pickups.at_cell(ahead)
+    if other is not None and other is not pickup:
+        moves.append((other, pickup.anchor))
+    for moved, _ in moves:
+        engine.pickups.remove(moved)
+    for moved, anchor in moves:
+        moved.anchor = anchor
+        moved.rect = engine.anchor_rect(anchor)
+        engine.apples[moved.index] = anchor
+        engine.apple_rects[moved.index] = moved.rect
+        engine.pickups.insert(moved)
+    return engine.step()
+
+def test_correct_answer_scores_and_grows(bank):
+    engine = new_engine(bank)
+    result = eat(engine, correct=True)
+    assert result.correct and not result.game_over
+    assert engine.score == 1
+    assert len(engine.body) == START_LENGTH + 1
+
+def test_wrong_answer_costs_a_point_and_a_segment(bank):
+    engine = new_engine(bank)
+    result = eat(engine, correct=False)
+    assert result.apple is not None and not result.correct
+    assert engine.score == -1
+    assert len(engine.body) == START_LENGTH - 1
+    # The snake never shrinks below one segment.
+    eat(engine, correct=False)
+    assert len(engine.body) == 1
+
+def test_game_ends_at_the_score_threshold(bank):
+    engine = new_engine(bank)
+    for _ in range(-GAME_OVER_SCORE - 1):
+        assert not eat(engine, correct=False).game_over
+    result = eat(engine, correct=False)
+    assert result.game_over and result.death_cause == 'score'
+    assert engine.game_over and engine.score == GAME_OVER_SCORE
+    ticks = engine.ticks
+    assert engine.step() is QUIET
+    assert engine.ticks == ticks
+
+def test_difficulty_and_speed_step_every_level(bank):
+    engine = new_engine(bank, fps=10)
+    assert 10 < MAX_FPS
+    for _ in range(POINTS_PER_LEVEL - 1):
+        result = eat(engine, correct=True)
+        assert not result.difficulty_changed and not result.fps_changed
+    result = eat(engine, correct=True)
+    assert result.difficulty_changed and result.fps_changed
+    assert engine.difficulty == DIFFICULTIES[1]
+    assert engine.fps == 11
+
+def play(engine, moves):
+    states = []
+    for direction in moves:
+        engine.step(direction)
+        states.append((engine.ticks, engine.score, list(engine.body), engine.apples, engine.options,
+                       engine.question_key, engine.game_over, engine.death_cause))
+        if engine.game_over:
+            break
+    return states
+
+def test_same_seed_plays_the_same_game(bank):
+    rng = random.Random(7)
+    moves = [rng.choice(DIRECTIONS) for _ in range(400)]
+    first = play(new_engine(bank, seed=42), moves)
+    assert first == play(new_engine(bank, seed=42), moves)
+    assert first != play(new_engine(bank, seed=43), moves)
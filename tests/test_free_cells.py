@@ -0,0 +1,77 @@
+import random
+
+from free_cells import FreeCellIndex
+from snake_body import SnakeBody
+
+def footprint(index, anchor):
+    x, y = anchor % index.cols, anchor // index.cols
+    return {(y + dy) * index.cols + x + dx for dy in range(index.span) for dx in range(index.span)}
+
+def check_index(index, body):
+    # The free array holds exactly the valid anchors no segment covers, and the
+    # position table points every free anchor at its slot.
+    covered = set(body.counts)
+    expected = {anchor for anchor in index.valid if not footprint(index, anchor) & covered}
+    assert sorted(index.free) == sorted(expected)
+    for slot, anchor in enumerate(index.free):
+        assert index.position[anchor] == slot
+    assert sum(1 for position in index.position if position >= 0) == len(index.free)
+
+def random_walk(index, body, rng, steps):
+    cols, rows = index.cols, index.rows
+    for _ in range(steps):
+        head = body.head()
+        x, y = head % cols, head // cols
+        dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+        body.push_head(((y + dy) % rows) * cols + (x + dx) % cols)
+        if len(body) > 12 or rng.random() < 0.5:
+            body.pop_tail()
+        check_index(index, body)
+
+def test_valid_anchors_respect_span_and_label_rows():
+    index = FreeCellIndex(6, 8, span=2, label_rows=1)
+    for anchor in index.valid:
+        x, y = anchor % 6, anchor // 6
+        assert 0 <= x <= 4 and 1 <= y <= 5
+    assert len(index.valid) == 5 * 5
+
+def test_body_moves_keep_index_consistent():
+    rng = random.Random(7)
+    for span, label_rows in ((1, 0), (2, 1), (3, 2)):
+        index = FreeCellIndex(12, 10, span=span, label_rows=label_rows)
+        body = SnakeBody([25, 24, 23])
+        index.reset(body)
+        check_index(index, body)
+        random_walk(index, body, rng, 400)
+
+def test_sample_returns_distinct_free_anchors():
+    rng = random.Random(3)
+    index = FreeCellIndex(10, 10, span=2)
+    body = SnakeBody([44, 43, 42, 41])
+    index.reset(body)
+    for k in (1, 5, 40):
+        chosen = index.sample(k, rng)
+        assert len(chosen) == k
+        assert len(set(chosen)) == k
+        assert all(anchor in index for anchor in chosen)
+        check_index(index, body)
+    # Asking for more than there are returns every free anchor once.
+    chosen = index.sample(len(index) + 10, rng)
+    assert sorted(chosen) == sorted(index.free)
+
+def test_sample_accept_filters_candidates():
+    rng = random.Random(5)
+    index = FreeCellIndex(10, 10)
+    index.reset(SnakeBody([0]))
+    chosen = index.sample(10, rng, lambda anchor, chosen: anchor % 2 == 0)
+    assert len(chosen) == 10 and all(anchor % 2 == 0 for anchor in chosen)
+
+def test_reset_detaches_previous_body():
+    index = FreeCellIndex(8, 8)
+    old = SnakeBody([10, 9])
+    index.reset(old)
+    new = SnakeBody([30, 29])
+    index.reset(new)
+    assert old.listener is None
+    old.push_head(11)
+    check_index(index, new)
@@ -0,0 +1,88 @@
+import json, logging, queue, time
+
+from game_log import AnalyticsHandler, GameEvents, GameLogListener, JsonLinesSink
+
+def event_record(number):
+    return logging.makeLogRecord({'msg': 'answer', 'event': {'event': 'answer', 'number': number}})
+
+def numbers(batches):
+    return [[event['number'] for event in batch] for batch in batches]
+
+def test_events_are_handed_over_in_batches():
+    handler = AnalyticsHandler(batch_size=3, flush_interval=60)
+    batches = []
+    handler.sinks.append(batches.append)
+    for number in range(7):
+        handler.handle(event_record(number))
+    assert numbers(batches) == [[0, 1, 2], [3, 4, 5]]
+    handler.flush()
+    assert numbers(batches) == [[0, 1, 2], [3, 4, 5], [6]]
+    handler.flush()
+    assert len(batches) == 3
+
+def test_plain_log_records_are_not_events():
+    handler = AnalyticsHandler(batch_size=1)
+    batches = []
+    handler.sinks.append(batches.append)
+    handler.handle(logging.makeLogRecord({'msg': 'hello'}))
+    assert batches == []
+
+def test_overdue_batch_is_flushed_without_a_new_event():
+    handler = AnalyticsHandler(batch_size=50, flush_interval=0.05)
+    batches = []
+    handler.sinks.append(batches.append)
+    handler.handle(event_record(1))
+    handler.flush_due()
+    assert batches == []
+    time.sleep(0.06)
+    handler.flush_due()
+    assert numbers(batches) == [[1]]
+
+def test_listener_flushes_an_idle_batch():
+    handler = AnalyticsHandler(batch_size=50, flush_interval=0.05)
+    batches = []
+    handler.sinks.append(batches.append)
+    log_queue = queue.SimpleQueue()
+    listener = GameLogListener(log_queue, handler, poll_interval=0.01)
+    listener.start()
+    try:
+        log_queue.put(event_record(1))
+        deadline = time.monotonic() + 2
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        listener.stop()
+    assert numbers(batches) == [[1]]
+
+def test_failing_sink_does_not_stop_the_others(capsys):
+    handler = AnalyticsHandler(batch_size=1)
+    batches = []
+
+    def broken(batch):
+        raise IOError('disk full')
+    handler.sinks.extend([broken, batches.append])
+    handler.handle(event_record(1))
+    assert numbers(batches) == [[1]]
+    assert 'disk full' in capsys.readouterr().err
+
+def test_json_lines_sink_appends_and_rotates(tmp_path):
+    path = str(tmp_path / 'analytics.jsonl')
+    sink = JsonLinesSink(path, max_bytes=40)
+    sink([{'event': 'answer', 'number': 1}, {'event': 'answer', 'number': 2}])
+    with open(path) as file:
+        assert [json.loads(line)['number'] for line in file] == [1, 2]
+    sink([{'event': 'death', 'number': 3}])
+    with open(path) as file:
+        assert [json.loads(line)['number'] for line in file] == [3]
+    with open(path + '.1') as file:
+        assert len(file.readlines()) == 2
+
+def test_subscribers_get_the_event_right_away():
+    bus = GameEvents()
+    received = []
+    bus.subscribe('answer', received.append)
+    bus.emit('answer', correct=True)
+    bus.unsubscribe('answer', received.append)
+    bus.emit('answer', correct=False)
+    assert len(received) == 1
+    assert received[0]['event'] == 'answer' and received[0]['correct'] is True
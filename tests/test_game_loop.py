@@ -0,0 +1,65 @@
+import os
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+import pytest
+
+from game_loop import FixedStepLoop, MAX_FRAME_DT, MAX_TICKS_PER_FRAME
+
+class Recorder(object):
+    def __init__(self, tick_rate):
+        self.ticks = 0
+        self.alphas = []
+        self.loop = FixedStepLoop(self.tick, self.alphas.append, tick_rate)
+        self.on_tick = None
+
+    def tick(self):
+        self.ticks += 1
+        if self.on_tick is not None:
+            self.on_tick()
+
+    def run(self, frames, dt):
+        for _ in range(frames):
+            self.loop.frame(dt)
+
+@pytest.fixture
+def recorder():
+    # Powers of two keep the accumulator exact.
+    recorder = Recorder(16)
+    recorder.loop.start()
+    yield recorder
+    recorder.loop.stop()
+
+def test_ticks_follow_the_tick_rate_not_the_frame_rate(recorder):
+    recorder.run(128, 1.0 / 64)
+    assert recorder.ticks == 32
+    assert len(recorder.alphas) == 128
+    assert all(0.0 <= alpha <= 1.0 for alpha in recorder.alphas)
+    # Interpolation climbs between ticks.
+    assert recorder.alphas[1] > recorder.alphas[0]
+
+def test_tick_rate_change_applies_from_the_next_tick(recorder):
+    recorder.run(64, 1.0 / 64)
+    recorder.loop.set_tick_rate(32)
+    recorder.run(64, 1.0 / 64)
+    assert recorder.ticks == 16 + 32
+
+def test_backlog_is_capped_and_counted(recorder):
+    recorder.loop.set_tick_rate(64)
+    recorder.loop.frame(0.25)
+    assert recorder.ticks == MAX_TICKS_PER_FRAME
+    assert recorder.loop.dropped_ticks == 16 - MAX_TICKS_PER_FRAME
+    assert recorder.loop.accumulator < 1.0 / 64
+
+def test_long_pause_is_clamped(recorder):
+    recorder.loop.frame(5.0)
+    assert recorder.ticks == int(MAX_FRAME_DT * 16)
+    assert recorder.loop.stats()['dropped_ticks'] == 0
+
+def test_stopping_in_a_tick_skips_the_render(recorder):
+    recorder.on_tick = recorder.loop.stop
+    recorder.loop.frame(0.25)
+    assert recorder.ticks == 1
+    assert not recorder.loop.running
+    assert recorder.alphas == []
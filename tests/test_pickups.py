@@ -0,0 +1,50 @@
+import random
+
+from pickups import ANSWER, Pickup, SpatialHash
+
+def random_rect(rng, cols, rows, span):
+    x, y = rng.randrange(cols - span + 1), rng.randrange(rows - span + 1)
+    return (x, y, x + span, y + span)
+
+def brute_at(pickups, x, y):
+    return [pickup for pickup in pickups if pickup.rect[0] <= x < pickup.rect[2] and pickup.rect[1] <= y < pickup.rect[3]]
+
+def brute_overlaps(pickups, rect):
+    x0, y0, x1, y1 = rect
+    return any(x0 < p.rect[2] and x1 > p.rect[0] and y0 < p.rect[3] and y1 > p.rect[1] for p in pickups)
+
+def test_queries_match_brute_force():
+    rng = random.Random(11)
+    cols, rows = 20, 15
+    for span in (1, 2, 3):
+        grid = SpatialHash(cols, rows, bucket_size=span)
+        pickups = []
+        # Non-overlapping pickups, as the engine places them.
+        for index in range(200):
+            rect = random_rect(rng, cols, rows, span)
+            if not grid.overlaps(rect):
+                pickup = Pickup(ANSWER, index, rect[1] * cols + rect[0], rect)
+                grid.insert(pickup)
+                pickups.append(pickup)
+        assert len(grid) == len(pickups)
+        for y in range(rows):
+            for x in range(cols):
+                found = grid.at(x, y)
+                assert [found] == brute_at(pickups, x, y) if found else not brute_at(pickups, x, y)
+                assert grid.at_cell(y * cols + x) is found
+        for _ in range(300):
+            rect = random_rect(rng, cols, rows, rng.randint(1, 4))
+            assert grid.overlaps(rect) == brute_overlaps(pickups, rect)
+
+def test_remove_and_clear():
+    grid = SpatialHash(10, 10, bucket_size=2)
+    first = Pickup(ANSWER, 0, 0, (1, 1, 3, 3))
+    second = Pickup(ANSWER, 1, 0, (5, 5, 7, 7))
+    grid.insert(first)
+    grid.insert(second)
+    grid.remove(first)
+    assert grid.at(2, 2) is None and grid.at(6, 6) is second
+    assert not grid.overlaps((0, 0, 4, 4))
+    assert len(grid) == 1
+    grid.clear()
+    assert len(grid) == 0 and grid.at(6, 6) is None and not grid.buckets
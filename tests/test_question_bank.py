@@ -0,0 +1,49 @@
+import json, os
+
+from engine import DIFFICULTIES
+from question_bank import QuestionBank, JsonQuestionBank, build_question_bank, load_question_bank
+
+def test_compiled_bank_matches_the_json(bank, tmp_path):
+    db_path = str(tmp_path / 'trivia.db')
+    build_question_bank(bank.questions, db_path)
+    compiled = QuestionBank(db_path)
+    assert compiled.categories() == bank.categories()
+    for category in bank.categories():
+        for difficulty in DIFFICULTIES:
+            assert compiled.count(category, difficulty) == bank.count(category, difficulty)
+            for index in range(bank.count(category, difficulty)):
+                assert compiled.get(category, difficulty, index) == bank.get(category, difficulty, index)
+
+def test_unknown_buckets_are_empty(bank, tmp_path):
+    db_path = str(tmp_path / 'trivia.db')
+    build_question_bank(bank.questions, db_path)
+    compiled = QuestionBank(db_path)
+    assert compiled.count('Geography', 'Easy') == 0
+    assert compiled.count('Science', 'Impossible') == 0
+
+def test_rebuild_replaces_the_bank(bank, tmp_path):
+    db_path = str(tmp_path / 'trivia.db')
+    build_question_bank(bank.questions, db_path)
+    build_question_bank({'Sports': {'Easy': bank.questions['Science']['Easy'][:2]}}, db_path)
+    compiled = QuestionBank(db_path)
+    assert compiled.categories() == ['Sports']
+    assert compiled.count('Sports', 'Easy') == 2
+    assert not os.path.exists(db_path + '.tmp')
+
+def test_load_compiles_a_stale_bank(bank, tmp_path):
+    json_path = str(tmp_path / 'trivia.json')
+    db_path = str(tmp_path / 'trivia.db')
+    with open(json_path, 'w') as file:
+        json.dump(bank.questions, file)
+    loaded = load_question_bank(json_path, db_path)
+    assert isinstance(loaded, QuestionBank)
+    assert os.path.exists(db_path)
+    assert loaded.get('History', 'Hard', 3) == bank.get('History', 'Hard', 3)
+
+def test_load_falls_back_to_json_when_the_bank_cannot_be_written(bank, tmp_path):
+    json_path = str(tmp_path / 'trivia.json')
+    with open(json_path, 'w') as file:
+        json.dump(bank.questions, file)
+    loaded = load_question_bank(json_path, str(tmp_path / 'missing' / 'trivia.db'))
+    assert isinstance(loaded, JsonQuestionBank)
+    assert loaded.count('Science', 'Easy') == bank.count('Science', 'Easy')
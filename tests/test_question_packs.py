@@ -0,0 +1,114 @@
+import json, threading
+
+import pytest
+
+from engine import SnakeEngine
+from pack_server import serve_packs
+from question_packs import PackCache, PackClient, PackQuestionBank, QuestionPacks
+from scheduler import QuestionScheduler
+
+def pack(category, difficulty, texts):
+    return {category: {difficulty: [{"question": text, "options": ["a", "b"], "correct": "a"} for text in texts]}}
+
+def test_packs_merge_per_bucket_and_fall_back_to_the_base(bank):
+    packs = PackQuestionBank(bank)
+    packs.add_pack('one', pack('Science', 'Easy', ['p1', 'p2']))
+    packs.add_pack('two', pack('Science', 'Easy', ['p3']))
+    assert packs.count('Science', 'Easy') == 3
+    assert packs.get('Science', 'Easy', 2)["question"] == 'p3'
+    assert packs.count('Science', 'Medium') == bank.count('Science', 'Medium')
+    assert packs.get('Science', 'Medium', 0) == bank.get('Science', 'Medium', 0)
+    # Reloading a pack replaces what it added before.
+    packs.add_pack('one', pack('Science', 'Easy', ['p4']))
+    assert [packs.get('Science', 'Easy', i)["question"] for i in range(2)] == ['p4', 'p3']
+
+def test_source_changes_with_the_bucket_questions(bank):
+    packs = PackQuestionBank(bank)
+    assert packs.source('Science', 'Easy') is None
+    packs.add_pack('one', pack('Science', 'Easy', ['p1', 'p2']))
+    first = packs.source('Science', 'Easy')
+    packs.add_pack('one', pack('Science', 'Easy', ['p2', 'p1']))
+    assert packs.source('Science', 'Easy') != first
+    assert packs.source('Science', 'Medium') is None
+
+def test_snapshot_is_not_affected_by_later_packs(bank):
+    packs = PackQuestionBank(bank)
+    packs.add_pack('one', pack('Science', 'Easy', ['p1', 'p2', 'p3']))
+    snapshot = packs.snapshot()
+    packs.add_pack('one', pack('Science', 'Easy', ['q1']))
+    assert snapshot.count('Science', 'Easy') == 3
+    assert snapshot.get('Science', 'Easy', 2)["question"] == 'p3'
+    assert packs.count('Science', 'Easy') == 1
+
+def test_draw_survives_a_pack_swapped_in_mid_draw(bank):
+    packs = PackQuestionBank(bank)
+    packs.add_pack('one', pack('Science', 'Easy', ['p%d' % i for i in range(10)]))
+    scheduler = QuestionScheduler(packs)
+    engine = SnakeEngine(20, 16, questions=packs, seed=4, scheduler=scheduler)
+    scheduler.rng = engine.rng
+    engine.reset('Science')
+    next_index = scheduler.next_index
+
+    def racing_next_index(*args):
+        # The download thread replaces the bucket with a smaller one between the
+        # scheduler's count() and the engine's get().
+        index = next_index(*args)
+        packs.add_pack('one', pack('Science', 'Easy', ['q1']))
+        return index
+    scheduler.next_index = racing_next_index
+    for _ in range(20):
+        key, question = engine.draw_question()
+        assert question["question"].startswith(('p', 'q'))
+
+@pytest.fixture
+def pack_server(tmp_path, capsys):
+    directory = tmp_path / 'server'
+    directory.mkdir()
+    for name, category in (('space', 'Space'), ('music', 'Music')):
+        (directory / f'{name}.json').write_text(json.dumps(pack(category, 'Easy', [f'{name} {i}' for i in range(3)])))
+    server = serve_packs(str(directory), '127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+def test_client_revalidates_with_the_etag_over_one_connection(pack_server):
+    client = PackClient(pack_server)
+    status, etag, body = client.get('space.json')
+    assert status == 200 and etag and json.loads(body)['Space']
+    assert client.get('space.json', etag) == (304, etag, None)
+    assert client.get('missing.json')[0] == 404
+    assert client.requests == 3 and client.connections == 1
+    client.close()
+
+def test_second_pass_is_served_from_the_cache(bank, pack_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    packs = QuestionPacks(PackQuestionBank(bank), url=pack_server, cache=PackCache(cache_dir))
+    packs.download(PackClient(pack_server))
+    assert {'Space', 'Music'} <= set(packs.bank.categories())
+    # A fresh start loads the cached bodies and only revalidates them.
+    cache = PackCache(cache_dir)
+    stored = []
+    cache.store = lambda *args: stored.append(args)
+    packs = QuestionPacks(PackQuestionBank(bank), url=pack_server, cache=cache)
+    packs.load_cached()
+    assert packs.bank.count('Music', 'Easy') == 3
+    packs.download(PackClient(pack_server))
+    assert stored == []
+    assert packs.bank.count('Space', 'Easy') == 3
+
+def test_cache_evicts_the_least_recently_used_pack(tmp_path):
+    cache = PackCache(str(tmp_path), max_bytes=250)
+    cache.store('a', '"a"', b'a' * 100)
+    cache.store('b', '"b"', b'b' * 100)
+    cache.entries['a']['used'], cache.entries['b']['used'] = 1, 2
+    assert cache.read('a') == b'a' * 100
+    cache.store('c', '"c"', b'c' * 100)
+    assert sorted(cache.urls()) == ['a', 'c']
+    assert cache.read('b') is None
+    # The index survives a restart, and a smaller budget evicts on load.
+    cache.flush()
+    reloaded = PackCache(str(tmp_path), max_bytes=150)
+    assert reloaded.urls() == ['c']
+    assert reloaded.etag('c') == '"c"'
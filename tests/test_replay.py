@@ -0,0 +1,66 @@
+import pytest
+
+from autopilot import Autopilot
+from engine import SnakeEngine
+from replay import ReplayHeader, ReplayPlayer, ReplayWriter, WRITE_CHUNK, new_replay_path
+from scheduler import QuestionScheduler
+
+def record_game(bank, path, seed, ticks, apple_span=1, label_rows=0, distractors=0):
+    scheduler = QuestionScheduler(bank)
+    engine = SnakeEngine(24, 20, questions=bank, seed=seed, apple_span=apple_span, label_rows=label_rows,
+                         scheduler=scheduler, distractors=distractors)
+    scheduler.rng = engine.rng
+    header = ReplayHeader.for_engine(engine, seed, 'Science', 10, scheduler.to_dict())
+    engine.reset('Science', fps=10)
+    autopilot = Autopilot(engine)
+    writer = ReplayWriter(path, header)
+    for _ in range(ticks):
+        direction = autopilot.act()
+        writer.record(direction)
+        engine.step(direction)
+        if engine.game_over:
+            break
+    writer.close(wait=True)
+    return engine
+
+def snapshot(engine):
+    return (engine.ticks, engine.score, engine.difficulty, engine.fps, list(engine.body), engine.apples,
+            engine.question_key, engine.game_over, engine.death_cause)
+
+@pytest.mark.parametrize('apple_span, label_rows, distractors', [(1, 0, 0), (2, 1, 20), (1, 0, 60)])
+def test_replay_reproduces_the_game(bank, tmp_path, apple_span, label_rows, distractors):
+    path = str(tmp_path / 'game.tsr')
+    engine = record_game(bank, path, 21, 3000, apple_span, label_rows, distractors)
+    assert engine.score > 0
+    player = ReplayPlayer.load(path, bank)
+    assert len(player) == engine.ticks
+    assert snapshot(player.play_all()) == snapshot(engine)
+
+def test_long_replay_spans_write_chunks(bank, tmp_path):
+    path = str(tmp_path / 'game.tsr')
+    engine = record_game(bank, path, 5, 3 * WRITE_CHUNK)
+    assert snapshot(ReplayPlayer.load(path, bank).play_all()) == snapshot(engine)
+
+def test_seek_back_replays_from_the_start(bank, tmp_path):
+    path = str(tmp_path / 'game.tsr')
+    record_game(bank, path, 8, 500)
+    player = ReplayPlayer.load(path, bank)
+    player.seek(200)
+    middle = snapshot(player.engine)
+    player.play_all()
+    player.seek(200)
+    assert snapshot(player.engine) == middle
+
+def test_header_round_trip_and_rejects_bad_data():
+    header = ReplayHeader(123, 30, 20, 2, 1, None, 40, 12, 'History', {'decks': [], 'stats': []})
+    decoded, end = ReplayHeader.decode(header.encode() + b'\x00\x01')
+    assert end == len(header.encode())
+    assert vars(decoded) == vars(header)
+    with pytest.raises(ValueError):
+        ReplayHeader.decode(b'TSRP')
+    with pytest.raises(ValueError):
+        ReplayHeader.decode(b'XXXX' + header.encode()[4:])
+
+def test_replay_paths_started_together_differ(tmp_path):
+    paths = [new_replay_path(str(tmp_path)) for _ in range(100)]
+    assert len(set(paths)) == len(paths)
@@ -0,0 +1,122 @@
+import random
+
+from question_bank import JsonQuestionBank
+from scheduler import QuestionScheduler, REVIEW_INTERVALS, question_id
+
+def test_deck_deals_every_question_once_per_round(bank):
+    scheduler = QuestionScheduler(bank, random.Random(1))
+    size = bank.count('Science', 'Easy')
+    first = [scheduler.next_index('Science', 'Easy') for _ in range(size)]
+    assert sorted(first) == list(range(size))
+    previous = first[-1]
+    for _ in range(5):
+        # Later rounds count the question that was just shown as already dealt, so
+        # it cannot come straight back.
+        round_ = [scheduler.next_index('Science', 'Easy') for _ in range(size - 1)]
+        assert sorted(round_) == sorted(set(range(size)) - {previous})
+        previous = round_[-1]
+
+def test_buckets_are_independent(bank):
+    scheduler = QuestionScheduler(bank, random.Random(2))
+    easy = [scheduler.next_index('Science', 'Easy') for _ in range(3)]
+    scheduler.next_index('History', 'Easy')
+    easy += [scheduler.next_index('Science', 'Easy') for _ in range(bank.count('Science', 'Easy') - 3)]
+    assert sorted(easy) == list(range(bank.count('Science', 'Easy')))
+
+def test_empty_bucket_returns_none(bank):
+    assert QuestionScheduler(bank).next_index('Geography', 'Easy') is None
+
+def test_missed_question_follows_leitner_intervals():
+    from conftest import make_bank
+    bank = make_bank(sizes=(200, 1, 1))
+    scheduler = QuestionScheduler(bank, random.Random(4))
+    missed = scheduler.next_index('Science', 'Easy')
+    scheduler.record('Science', 'Easy', missed, correct=False)
+    for interval in REVIEW_INTERVALS:
+        draws = [scheduler.next_index('Science', 'Easy') for _ in range(interval)]
+        assert missed not in draws[:-1]
+        assert draws[-1] == missed
+        scheduler.record('Science', 'Easy', missed, correct=True)
+    # Past the last box the question is only seen through the deck again.
+    assert scheduler.stats[('Science', 'Easy', question_id(bank.get('Science', 'Easy', missed)))][2] is None
+    assert not any(scheduler.decks[('Science', 'Easy')].due.values())
+
+def test_state_round_trip_continues_the_same_sequence(bank):
+    scheduler = QuestionScheduler(bank, random.Random(9))
+    for _ in range(5):
+        index = scheduler.next_index('Science', 'Easy')
+        scheduler.record('Science', 'Easy', index, correct=index % 2 == 0)
+    state = scheduler.to_dict()
+    rng_state = scheduler.rng.getstate()
+    expected = [scheduler.next_index('Science', 'Easy') for _ in range(20)]
+    restored = QuestionScheduler.from_dict(state, bank, random.Random())
+    restored.rng.setstate(rng_state)
+    assert [restored.next_index('Science', 'Easy') for _ in range(20)] == expected
+
+def test_give_back_deals_the_index_next(bank):
+    scheduler = QuestionScheduler(bank, random.Random(6))
+    scheduler.next_index('Science', 'Medium')
+    index = scheduler.next_index('Science', 'Medium')
+    draws = scheduler.decks[('Science', 'Medium')].draws
+    scheduler.give_back('Science', 'Medium', index)
+    assert scheduler.decks[('Science', 'Medium')].draws == draws - 1
+    assert scheduler.next_index('Science', 'Medium') == index
+    # The rest of the round still deals every other question once.
+    rest = [scheduler.next_index('Science', 'Medium') for _ in range(bank.count('Science', 'Medium') - 2)]
+    assert len(set(rest + [index])) == len(rest) + 1
+
+class SwappableBank(object):
+    # Stands in for the pack bank: replace() swaps a bucket for new questions.
+    def __init__(self, questions):
+        self.bank = JsonQuestionBank(questions)
+        self.version = 0
+
+    def replace(self, questions):
+        self.bank = JsonQuestionBank(questions)
+        self.version += 1
+
+    def snapshot(self):
+        return self
+
+    def count(self, category, difficulty):
+        return self.bank.count(category, difficulty)
+
+    def get(self, category, difficulty, index):
+        return self.bank.get(category, difficulty, index)
+
+    def source(self, category, difficulty):
+        return self.version
+
+def questions(texts):
+    return {'Science': {'Easy': [{"question": text, "options": ["a", "b"], "correct": "a"} for text in texts]}}
+
+def test_stats_follow_the_question_when_its_index_changes():
+    bank = SwappableBank(questions(['one', 'two', 'three', 'four']))
+    scheduler = QuestionScheduler(bank, random.Random(3))
+    index = scheduler.next_index('Science', 'Easy')
+    text = bank.get('Science', 'Easy', index)["question"]
+    scheduler.record('Science', 'Easy', index, correct=False)
+    # The same questions in reverse order, as a replacing pack might ship them.
+    bank.replace(questions(['four', 'three', 'two', 'one']))
+    moved = [i for i in range(4) if bank.get('Science', 'Easy', i)["question"] == text][0]
+    stats = scheduler.stats[('Science', 'Easy', question_id(bank.get('Science', 'Easy', moved)))]
+    assert stats[:2] == [0, 1]
+    state = scheduler.to_dict()
+    restored = QuestionScheduler.from_dict(state, bank)
+    assert restored.stats == scheduler.stats
+
+def test_deck_starts_over_when_the_bucket_source_changes():
+    bank = SwappableBank(questions(['one', 'two', 'three', 'four']))
+    scheduler = QuestionScheduler(bank, random.Random(8))
+    index = scheduler.next_index('Science', 'Easy')
+    scheduler.record('Science', 'Easy', index, correct=False)
+    assert any(scheduler.decks[('Science', 'Easy')].due.values())
+    bank.replace(questions(['five', 'six', 'seven', 'eight']))
+    round_ = [scheduler.next_index('Science', 'Easy') for _ in range(4)]
+    assert sorted(round_) == [0, 1, 2, 3]
+    assert not any(scheduler.decks[('Science', 'Easy')].due.values())
+
+def test_index_keyed_stats_are_migrated(bank):
+    state = {'decks': [], 'stats': [['Science', 'Easy', 2, 4, 1, None], ['Science', 'Easy', 999, 1, 0, None]]}
+    scheduler = QuestionScheduler.from_dict(state, bank)
+    assert scheduler.stats == {('Science', 'Easy', question_id(bank.get('Science', 'Easy', 2))): [4, 1, None]}
@@ -0,0 +1,52 @@
+import json, os
+
+import storage
+from storage import GameStore
+
+def test_changes_are_written_and_reloaded(tmp_path):
+    path = str(tmp_path / 'high_score.json')
+    store = GameStore(path, coalesce_delay=0.01)
+    assert store.record_game('Science', 7, 120, 'Medium', 'collision')
+    assert not store.record_game('Science', 3, 40, 'Easy', 'score')
+    store.set_question_state({'decks': []})
+    store.close()
+    assert not os.path.exists(path + '.tmp')
+    reloaded = GameStore(path)
+    assert reloaded.high_score == 7
+    assert reloaded.category_high_score('Science') == 7
+    assert [game['score'] for game in reloaded.data['history']] == [7, 3]
+    assert reloaded.question_state == {'decks': []}
+
+def test_history_is_capped(tmp_path):
+    store = GameStore(str(tmp_path / 'high_score.json'), history_limit=5, coalesce_delay=0.01)
+    for score in range(12):
+        store.record_game('Science', score, 10, 'Easy', 'collision')
+    store.close()
+    assert [game['score'] for game in store.data['history']] == list(range(7, 12))
+
+def test_failed_write_is_retried(tmp_path, monkeypatch):
+    path = str(tmp_path / 'high_score.json')
+    store = GameStore(path, coalesce_delay=0.01, retry_delay=0.05)
+    store.record_game('Science', 4, 10, 'Easy', 'collision')
+    assert store.flush(5)
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(storage.os, 'replace', failing_replace)
+    store.record_game('Science', 9, 10, 'Easy', 'collision')
+    # The failed write keeps the previous file and leaves the store dirty.
+    assert not store.flush(0.3)
+    with open(path) as file:
+        assert json.load(file)['high_score'] == 4
+    monkeypatch.undo()
+    assert store.flush(5)
+    store.close()
+    with open(path) as file:
+        assert json.load(file)['high_score'] == 9
+
+def test_corrupt_file_loads_defaults(tmp_path):
+    path = tmp_path / 'high_score.json'
+    path.write_text('{"high_score": 3,')
+    store = GameStore(str(path))
+    assert store.high_score == 0
+    assert store.data['history'] == []
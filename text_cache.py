@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from kivy.core.text import Label as CoreLabel
+
+from atlas import ShelfAtlas
+from utils import TEXT_CACHE_SIZE, TEXT_ATLAS_SIZE
+
+class TextTextureCache(object):
+    def __init__(self, max_size=TEXT_CACHE_SIZE, atlas_size=TEXT_ATLAS_SIZE):
+        self.max_size = max_size
+        self.atlas_size = atlas_size
+        self.atlas = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text, font_size, color):
+        key = (text, font_size, tuple(color))
+        texture = self.entries.get(key)
+        if texture is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return texture
+        self.misses += 1
+        texture = self.render(text, font_size, color)
+        self.entries[key] = texture
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return texture
+
+    def render(self, text, font_size, color):
+        label = CoreLabel(text=text, font_size=font_size, color=color)
+        label.refresh()
+        texture = label.texture
+        if self.atlas_size and texture.width > 1 and texture.height > 1:
+            if self.atlas is None:
+                self.atlas = ShelfAtlas(self.atlas_size)
+            region = self.atlas.add_texture(texture)
+            if region is not None:
+                return region
+        return texture
+
+    def clear(self):
+        self.entries.clear()
+        if self.atlas is not None:
+            self.atlas.clear()
+
+    def stats(self):
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+text_cache = TextTextureCache()
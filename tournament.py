@@ -0,0 +1,181 @@
+# Monte Carlo tournament: plays many seeded headless games of the current rules on all
+# CPU cores and prints aggregated statistics. Run with: python tournament.py --games 10000
+import argparse, json, os, random, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from autopilot import Autopilot
+from engine import SnakeEngine, DIRECTIONS, OPPOSITES
+from question_bank import get_question_bank
+from utils import INITIAL_FPS
+
+LENGTH_BUCKET = 100
+
+class GreedyPlayer(object):
+    def __init__(self, engine, accuracy, seed):
+        self.engine = engine
+        self.accuracy = accuracy
+        self.rng = random.Random(seed)
+        self.target = None
+
+    def pick_target(self):
+        engine = self.engine
+        correct = [i for i, option in enumerate(engine.options) if option == engine.correct_answer]
+        wrong = [i for i in range(len(engine.apples)) if i not in correct]
+        if correct and (not wrong or self.rng.random() < self.accuracy):
+            self.target = correct[0]
+        elif wrong:
+            self.target = self.rng.choice(wrong)
+        else:
+            self.target = None
+
+    def act(self):
+        engine = self.engine
+        if self.target is None or self.target >= len(engine.apples):
+            return None
+        head_x, head_y = engine.xy(engine.body[0])
+        target_x, target_y = engine.xy(engine.apples[self.target])
+        dx = (target_x - head_x) % engine.cols
+        dy = (target_y - head_y) % engine.rows
+        preferred = []
+        if dx:
+            preferred.append('RIGHT' if dx <= engine.cols // 2 else 'LEFT')
+        if dy:
+            preferred.append('UP' if dy <= engine.rows // 2 else 'DOWN')
+        preferred.extend(direction for direction in DIRECTIONS if direction not in preferred)
+        head = engine.body[0]
+        for direction in preferred:
+            if direction == OPPOSITES[engine.direction]:
+                continue
+            if engine.neighbors[direction][head] not in engine.body:
+                return direction
+        return None
+
+# Same choice of apple as GreedyPlayer, but steered there by the autopilot's path search.
+class PathPlayer(GreedyPlayer):
+    def __init__(self, engine, accuracy, seed):
+        super(PathPlayer, self).__init__(engine, accuracy, seed)
+        self.autopilot = Autopilot(engine)
+
+    def act(self):
+        return self.autopilot.act(self.target)
+
+PLAYERS = {'greedy': GreedyPlayer, 'autopilot': PathPlayer}
+
+def play_game(seed, category, options):
+    engine = SnakeEngine(options['cols'], options['rows'], questions=get_question_bank(), seed=seed, label_rows=options['label_rows'], distractors=options['distractors'])
+    engine.reset(category, fps=options['fps'])
+    player = PLAYERS[options['player']](engine, options['accuracy'], seed)
+    player.pick_target()
+    exposure = Counter({(category, engine.difficulty): 1})
+    max_ticks = options['max_ticks']
+    result = None
+    while engine.ticks < max_ticks:
+        difficulty = engine.difficulty
+        result = engine.step(player.act())
+        if result.apple is not None:
+            exposure[(category, difficulty)] += 1
+            player.pick_target()
+        if result.game_over:
+            break
+    cause = engine.death_cause or 'timeout'
+    return (engine.ticks, engine.score, cause, engine.difficulty, engine.fps), exposure
+
+def run_chunk(seeds, categories, options):
+    games = []
+    exposure = Counter()
+    for seed in seeds:
+        category = categories[seed % len(categories)]
+        game, game_exposure = play_game(seed, category, options)
+        games.append(game)
+        exposure.update(game_exposure)
+    return games, exposure
+
+class TournamentStats(object):
+    def __init__(self):
+        self.games = 0
+        self.lengths = Counter()
+        self.scores = Counter()
+        self.causes = Counter()
+        self.final_difficulty = Counter()
+        self.final_fps = Counter()
+        self.exposure = Counter()
+        self.total_ticks = 0
+
+    def merge(self, games, exposure):
+        for ticks, score, cause, difficulty, fps in games:
+            self.games += 1
+            self.total_ticks += ticks
+            self.lengths[ticks // LENGTH_BUCKET * LENGTH_BUCKET] += 1
+            self.scores[score] += 1
+            self.causes[cause] += 1
+            self.final_difficulty[difficulty] += 1
+            self.final_fps[fps] += 1
+        self.exposure.update(exposure)
+
+    def as_dict(self):
+        return {
+            'games': self.games,
+            'total_ticks': self.total_ticks,
+            'game_length': {f"{start}-{start + LENGTH_BUCKET - 1}": count for start, count in sorted(self.lengths.items())},
+            'score': {str(score): count for score, count in sorted(self.scores.items())},
+            'death_cause': dict(self.causes),
+            'final_difficulty': dict(self.final_difficulty),
+            'final_fps': {str(fps): count for fps, count in sorted(self.final_fps.items())},
+            'question_exposure': {f"{category}/{difficulty}": count for (category, difficulty), count in sorted(self.exposure.items())},
+        }
+
+def run_tournament(num_games, workers, chunk_size, categories, options, seed=0):
+    stats = TournamentStats()
+    start = time.perf_counter()
+    seeds = list(range(seed, seed + num_games))
+    chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, chunk, categories, options) for chunk in chunks]
+        for future in as_completed(futures):
+            games, exposure = future.result()
+            stats.merge(games, exposure)
+            elapsed = time.perf_counter() - start
+            print(f"{stats.games}/{num_games} games, {stats.games / elapsed:.0f} games/s", end='\r', flush=True)
+    elapsed = time.perf_counter() - start
+    print()
+    return stats, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many headless Trivia Snake games and aggregate the results.")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--category', action='append', help="Category to play (repeatable, default: all)")
+    parser.add_argument('--accuracy', type=float, default=0.8, help="Chance the simulated player goes for the correct apple")
+    parser.add_argument('--max-ticks', type=int, default=5000)
+    parser.add_argument('--cols', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--label-rows', type=int, default=3)
+    parser.add_argument('--fps', type=int, default=INITIAL_FPS)
+    parser.add_argument('--distractors', type=int, default=0, help="Answerless pickups on the board (apple storm)")
+    parser.add_argument('--player', choices=sorted(PLAYERS), default='greedy', help="Simulated player: greedy steering or autopilot path search")
+    parser.add_argument('--json', help="Write the aggregated statistics to this file")
+    args = parser.parse_args(argv)
+
+    available = get_question_bank().categories()
+    if not available:
+        parser.error("the question bank has no categories (check trivia.json and trivia.db)")
+    unknown = [category for category in args.category or [] if category not in available]
+    if unknown:
+        parser.error(f"unknown category {', '.join(unknown)} (choose from {', '.join(available)})")
+    categories = args.category or available
+    options = {'cols': args.cols, 'rows': args.rows, 'label_rows': args.label_rows, 'fps': args.fps, 'accuracy': args.accuracy, 'max_ticks': args.max_ticks, 'distractors': args.distractors, 'player': args.player}
+    stats, elapsed = run_tournament(args.games, args.workers, args.chunk_size, categories, options, args.seed)
+    report = stats.as_dict()
+    report['elapsed_seconds'] = elapsed
+    report['games_per_second'] = stats.games / elapsed if elapsed else 0.0
+    report['workers'] = args.workers
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main()
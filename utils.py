@@ -1,6 +1,4 @@
-import json, os
-from kivy.metrics import dp
-from kivy.utils import get_color_from_hex
+import json, logging, os
 
 # Constants
 BASE_SNAKE_SIZE = 35        # Default size
@@ -11,22 +9,59 @@ MIN_FPS = 5
 MAX_FPS = 30
 WHITE = (1, 1, 1, 1)
 YELLOW = (1, 1, 0, 1)
+RETAINED_RENDERING = True   # False falls back to rebuilding the canvas every tick
+TEXT_CACHE_SIZE = 128       # Rendered label textures kept in the LRU cache
+TEXT_ATLAS_SIZE = 0         # Side of the shared label atlas texture, 0 disables packing
+SPRITE_ATLAS_SIZE = 1024    # Side of the shared sprite atlas texture, 0 disables packing
+SPRITE_MAX_SIZE = 256       # Sprites larger than this are scaled down once when decoded
+STARTUP_BUDGET_MS = 1500    # Target time from process start to the first drawn menu frame
+PROFILING = False           # Start games with the frame profiler and its overlay enabled (F3 toggles)
+DEBUG_CONTROLS = False      # Let a triple tap toggle the profiler on touch screens (TRIVIA_SNAKE_DEBUG=1 overrides)
+PROFILE_TRACE_FILE = 'profile_trace.json'  # Profiler trace written to the app's user data directory when profiling stops
+PROFILE_BUFFER_SIZE = 1024  # Samples kept per profiled phase
+ADAPTIVE_QUALITY = True     # Let the quality governor trade rendering detail for frame rate
+QUALITY_TARGET_FPS = 60     # Display frame rate the quality governor tries to hold
+LABEL_PREFETCH_BUDGET = 0.002  # Seconds per frame spent rendering the next question's labels ahead of time
+AUTOPILOT = False           # Start games steered by the autopilot, for attract mode and soak tests (F2 toggles)
+APPLE_STORM_PICKUPS = 0     # Default number of distractor pickups (the Apple Storm setting)
+MAX_STORM_PICKUPS = 300
+REPLAY_LIMIT = 50           # Most recent game replays kept on disk
+AUDIO_VOICES = 4            # Preloaded copies of each sound effect, so overlapping effects mix instead of cutting off
+AUDIO_MAX_DELAY = 0.15      # Seconds a triggered sound effect may wait before it is dropped instead of played late
+AUDIO_LATENCY_SAMPLES = 256 # Trigger-to-playback latencies kept for the sound latency report
+LOG_LEVEL = 'INFO'          # Game log level (TRIVIA_SNAKE_LOG_LEVEL overrides); DEBUG also shows per-pickup messages and events
+ANALYTICS_BATCH_SIZE = 50   # Gameplay events handed to the analytics sinks at once
+ANALYTICS_FLUSH_INTERVAL = 5.0  # Seconds an event waits for its batch to fill before it is flushed
+ANALYTICS_MAX_BYTES = 1024 * 1024  # Event log size before it is rotated
+ARENA_HOST = '127.0.0.1'    # Arena server joined from the menu (TRIVIA_SNAKE_ARENA=host:port overrides)
+ARENA_PORT = 8765
+ARENA_TICK_RATE = 10        # Server ticks per second in arena rooms
+ARENA_CLOSE_TIMEOUT = 1.0   # Seconds leaving an arena waits for the connection thread to finish
+QUESTION_PACK_URL = ''      # Content server for question packs (TRIVIA_SNAKE_PACKS=url overrides), empty only loads cached packs
+PACK_CACHE_BYTES = 8 * 1024 * 1024  # Disk space kept for downloaded question packs
+PACK_REFRESH_INTERVAL = 600 # Seconds before the menu asks the pack server for updates again
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), 'assets', 'images')
 SOUNDS_DIR = os.path.join(os.path.dirname(__file__), 'assets', 'sounds')
+TRIVIA_FILE = os.path.join(os.path.dirname(__file__), 'trivia.json')
+TRIVIA_DB = os.path.join(os.path.dirname(__file__), 'trivia.db')
+HIGH_SCORE_FILE = os.path.join(os.path.dirname(__file__), 'high_score.json')
+REPLAY_DIR = os.path.join(os.path.dirname(__file__), 'replays')
+PACK_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'packs')
+ANALYTICS_FILE = os.path.join(os.path.dirname(__file__), 'analytics.jsonl')
+
+# game_log imports this module, so the logger is looked up by name here.
+log = logging.getLogger('trivia_snake.utils')
 
 def load_trivia_questions(filename='trivia.json'):
     filepath = os.path.join(os.path.dirname(__file__), filename)
     if not os.path.exists(filepath):
-        print(f"Trivia file '{filename}' not found!")
+        log.warning("Trivia file '%s' not found!", filename)
         return {}
     try:
         with open(filepath, 'r') as file:
             data = json.load(file)
-            print(f"Successfully loaded trivia questions from '{filename}'.")
+            log.info("Successfully loaded trivia questions from '%s'.", filename)
             return data
     except Exception as e:
-        print(f"Error loading '{filename}': {e}")
-        return {}
-
-# Load trivia questions
-trivia_questions = load_trivia_questions() 
\ No newline at end of file
+        log.error("Error loading '%s': %s", filename, e)
+        return {} 
\ No newline at end of file